@@ -0,0 +1,44 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# running totals of counts for groupings of dimensions, updated as each count
+# is collected so that totals are read without rescanning the users maps
+# {('data', 'repo'): {('prs', 'repo0'): total, ...}, ...}
+class Aggregator:
+    DIMENSIONS = ['user', 'repo', 'data', 'state', 'period']
+    def __init__(self, groupings=None):
+        self.groupings = {}
+        for dims in groupings or []:
+            self.add_grouping(dims)
+
+    def add_grouping(self, dims):
+        dims = tuple(dims)
+        for dim in dims:
+            if dim not in self.DIMENSIONS:
+                raise ValueError("invalid dimension '{dim}', use one of: {dims}".format(dim=dim, dims=', '.join(self.DIMENSIONS)))
+        self.groupings.setdefault(dims, {})
+
+    # event is a map with a value for each of the dimensions
+    def add(self, event, count):
+        for dims, totals in self.groupings.items():
+            key = tuple([event[dim] for dim in dims])
+            totals[key] = totals.get(key, 0) + count
+
+    def totals(self, dims):
+        return self.groupings.get(tuple(dims), {})
+
+    # (header, rows) of the totals of dims sorted by key
+    def table(self, dims):
+        totals = self.totals(dims)
+        return (list(dims) + ['total'], [list(key) + [totals[key]] for key in sorted(totals.keys())])
@@ -0,0 +1,42 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from aggregate import *
+
+class TestAggregator(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = Aggregator([('data', 'repo'), ('user',)])
+        self.aggregator.add({'user': 'fake-user1', 'repo': 'fake-repo1', 'data': 'prs', 'state': 'closed', 'period': '2020-03'}, 2)
+        self.aggregator.add({'user': 'fake-user2', 'repo': 'fake-repo1', 'data': 'prs', 'state': 'closed', 'period': '2020-03'}, 3)
+        self.aggregator.add({'user': 'fake-user1', 'repo': 'fake-repo2', 'data': 'commits', 'state': 'closed', 'period': '2020-03'}, 1)
+
+    def test_totals(self):
+        self.assertEqual(self.aggregator.totals(('data', 'repo')), {('prs', 'fake-repo1'): 5, ('commits', 'fake-repo2'): 1})
+        self.assertEqual(self.aggregator.totals(['user']), {('fake-user1',): 3, ('fake-user2',): 3})
+        self.assertEqual(self.aggregator.totals(('state',)), {})
+
+    def test_table(self):
+        self.assertEqual(self.aggregator.table(('data', 'repo')), (['data', 'repo', 'total'], [['commits', 'fake-repo2', 1], ['prs', 'fake-repo1', 5]]))
+
+    def test_add_grouping(self):
+        self.aggregator.add_grouping(['state', 'period'])
+        self.aggregator.add({'user': 'fake-user1', 'repo': 'fake-repo1', 'data': 'prs', 'state': 'open', 'period': '2020-03'}, 4)
+        self.assertEqual(self.aggregator.totals(('state', 'period')), {('open', '2020-03'): 4})
+        with self.assertRaises(ValueError):
+            self.aggregator.add_grouping(['fake-dim'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io, os, shutil, tempfile, unittest, contextlib
+
+from datetime import datetime
+
+from docopt import docopt
+
+import ghtrack
+from cli import CLI
+from client import GHClient
+from paginator import PrefetchPaginator
+from synthetic import SyntheticOrg, FakeGithub
+
+# GitHub API calls of each command on a synthetic organization, by endpoint,
+# must stay within budgets computed from its sizes, so that refetches, e.g.,
+# per user or per state, fail the tests rather than the rate limit
+class TestCallBudgets(unittest.TestCase):
+    SIZES = {'repos': 10, 'prs': 100, 'reviews': 2, 'issues': 50, 'users': 20}
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+        self.org = SyntheticOrg('budget-org', **self.SIZES)
+        self.start_date = datetime(self.org.year, 3, 1)
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
+
+    def __argv(self, command, users=None, more_args=[]):
+        return [command, 'mar', self.org.name, '--all-repos', '--users=' + ','.join(users or self.org.users), '--access-token=fake-access-token'] + more_args
+
+    # runs command on org tracking users, returns its API calls by endpoint
+    def __calls(self, command, users=None, more_args=[]):
+        github = FakeGithub(self.org)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rc = CLI(docopt(ghtrack.__doc__, argv=self.__argv(command, users, more_args))).command(GHClient('fake-access-token', github)).execute()
+        self.assertEqual(rc, 0)
+        return github.calls
+
+    # API calls estimated by --plan for command before any run
+    def __plan(self, command, more_args=[]):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return CLI(docopt(ghtrack.__doc__, argv=self.__argv(command, more_args=more_args + ['--plan']))).command(GHClient('fake-access-token', FakeGithub(self.org))).plan_map()['total']
+
+    # pages of 100 items read to list items, the last one possibly empty, and those fetched ahead
+    def __pages(self, items):
+        return items // PrefetchPaginator.PER_PAGE + 1 + PrefetchPaginator.DEFAULT_PREFETCH
+
+    # one call per PR in state updated since the start of the month
+    def __reviewed_prs(self, state='closed'):
+        return len([pull for repo in self.org.repos for pull in repo['pulls']
+                    if (state == 'all' or pull['state'] == state) and pull['updated_at'] >= self.start_date])
+
+    # budget of a command reading pulls listings, by created or updated date,
+    # and reviews of PRs, as well as contributor stats or issues when asked
+    def __budget(self, commits=False, pulls=0, reviews=0, issues=False):
+        repos = self.SIZES['repos']
+        return {'org': 1, 'repos': self.__pages(repos),
+                'stats/contributors': repos if commits else 0,
+                'pulls': pulls * repos * self.__pages(self.SIZES['prs']),
+                'reviews': reviews,
+                'issues': repos * self.__pages(self.SIZES['prs'] + self.SIZES['issues']) if issues else 0}
+
+    def assertWithinBudget(self, calls, budget):
+        for endpoint, count in calls.items():
+            self.assertTrue(count <= budget.get(endpoint, 0), "'{endpoint}' calls: {count} over budget: {budget}".format(endpoint=endpoint, count=count, budget=budget.get(endpoint, 0)))
+
+    def test_commits(self):
+        self.assertWithinBudget(self.__calls('commits'), self.__budget(commits=True))
+
+    def test_prs(self):
+        self.assertWithinBudget(self.__calls('prs'), self.__budget(pulls=1))
+
+    def test_reviews(self):
+        self.assertWithinBudget(self.__calls('reviews'), self.__budget(pulls=1, reviews=self.__reviewed_prs()))
+
+    def test_issues(self):
+        self.assertWithinBudget(self.__calls('issues'), self.__budget(issues=True))
+
+    def test_stats(self):
+        calls = self.__calls('stats', more_args=['--commits', '--prs', '--reviews', '--issues', '--summarize'])
+        self.assertWithinBudget(calls, self.__budget(commits=True, pulls=1, reviews=self.__reviewed_prs(), issues=True))
+
+    def test_all_states(self):
+        calls = self.__calls('stats', more_args=['--prs', '--reviews', '--state=all'])
+        self.assertWithinBudget(calls, self.__budget(pulls=1, reviews=self.__reviewed_prs('all')))
+
+    def test_plan(self):
+        for command, more_args in [('commits', []), ('prs', []), ('reviews', []), ('issues', []), ('reviews', ['--state=all']),
+                                   ('stats', ['--commits', '--prs', '--reviews', '--issues'])]:
+            estimate = self.__plan(command, more_args)
+            calls = sum(self.__calls(command, more_args=more_args).values())
+            self.assertTrue(calls <= estimate <= calls * 1.1, "{command} {more_args}: estimated {estimate} API calls, made {calls}".format(command=command, more_args=more_args, estimate=estimate, calls=calls))
+
+    # pages fetched ahead vary between runs, without them the calls are exact
+    def test_users(self):
+        for command in ['commits', 'prs', 'reviews', 'issues']:
+            self.assertEqual(self.__calls(command, self.org.users[:2], ['--prefetch=0']), self.__calls(command, more_args=['--prefetch=0']))
+
+if __name__ == '__main__':
+    unittest.main()
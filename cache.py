@@ -0,0 +1,77 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, json, time, threading
+
+from common import *
+
+# JSON file backed key/value cache, entries older than ttl seconds are expired
+class DiskCache:
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.ghtrack', 'cache')
+    def __init__(self, name, ttl, cache_dir=None):
+        self.name = name
+        self.ttl = ttl
+        self.cache_dir = cache_dir or os.getenv('GHTRACK_CACHE_DIR', self.DEFAULT_CACHE_DIR)
+        self.__entries = None
+
+    def path(self):
+        return os.path.join(self.cache_dir, "{name}.json".format(name=self.name))
+
+    def _entries(self):
+        if self.__entries == None:
+            self.__entries = {}
+            try:
+                with open(self.path()) as file:
+                    self.__entries = json.load(file)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                Console.warn("ignoring invalid cache file '{path}': {message}".format(path=self.path(), message=e.__str__()))
+        return self.__entries
+
+    def _expired(self, entry):
+        return self.ttl > 0 and time.time() - entry['at'] > self.ttl
+
+    def get(self, key, default=None):
+        entry = self._entries().get(key)
+        if entry == None or self._expired(entry):
+            return default
+        return entry['value']
+
+    def set(self, key, value):
+        self._entries()[key] = {'at': time.time(), 'value': value}
+        self.save()
+
+    # sets many entries with a single save
+    def update(self, values):
+        now = time.time()
+        for key, value in values.items():
+            self._entries()[key] = {'at': now, 'value': value}
+        self.save()
+
+    def delete(self, key):
+        if key in self._entries():
+            del(self._entries()[key])
+            self.save()
+
+    def keys(self):
+        return [key for key, entry in self._entries().items() if not self._expired(entry)]
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # unique so that processes or threads saving the same cache do not clash
+        tmp_path = "{path}.{pid}.{thread}.tmp".format(path=self.path(), pid=os.getpid(), thread=threading.get_ident())
+        with open(tmp_path, 'w') as file:
+            json.dump(self._entries(), file)
+        os.replace(tmp_path, self.path())
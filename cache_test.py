@@ -0,0 +1,62 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, time, shutil, tempfile, unittest
+
+from cache import *
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_missing(self):
+        cache = DiskCache('fake', 60, self.cache_dir)
+        self.assertEqual(cache.get('fake-key'), None)
+        self.assertEqual(cache.get('fake-key', []), [])
+
+    def test_set_get(self):
+        cache = DiskCache('fake', 60, self.cache_dir)
+        cache.set('fake-key', ['fake-user1', 'fake-user2'])
+        self.assertEqual(cache.get('fake-key'), ['fake-user1', 'fake-user2'])
+        self.assertTrue(os.path.exists(cache.path()))
+
+    def test_persisted(self):
+        DiskCache('fake', 60, self.cache_dir).set('fake-key', 1)
+        self.assertEqual(DiskCache('fake', 60, self.cache_dir).get('fake-key'), 1)
+        self.assertEqual(DiskCache('other', 60, self.cache_dir).get('fake-key'), None)
+
+    def test_expired(self):
+        cache = DiskCache('fake', 60, self.cache_dir)
+        cache.set('fake-key', 1)
+        cache._entries()['fake-key']['at'] = time.time() - 61
+        self.assertEqual(cache.get('fake-key'), None)
+        self.assertEqual(cache.keys(), [])
+
+    def test_no_ttl(self):
+        cache = DiskCache('fake', 0, self.cache_dir)
+        cache.set('fake-key', 1)
+        cache._entries()['fake-key']['at'] = 0
+        self.assertEqual(cache.get('fake-key'), 1)
+
+    def test_delete(self):
+        cache = DiskCache('fake', 60, self.cache_dir)
+        cache.set('fake-key', 1)
+        cache.delete('fake-key')
+        self.assertEqual(DiskCache('fake', 60, self.cache_dir).get('fake-key'), None)
+
+if __name__ == '__main__':
+    unittest.main()
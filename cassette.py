@@ -0,0 +1,186 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, gzip, json, time, threading
+
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+# response headers PyGithub reads, the others are not recorded
+RECORDED_HEADERS = ['content-type', 'etag', 'last-modified', 'link', 'location', 'retry-after', 'x-ratelimit-limit',
+                    'x-ratelimit-remaining', 'x-ratelimit-reset', 'x-ratelimit-resource', 'x-ratelimit-used']
+
+# mimics the httplib response PyGithub reads
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.body
+
+# mimics the httplib connection PyGithub makes requests with, injected in
+# PyGithub's Requester, which then makes a connection per request
+class Connection:
+    protocol = 'https'
+    cassette = None
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retry = retry
+        self.pool_size = pool_size
+        self.verify = kwargs.get('verify', True)
+
+    def request(self, verb, url, input, headers, stream=False):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self):
+        return self.cassette.exchange(self)
+
+    def close(self):
+        pass
+
+    def full_url(self):
+        port = ':{port}'.format(port=self.port) if self.port else ''
+        return '{protocol}://{host}{port}{url}'.format(protocol=self.protocol, host=self.host, port=port, url=self.url)
+
+# the HTTP exchanges of a run in DIR/cassette.jsonl.gz, one JSON object per
+# line: recorded from GitHub with mode 'record', served back with 'replay'
+# without network, waiting the recorded durations with latency, and the base
+# URL recorded from in DIR/cassette.json
+class Cassette:
+    FILE_NAME = 'cassette.jsonl.gz'
+    META_FILE_NAME = 'cassette.json'
+    def __init__(self, directory, mode, latency=False, base_url=None):
+        self.directory = directory
+        self.mode = mode # 'record' or 'replay'
+        self.latency = latency
+        self.base_url = base_url # None for api.github.com, read from the cassette on replay
+        self.exchanges = [] # recorded ones
+        self.replays = {} # {key: [exchange, ...]} left to serve
+        self.misses = 0
+        self.recording = 0 # exchanges in progress, e.g., pages prefetched in the background
+        self.session = None
+        self.lock = threading.Condition()
+        if mode == 'replay':
+            self.load()
+
+    def file_name(self):
+        return os.path.join(self.directory, self.FILE_NAME)
+
+    def meta_file_name(self):
+        return os.path.join(self.directory, self.META_FILE_NAME)
+
+    # requests are matched by method, path and sorted query, the host is ignored
+    def key(self, verb, url):
+        parsed = urlparse(url)
+        return '{verb} {path}?{query}'.format(verb=verb, path=parsed.path, query=urlencode(sorted(parse_qsl(parsed.query))))
+
+    def exists(self):
+        return os.path.exists(self.file_name())
+
+    def load(self):
+        if os.path.exists(self.meta_file_name()):
+            with open(self.meta_file_name()) as file:
+                self.base_url = json.load(file).get('base_url')
+        if not self.exists():
+            return
+        with gzip.open(self.file_name(), 'rt', encoding='utf-8') as file:
+            for line in file:
+                exchange = json.loads(line)
+                self.replays.setdefault(exchange['key'], []).append(exchange)
+
+    # saves the exchanges recorded, waiting up to timeout seconds for those in progress
+    def save(self, timeout=30):
+        if self.mode != 'record':
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            self.lock.wait_for(lambda: self.recording == 0, timeout)
+            exchanges = list(self.exchanges)
+        with gzip.open(self.file_name(), 'wt', encoding='utf-8') as file:
+            for exchange in exchanges:
+                file.write(json.dumps(exchange, separators=(',', ':'), sort_keys=True) + '\n')
+        # the pages recorded link to this base URL, which PyGithub checks
+        with open(self.meta_file_name(), 'w') as file:
+            json.dump({'base_url': self.base_url}, file)
+
+    def exchange(self, connection):
+        if self.mode == 'record':
+            return self._record(connection)
+        return self._replay(connection)
+
+    # requests.Session keeps connections alive and is shared by the threads
+    def _session(self, connection):
+        import requests
+        with self.lock:
+            if self.session == None:
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(max_retries=connection.retry or 0, pool_connections=connection.pool_size or 10, pool_maxsize=connection.pool_size or 10)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+            return self.session
+
+    def _record(self, connection):
+        session = self._session(connection)
+        with self.lock:
+            self.recording += 1
+        try:
+            start = time.time()
+            r = session.request(connection.verb, connection.full_url(), headers=connection.headers, data=connection.input,
+                                timeout=connection.timeout, verify=connection.verify, allow_redirects=False)
+            headers = dict([(name.lower(), value) for name, value in r.headers.items() if name.lower() in RECORDED_HEADERS])
+            exchange = {'key': self.key(connection.verb, connection.url), 'status': r.status_code, 'headers': headers,
+                        'body': r.text or '', 'seconds': round(time.time() - start, 3)}
+            with self.lock:
+                self.exchanges.append(exchange)
+        finally:
+            with self.lock:
+                self.recording -= 1
+                self.lock.notify_all()
+        return Response(r.status_code, r.headers, r.text or '')
+
+    # exchanges of a key are served in the order recorded, the last one repeatedly
+    def _replay(self, connection):
+        key = self.key(connection.verb, connection.url)
+        with self.lock:
+            exchanges = self.replays.get(key)
+            if exchanges == None:
+                self.misses += 1
+                return Response(404, {'Content-Type': 'application/json'}, json.dumps({'message': 'not recorded: ' + key}))
+            exchange = exchanges.pop(0) if len(exchanges) > 1 else exchanges[0]
+        if self.latency:
+            time.sleep(exchange['seconds'])
+        return Response(exchange['status'], exchange['headers'], exchange['body'])
+
+    # makes PyGithub send all requests through this cassette
+    def install(self):
+        from github.Requester import Requester
+        class HTTPConnection(Connection):
+            protocol = 'http'
+        class HTTPSConnection(Connection):
+            protocol = 'https'
+        HTTPConnection.cassette = HTTPSConnection.cassette = self
+        Requester.injectConnectionClasses(HTTPConnection, HTTPSConnection)
+
+    def uninstall(self):
+        from github.Requester import Requester
+        Requester.resetConnectionClasses()
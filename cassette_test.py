@@ -0,0 +1,102 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, gzip, json, time, shutil, tempfile, unittest
+
+from datetime import datetime
+
+from github import GithubException
+
+from client import GHClient
+from synthetic import SyntheticOrg
+from fake_server import FakeServer
+from cassette import *
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.cassette_dir = tempfile.mkdtemp()
+        self.server = FakeServer(SyntheticOrg(repos=2, prs=150, reviews=1, issues=10, users=5, year=2020)).start()
+        self.start_date, self.end_date = datetime(2020, 3, 1), datetime(2020, 3, 31)
+
+    def tearDown(self):
+        Cassette(self.cassette_dir, 'record').uninstall()
+        self.server.stop()
+        shutil.rmtree(self.cassette_dir)
+
+    def __client(self):
+        client = GHClient('fake-access-token', base_url=self.server.base_url())
+        client.set_resilience(0, 0, 5)
+        return client
+
+    def __record(self):
+        client = self.__client()
+        client.record(self.cassette_dir)
+        repo = client.repos('synthetic-org')[0]
+        counts = client.issues_prs_counts(repo, None, self.start_date, self.end_date)
+        client.save_cassette()
+        return counts
+
+    def test_key(self):
+        cassette = Cassette(self.cassette_dir, 'record')
+        self.assertEqual(cassette.key('GET', '/repos/o/r/pulls?state=closed&page=2'), cassette.key('GET', 'https://fake-host/repos/o/r/pulls?page=2&state=closed'))
+
+    def test_record(self):
+        self.__record()
+        with gzip.open(os.path.join(self.cassette_dir, Cassette.FILE_NAME), 'rt') as file:
+            exchanges = [json.loads(line) for line in file]
+        self.assertEqual(len(exchanges), self.server.total_requests())
+        self.assertEqual(exchanges[0]['key'], 'GET /orgs/synthetic-org?')
+        self.assertTrue('etag' in exchanges[0]['headers'])
+        self.assertFalse('server' in exchanges[0]['headers'])
+
+    def test_replay(self):
+        counts = self.__record()
+        requests = self.server.total_requests()
+        client = self.__client()
+        client.replay(self.cassette_dir)
+        repo = client.repos('synthetic-org')[0]
+        self.assertEqual(client.issues_prs_counts(repo, None, self.start_date, self.end_date), counts)
+        self.assertEqual(self.server.total_requests(), requests)
+        self.assertEqual(client.cassette.misses, 0)
+
+    def test_replay_recorded_base_url(self):
+        counts = self.__record()
+        client = GHClient(None)
+        client.set_resilience(0, 0, 5)
+        client.replay(self.cassette_dir)
+        self.assertEqual(client.base_url, self.server.base_url())
+        repo = client.repos('synthetic-org')[0]
+        self.assertEqual(client.issues_prs_counts(repo, None, self.start_date, self.end_date), counts)
+        self.assertEqual(client.cassette.misses, 0)
+
+    def test_replay_miss(self):
+        self.__record()
+        client = self.__client()
+        client.replay(self.cassette_dir)
+        repo = client.repos('synthetic-org')[0]
+        with self.assertRaises(GithubException):
+            client.stats_contributors(repo)
+        self.assertEqual(client.cassette.misses, 1)
+
+    def test_replay_latency(self):
+        cassette = Cassette(self.cassette_dir, 'replay', latency=True)
+        cassette.replays = {'GET /fake?': [{'status': 200, 'headers': {}, 'body': '[]', 'seconds': 0.2}]}
+        connection = Connection('fake-host')
+        connection.request('GET', '/fake', None, {})
+        start = time.time()
+        self.assertEqual(cassette.exchange(connection).status, 200)
+        self.assertTrue(time.time() - start >= 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,20 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import io, sys, yaml, json, csv, os.path
+import io, sys, copy, math, time, heapq, json, csv, common, os.path
 
 from datetime import datetime
 from calendar import monthrange
-from tabulate import tabulate
 
+from cache import DiskCache
 from client import GHClient
+from contributors import ContributorIndex
+from scheduler import RepoScheduler, PriorityGate
+from resilience import Resilience
+from stream import RecordStream
+from store import CountsMatrix
+from profiler import Profiler
+from progress import Progress
+from aggregate import Aggregator
+from cassette import Cassette
 
 from common import *
 
+# yaml and tabulate are imported on first use so that invalid options are
+# reported without loading the output dependencies
+def tabulate(*args, **kwargs):
+    from tabulate import tabulate
+    return tabulate(*args, **kwargs)
+
 def parse_credentials_map(file_name):
     credentials_map = {'gh_access_token': ''}
     try:
         with open(file_name) as file:
+            import yaml
             loaded_credentials = yaml.load(file, Loader=yaml.FullLoader)
             credentials_map.update(loaded_credentials)
     except:
@@ -51,7 +67,15 @@ class CLI:
         self.args = args
         self.credentials = self.__setup_credentials()
         if self.args['--verbose']:
-            VERBOSE = True
+            common.VERBOSE = True
+        common.STDERR = self.__streams_to_stdout()
+
+    # records streamed to stdout must not be mixed with status and warnings
+    def __streams_to_stdout(self):
+        if self.args.get('--file'):
+            return False
+        output = self.args.get('--output')
+        return output in Command.OUTPUT_NDJSON or (output in Command.OUTPUT_CSV and bool(self.args.get('--stream')))
 
     def __parse_credentials(self):
         file_name = '.ghtrack.yml'
@@ -67,8 +91,11 @@ class CLI:
         return Credentials(credentials_hash)
 
     def command(self, client=None):
-        if client == None:
-            client = GHClient(self.credentials.access_token())
+        if client == None and self.args.get('--events') and not self.args.get('webhook'):
+            from events import EventStore, EventsClient
+            client = EventsClient(EventStore(self.args['--events']))
+        elif client == None:
+            client = GHClient(self.credentials.access_token(), base_url=self.args.get('--base-url'))
         if self.args.get('commits') and self.args['commits']:
             return Commits(self.args, self.credentials, client)
         elif self.args.get('reviews') and self.args['reviews']:
@@ -79,12 +106,18 @@ class CLI:
             return Issues(self.args, self.credentials, client)
         elif self.args.get('stats') and self.args['stats']:
             return Stats(self.args, self.credentials, client)
+        elif self.args.get('batch') and self.args['batch']:
+            return Batch(self.args, self.credentials, client)
+        elif self.args.get('serve') and self.args['serve']:
+            return Serve(self.args, self.credentials, client)
+        elif self.args.get('webhook') and self.args['webhook']:
+            return Webhook(self.args, self.credentials, client)
         else:
             raise Exception("Invalid command")
 
 class Command:
     BOOL_OPTIONS = ['--summarize']
-    LIST_OPTIONS = ['--users', '--repos', '--skip-repos']
+    LIST_OPTIONS = ['--users', '--team', '--teams', '--repos', '--skip-repos', '--group-by']
     MONTHS_CAP = {'January':1, 'February':2, 'March':3, 'April':4, 'May':5, 'June':6, 'July':7, 'August':8, 'September':9, 'October':10, 'November':11, 'December':12}
     MONTHS_LOWER = {'january':1, 'february':2, 'march':3, 'april':4, 'may':5, 'june':6, 'july':7, 'august':8, 'september':9, 'october':10, 'november':11, 'december':12}
     MONTHS_UPPER = {'JANUARY':1, 'FEBRUARY':2, 'MARCH':3, 'APRIL':4, 'MAY':5, 'JUNE':6, 'JULY':7, 'AUGUST':7, 'SEPTEMBER':9, 'OCTOBER':10, 'NOVEMBER':11, 'DECEMBER':12}
@@ -92,16 +125,37 @@ class Command:
     OUTPUT_JSON = ['json', 'jsn', 'JSON', 'JSN']
     OUTPUT_YAML = ['yaml', 'yml', 'YAML', 'YML']
     OUTPUT_CSV = ['csv', 'CSV']
+    OUTPUT_NDJSON = ['ndjson', 'NDJSON', 'jsonl', 'JSONL']
     SECONDS_MULIPLIER = {'s':1, 'm':60, 'h':3600, 'd':24*3600}
+    PLAN_CALL_SECONDS = 0.5 # average GitHub API call latency used for --plan durations
+    RATE_LIMIT_WINDOW = 3600
     def __init__(self, args, credentials, client):
         self.__init_empty_options(args)
         self.args = args
         self.credentials = credentials
         self.client = client
+        self.profiler = Profiler(self.profile_file() != None, self.profile_cpu(), self.profile_memory())
+        self.profiler.start()
+        self.progress = Progress(calls_func=lambda: self.client.total_calls, quota_func=self.client.quota_remaining)
         self.rate_limit_data = self._init_rate_limit_data()
-        self.client.set_rate_limit_data(self.rate_limit_data)
+        if not self.client.configured:
+            self._configure_client()
+        with self.profiler.span('resolve/teams'):
+            self._init_users_from_teams()
         self.repos_stats = self._init_repos_stats()
         self.summary_stats = self._init_summary_stats()
+        self.contributor_index = None
+        self.scheduler = RepoScheduler(self.workers(), DiskCache(self._schedule_name(), 0), self.client.repo_calls)
+        self.users_states = {} # with --state=all {data: {user: {repo: {state: count}}}}
+        self.states_stats = {} # with --state=all {data: {repo: {state: total}}}
+        self.deadline = None
+        self.completeness = {} # with --max-runtime {data: {repo: 'complete'|'partial'|'missing'}}
+        self.stream = None
+        self.outputs = None # output maps kept instead of printed, see Serve
+        self.shared_pulls = None # see pulls_shared_with_reviews
+        self.aggregator = Aggregator([('data', 'repo')])
+        if len(self.group_by()) > 0 and self.check_group_by():
+            self.aggregator.add_grouping(self.group_by())
         self.__month_number = 0
 
     def __init_empty_options(self, args):
@@ -109,7 +163,7 @@ class Command:
             if args[option] == None:
                 args[option] = False
         for option in self.LIST_OPTIONS:
-            if args[option] == None or args[option] == '':
+            if args.get(option) == None or args[option] == '':
                 args[option] = []
             elif isinstance(args[option], str):
                 if ',' in args[option]:
@@ -117,20 +171,50 @@ class Command:
                 else:
                     args[option] = [args[option]]
 
-    def _init_request(self, map, data_name):
-        map['request'] = {}
-        map['request']['org'] = self.org()
-        map['request']['state'] = self.state()
-        map['request']['year'] = self.year()
-        map['request']['month'] = self.month()
-        map['request']['data'] = data_name
+    def _request_map(self, data_name):
+        request = {}
+        request['org'] = self.org()
+        request['state'] = self.state()
+        request['year'] = self.year()
+        request['month'] = self.month()
+        request['data'] = data_name
+        return request
+
+    def _init_request(self, users_stats, data_name):
+        users_stats.request = self._request_map(data_name)
 
     def _init_users_stats(self, users_stats):
-        for user in self.users():
-            users_stats[user] = {}
-            for repo in self.repos():
-                if repo not in self.skip_repos():
-                    users_stats[user][repo] = 0
+        users_stats.add(self.users(), self.tracked_repos())
+
+    # users x repos counts, only the non-zero ones are kept unless showing all stats
+    def _new_users_stats(self):
+        return CountsMatrix(sparse=not self.show_all_stats())
+
+    # adds members of --team and --teams to --users, memberships are cached on disk for --teams-ttl
+    def _init_users_from_teams(self):
+        # an invalid --teams-ttl is rejected by check_required_options
+        if len(self.teams()) == 0 or not self.check_teams_ttl():
+            return
+        cache = DiskCache('teams', self._duration_seconds(self.teams_ttl()))
+        users = list(self.users())
+        known_users = set(users)
+        for team in self.teams():
+            org, slug = self.org(), team
+            if '/' in team:
+                org, slug = team.split('/', 1)
+            key = "{org}/{slug}".format(org=org, slug=slug)
+            if self.nested_teams():
+                key += "+nested"
+            members = cache.get(key)
+            if members == None:
+                Console.print("Getting members of team '{team}' in organization: '{org}'".format(team=slug, org=org))
+                members = self.client.team_members(org, slug, self.nested_teams())
+                cache.set(key, members)
+            for member in members:
+                if member not in known_users:
+                    known_users.add(member)
+                    users.append(member)
+        self.args['--users'] = users
 
     def _init_repos_stats(self):
         repo_stats = {} #{'repo_name': {'commits': 0, 'prs': 0, 'reviews': 0, 'issues': 0},  ...}
@@ -178,15 +262,24 @@ class Command:
 
     # returns --rl-sleep value in seconds, so 1h == 3600
     def _parse_rl_sleep(self):
-        sleep_seconds = 0
-        rl_sleep = self.rl_sleep()
+        return self._parse_duration(self.rl_sleep(), '--rl-sleep')
+
+    # returns a duration value like 30m, 1h or 2d in seconds
+    def _parse_duration(self, duration, option):
+        seconds = self._duration_seconds(duration)
+        if seconds == None:
+            Console.warn("Error parsing {option} value '{duration}".format(option=option, duration=duration))
+            return 0
+        return seconds
+
+    # same as _parse_duration without warning, None when invalid
+    def _duration_seconds(self, duration):
         try:
-            unit = rl_sleep[len(rl_sleep)-1:]
-            value = int(rl_sleep[0:len(rl_sleep)-1])
-            sleep_seconds = self.SECONDS_MULIPLIER[unit.lower()]*value
+            unit = duration[len(duration)-1:]
+            value = int(duration[0:len(duration)-1])
+            return self.SECONDS_MULIPLIER[unit.lower()]*value
         except:
-            Console.warn("Error parsing --rl-sleep value '{rl_sleep}".format(rl_sleep=self.rl_sleep()))
-        return sleep_seconds
+            return None
 
     def _write_map_as_csv(self, output_stream, output_map):
         writer = csv.DictWriter(output_stream, output_map.keys())
@@ -198,41 +291,80 @@ class Command:
         for item in output_list:
             writer.writerow(item)
 
+    # the states data is broken down into, with --state=all commits which have no
+    # state are only collected under 'all'
+    def _data_states(self, data):
+        if self.all_states() and data in self.users_states:
+            return GHClient.STATES
+        return [self.state()]
+
+    def _user_repo_state_count(self, data, user, repo, state, user_repos_map):
+        if self.all_states() and data in self.users_states:
+            return self.users_states[data].get(user, {}).get(repo, {}).get(state, 0)
+        return user_repos_map.get(repo, 0)
+
+    # [(state, total), ...] for data in repo
+    def _repo_states_totals(self, data, repo, total):
+        if self.all_states() and data in self.states_stats:
+            return [(state, self.states_stats[data].get(repo, {}).get(state, 0)) for state in GHClient.STATES]
+        return [(self.state(), total)]
+
+    # 'complete', 'partial' or 'missing' for the counts of data in repo, those
+    # not collected before the --max-runtime deadline are not complete
+    def _completeness_status(self, data, repo):
+        return self.completeness.get(data, {}).get(repo, 'complete')
+
     def _extract_user_repo_data(self, request_data, users_repos_map):
         users_repos_data = []
-        data_headers = ['user', 'repo', 'data', 'count']
+        data_headers = ['user', 'repo', 'data', 'state', 'count']
+        if self.deadline != None:
+            data_headers.append('completeness')
         users_repos_data.append(data_headers)
         for user in self.users():
+            user_repos_map = users_repos_map.get(user, {})
             for repo in self.repos():
                 if repo not in self.skip_repos():
-                    users_repos_data_count = 0
-                    if repo in users_repos_map[user]:
-                        users_repos_data_count = users_repos_map[user][repo]
-                        if users_repos_data_count == 0 and not self.show_all_stats():
-                            continue
-                        users_repos_data.append([user, repo, request_data, users_repos_data_count])
+                    status = self._completeness_status(request_data, repo)
+                    if repo in user_repos_map or status != 'complete':
+                        for state in self._data_states(request_data):
+                            users_repos_data_count = self._user_repo_state_count(request_data, user, repo, state, user_repos_map)
+                            if users_repos_data_count == 0 and status == 'complete' and not self.show_all_stats():
+                                continue
+                            row = [user, repo, request_data, state, users_repos_data_count]
+                            if self.deadline != None:
+                                row.append(status)
+                            users_repos_data.append(row)
         return users_repos_data
 
     def _extract_repos_stats_table(self):
-        header = ['repo', 'data', 'total']
+        header = ['repo', 'data', 'state', 'total']
+        if self.deadline != None:
+            header.append('completeness')
         table = []
         for repo in self.repos():
             if repo not in self.skip_repos():
                 repo_stats = self.repos_stats[repo]
                 for item in repo_stats:
-                    row = [repo, item, repo_stats[item]]
-                    table.append(row)
+                    for state, total in self._repo_states_totals(item, repo, repo_stats[item]):
+                        row = [repo, item, state, total]
+                        if self.deadline != None:
+                            row.append(self._completeness_status(item, repo))
+                        table.append(row)
         return (header, table)
 
     def _extract_summary_stats_table(self):
-        header = ['data', 'repo', 'total']
+        header = ['data', 'repo', 'state', 'total']
+        if self.deadline != None:
+            header.append('completeness')
         table = []
         for data in self.summary_stats.keys():
             data_stats = self.summary_stats[data]
             for repo in self.repos():
-                if repo not in self.skip_repos():
-                    for item in data_stats:
-                        row = [data, repo, data_stats[item]]
+                if repo not in self.skip_repos() and repo in data_stats:
+                    for state, total in self._repo_states_totals(data, repo, data_stats[repo]):
+                        row = [data, repo, state, total]
+                        if self.deadline != None:
+                            row.append(self._completeness_status(data, repo))
                         table.append(row)
         return (header, table)
 
@@ -245,10 +377,56 @@ class Command:
             self._print_output_yml(self.summary_stats)
         elif self.output() in self.OUTPUT_CSV:
             self._print_summarize_output_cvs()
+        elif self.output() in self.OUTPUT_NDJSON:
+            self._print_summarize_output_ndjson()
         else:
             self._print_summarize_output_text()
         Console.println()
 
+    # the totals of the --group-by dimensions, after the command output
+    def _print_group_by_output(self):
+        if len(self.group_by()) == 0:
+            return
+        header, table = self.aggregator.table(self.group_by())
+        group_by_map = {'group_by': self.group_by(), 'totals': [dict(zip(header, row)) for row in table]}
+        if self.outputs != None:
+            self.outputs.append(group_by_map)
+            return
+        if self.stream != None and self.stream.format == 'ndjson':
+            for total in group_by_map['totals']:
+                total['summary'] = 'group'
+                self.stream.write(total)
+            self.stream.flush()
+        elif self.output() in self.OUTPUT_JSON:
+            self._print_output_json(group_by_map)
+        elif self.output() in self.OUTPUT_YAML:
+            self._print_output_yml(group_by_map)
+        elif self.output() in self.OUTPUT_CSV:
+            self._print_list_csv([header, *table])
+        else:
+            Console.println()
+            print(tabulate(table, headers=header))
+        Console.println()
+
+    def _print_list_csv(self, output_list):
+        Console.println()
+        if self.file() == None or self.file() == '':
+            output_stream = io.StringIO()
+            self._write_list_as_csv(output_stream, output_list)
+            Console.print(output_stream.getvalue())
+        else:
+            with open(self.file(), 'a', newline='') as csv_file:
+                csv_file.write('\n')
+                self._write_list_as_csv(csv_file, output_list)
+
+    def _print_summarize_output_ndjson(self):
+        for summary, (header, table) in [('repo', self._extract_repos_stats_table()), ('data', self._extract_summary_stats_table())]:
+            for row in table:
+                record = dict(zip(header, row))
+                record['summary'] = summary
+                self.stream.write(record)
+        self.stream.flush()
+
     def _print_summarize_output_text(self):
         Console.println(2)
         header, table = self._extract_repos_stats_table()
@@ -290,6 +468,7 @@ class Command:
                 json_file.write(text_output)
 
     def _print_output_yml(self, output_map):
+        import yaml
         Console.println()
         if self.file() == None or self.file() == '':
             Console.print(yaml.dump(output_map))
@@ -316,105 +495,381 @@ class Command:
                 self._write_list_as_csv(csv_file, users_repos_data)
 
     # data is one of 'commits', 'prs', 'reviews', 'issues'
-    # data_map is map {'user0': {'repo0': count0, 'repo1': count1, ...}, {...}}
-    # output: {'repo0': {'commits': total0, 'issues': total1, ...}, {...}}
-    def _update_repo_stats(self, data, data_map):
-        for user in self.users():
-            user_data_map = data_map[user]
-            for repo_name in user_data_map:
-                if repo_name in self.repos_stats:
-                    self.repos_stats[repo_name][data] += user_data_map[repo_name]
-                else:
-                    self.repos_stats[repo_name][data] = user_data_map[repo_name]
-                if self.repos_stats[repo_name][data] == 0 and not self.show_all_stats():
+    # output: {'repo0': {'commits': total0, 'issues': total1, ...}, {...}} from the aggregated totals
+    def _update_repo_stats(self, data):
+        totals = self.aggregator.totals(('data', 'repo'))
+        for repo_name in self.tracked_repos():
+            self.repos_stats.setdefault(repo_name, {})[data] = totals.get((data, repo_name), 0)
+        if not self.show_all_stats():
+            for repo_name in self.repos_stats:
+                if self.repos_stats[repo_name].get(data) == 0:
                     del(self.repos_stats[repo_name][data])
 
-
     # data is one of 'commits', 'prs', 'reviews', 'issues'
-    # data_map is map {'user0': {'repo0': count0, 'repo1': count1, ...}, {...}}
-    # output: {'commits': {'repo0': total0, 'repo1': total1, ...}, {...}}
-    def _update_summary_stats(self, data, data_map):
+    # output: {'commits': {'repo0': total0, 'repo1': total1, ...}, {...}} from the aggregated totals
+    def _update_summary_stats(self, data):
+        totals = self.aggregator.totals(('data', 'repo'))
+        for repo_name in self.tracked_repos():
+            self.summary_stats[data][repo_name] = totals.get((data, repo_name), 0)
+
+    # one pass over each tracked repo counting all users (or every author with --all-users)
+    def _update_users_data(self, data, users_map, counts_func, by_state=False):
+        self._update_users_datas([(data, users_map)], lambda repo, authors: [counts_func(repo, authors)], by_state)
+
+    # like _update_users_data for data_maps [(data, users_map), ...] filled from a
+    # single repo pass, counts_func returns one counts map per data
+    # with by_state counts maps are per state {state: {user: count}}
+    def _update_users_datas(self, data_maps, counts_func, by_state=False):
+        kinds = [data for data, users_map in data_maps]
+        phase = '+'.join(kinds)
+        with self.profiler.span('resolve/repos'):
+            repos = self.client.repos(self.org())
+        authors = None if self.all_users() else self.users()
+        tracked = None if authors == None else set(authors)
+        period = self.period()
+        index, sweep = self._init_contributor_index(kinds)
+        active_at = self.end_date().timestamp() # the activity counted is in the month
+        Console.print("Getting '{data}' for {users} in organization: '{org}'".format(data="' and '".join(kinds), users="all users" if authors == None else "{total_users} users".format(total_users=len(authors)), org=self.org()))
+        repos_authors = {} # {repo_name: authors}
+        for repo in repos:
+            if repo.name in self.repos() and repo.name not in self.skip_repos():
+                repo_authors = authors
+                if index != None and not sweep and authors != None:
+                    repo_authors = index.authors(kinds, period, self.state(), repo.name, authors)
+                    if len(repo_authors) == 0:
+                        continue
+                repos_authors[repo.name] = repo_authors
+        # a sweep of commits also indexes the weeks before the month from the contributor stats
+        index_contributors = index != None and sweep and 'commits' in kinds
+        def repo_work(repo):
+            contributors = self.client.stats_contributors(repo) if index_contributors else []
+            counts = counts_func(repo, repos_authors[repo.name])
+            return (contributors, counts, self.client.pop_partial(repo))
+        scheduled = [repo for repo in repos if repo.name in repos_authors]
+        self.progress.skip((len(self.tracked_repos()) - len(scheduled)) * len(kinds))
+        priority = None
+        if self.deadline != None:
+            priority = lambda repo: self._repo_priority(repo, repos_authors[repo.name])
+            for data in kinds:
+                self.completeness.setdefault(data, {}).update([(repo.name, 'missing') for repo in scheduled])
+        count = 1
+        with self.profiler.span('collect/' + phase):
+            for repo, (contributors, repo_counts, partial) in self.scheduler.run(scheduled, repo_work, kinds, priority):
+                count += 1
+                items = 0
+                with self.profiler.span('aggregate/' + phase):
+                    if self.deadline != None:
+                        for data in kinds:
+                            self.completeness[data][repo.name] = 'partial' if partial else 'complete'
+                    if index_contributors:
+                        index.add_contributors(repo.name, contributors)
+                    for (data, users_map), counts in zip(data_maps, repo_counts):
+                        states_counts = None
+                        if by_state:
+                            states_counts = counts
+                            counts = self._update_users_states(data, repo.name, counts)
+                        self._stream_counts(data, repo.name, counts, states_counts)
+                        self._aggregate_counts(data, repo.name, period, counts, states_counts, tracked)
+                        items += sum(counts.values())
+                        for user in counts:
+                            if index != None and counts[user] > 0:
+                                index.add_activity(data, user, repo.name, active_at)
+                            if counts[user] == 0 and not self.show_all_stats():
+                                continue
+                            users_map.set(user, repo.name, counts[user])
+                if self.stream == None or not self.stream.to_stdout():
+                    self.progress.advance(len(kinds), items, "'{data}' of {repo}".format(data="' and '".join(kinds), repo=repo.name))
+        # repos not started before the deadline
+        self.progress.skip((len(scheduled) - count + 1) * len(kinds))
+        self.progress.finish()
+        self.scheduler.print_report()
+        with self.profiler.span('aggregate/' + phase):
+            for data, users_map in data_maps:
+                if self.all_users():
+                    self._add_found_users(users_map)
+                self._stream_missing(data, scheduled)
+                self._update_repo_stats(data)
+                self._update_summary_stats(data)
+            self._save_contributor_index(kinds, sweep)
+
+    # (user, state, count) of the counts of a repo, per state with --state=all
+    def _users_states_counts(self, counts, states_counts=None):
+        for user in counts:
+            if states_counts == None:
+                yield (user, self.state(), counts[user])
+            else:
+                for state in states_counts:
+                    yield (user, state, states_counts[state].get(user, 0))
+
+    # writes the counts of a completed repo to the --output ndjson (or --stream csv) stream,
+    # with --max-runtime marked complete or partial as the other outputs
+    def _stream_counts(self, data, repo_name, counts, states_counts=None):
+        if self.stream == None:
+            return
+        status = self._completeness_status(data, repo_name)
+        for user, state, count in self._users_states_counts(counts, states_counts):
+            if count == 0 and not self.show_all_stats() and status == 'complete':
+                continue
+            self._stream_record(data, user, repo_name, state, count, status)
+        self.stream.flush()
+
+    # records of count 0 for the tracked users in the repos never started before the --max-runtime deadline
+    def _stream_missing(self, data, repos):
+        if self.stream == None or self.deadline == None:
+            return
+        states = GHClient.STATES if self.all_states() else [self.state()]
+        for repo in repos:
+            if self._completeness_status(data, repo.name) != 'missing':
+                continue
+            for user in self.users():
+                for state in states:
+                    self._stream_record(data, user, repo.name, state, 0, 'missing')
+        self.stream.flush()
+
+    def _stream_record(self, data, user, repo_name, state, count, status):
+        record = {'user': user, 'repo': repo_name, 'data': data, 'state': state, 'count': count}
+        if self.deadline != None:
+            record['completeness'] = status
+        self.stream.write(record)
+
+    # adds the counts of the tracked users (all with None) in a completed repo to the running totals
+    def _aggregate_counts(self, data, repo_name, period, counts, states_counts, tracked):
+        for user, state, count in self._users_states_counts(counts, states_counts):
+            if count == 0 or (tracked != None and user not in tracked):
+                continue
+            self.aggregator.add({'user': user, 'repo': repo_name, 'data': data, 'state': state, 'period': period}, count)
+
+    def _open_stream(self):
+        fields = RecordStream.FIELDS
+        if self.deadline != None:
+            fields = fields + ['completeness']
+        if self.output() in self.OUTPUT_NDJSON:
+            return RecordStream('ndjson', self.file(), fields)
+        elif self.output() in self.OUTPUT_CSV and self.stream_output():
+            return RecordStream('csv', self.file(), fields)
+        return None
+
+    # with --max-runtime, repos recently pushed to and where more of the tracked
+    # users were active are collected first
+    def _repo_priority(self, repo, authors):
+        priority = 0
+        pushed_at = getattr(repo, 'pushed_at', None)
+        if pushed_at != None and pushed_at.timestamp() >= self.start_date().timestamp():
+            priority += 1
+        if self.contributor_index != None and authors != None:
+            priority += len([user for user in authors if self.contributor_index.active(user, repo.name)])
+        return priority
+
+    # records the per state counts of data in repo and returns the users totals
+    def _update_users_states(self, data, repo_name, states_counts):
+        counts = {}
+        users_states = self.users_states.setdefault(data, {})
+        repo_states = self.states_stats.setdefault(data, {}).setdefault(repo_name, {})
+        for state in states_counts:
+            for user in states_counts[state]:
+                count = states_counts[state][user]
+                counts[user] = counts.get(user, 0) + count
+                repo_states[state] = repo_states.get(state, 0) + count
+                if count > 0 or self.show_all_stats():
+                    users_states.setdefault(user, {}).setdefault(repo_name, {})[state] = count
+        return counts
+
+    # returns the contributor index (or None) and whether kinds need a full sweep of all repos
+    def _init_contributor_index(self, kinds):
+        if not self.use_contributor_index():
+            return (None, False)
+        if self.contributor_index == None:
+            self.contributor_index = ContributorIndex(self.org())
+        sweep_period = self._parse_duration(self.index_sweep(), '--index-sweep')
+        sweep = any([self.contributor_index.needs_sweep(data, sweep_period, self.period(), self.state()) for data in kinds])
+        if sweep:
+            Console.print("Contributor index for '{data}' in '{org}' is stale or misses {period}, doing a full sweep of all repos".format(data="' and '".join(kinds), org=self.org(), period=self.period()))
+        return (self.contributor_index, sweep)
+
+    # a sweep cut short by --max-runtime keeps the activity found but is not
+    # marked done, so that the next run sweeps again rather than skip repos
+    # never visited
+    def _save_contributor_index(self, kinds, sweep):
+        if self.contributor_index == None:
+            return
+        complete = all([status == 'complete' for data in kinds for status in self.completeness.get(data, {}).values()])
+        if sweep and not complete:
+            Console.verbose("Contributor index sweep of '{data}' cut short by --max-runtime, not marked done".format(data="' and '".join(kinds)))
+        elif sweep and not self.all_users():
+            for data in kinds:
+                self.contributor_index.mark_swept(data, self.period(), self.state(), self.users())
+        elif not sweep:
+            Console.verbose("Contributor index skipped {skipped} (user, repo) pairs".format(skipped=self.contributor_index.skipped))
+        self.contributor_index.save()
+
+    def _add_found_users(self, users_map):
+        found_users = set(self.users())
+        for user in users_map:
+            found_users.add(user)
+        self.args['--users'] = sorted(found_users)
+
+    # keeps only the --top most active users, by total count across users maps
+    def _select_top_users(self, *users_maps):
+        if self.top() <= 0:
+            return
+        totals = {}
         for user in self.users():
-            user_data_map = data_map[user]
-            for repo_name in user_data_map:
-                if repo_name in user_data_map:
-                    self.summary_stats[data][repo_name] += user_data_map[repo_name]
-                else:
-                    self.summary_stats[data][repo_name] = user_data_map[repo_name]
-                if self.repos_stats[repo_name][data] == 0 and not self.show_all_stats():
-                    del(self.repos_stats[repo_name][data])
+            totals[user] = 0
+            for users_map in users_maps:
+                totals[user] += users_map.user_total(user)
+        top_users = [user for user, total in heapq.nlargest(self.top(), totals.items(), key=lambda item: item[1])]
+        for users_map in users_maps:
+            for user in self.users():
+                if user not in top_users:
+                    users_map.remove_user(user)
+        self.args['--users'] = top_users
 
     def _update_users_issues(self):
-        repos = self.client.repos(self.org())
-        totalReposCount = repos.totalCount
-        for user in self.users():
-            Console.print("Getting 'issues' for '{user}' in organization: '{org}'".format(user=user, org=self.org()))
-            count = 1
-            for repo in repos:
-                Console.progress(count, totalReposCount, status="processing repos".format(name=repo.name))
-                if repo.name in self.repos() and repo.name not in self.skip_repos():
-                    issues_count = self.client.issues_count(repo, user, self.start_date(), self.end_date(), self.state())
-                    if issues_count == 0 and not self.show_all_stats():
-                            continue
-                    self.users_issues[user][repo.name] = issues_count
-                count += 1
-            Console.println()
-        self._update_repo_stats('issues', self.users_issues)
-        self._update_summary_stats('issues', self.users_issues)
+        self._update_users_data('issues', self.users_issues, lambda repo, authors: self.client.issues_counts(repo, authors, self.start_date(), self.end_date(), self.state(), self.all_states()), self.all_states())
 
     def _update_users_prs(self):
-        repos = self.client.repos(self.org())
-        for user in self.users():
-            totalReposCount = repos.totalCount
-            Console.print("Getting 'prs' for '{user}' in organization: '{org}'".format(user=user, org=self.org()))
-            count = 1
-            for repo in repos:
-                Console.progress(count, totalReposCount, status="processing repos".format(name=repo.name))
-                if repo.name in self.repos() and repo.name not in self.skip_repos():
-                    prs_count = self.client.prs_count(repo, user, self.start_date(), self.end_date(), self.state())
-                    if prs_count == 0 and not self.show_all_stats():
-                            continue
-                    self.users_prs[user][repo.name] = prs_count
-                count += 1
-            Console.println()
-        self._update_repo_stats('prs', self.users_prs)
-        self._update_summary_stats('prs', self.users_prs)
+        shared = self.pulls_shared_with_reviews()
+        def prs_counts(repo, authors):
+            if repo.name in shared:
+                return self.client.prs_counts(repo, authors, self.start_date(), self.end_date(), self.state(), self.all_states(), 'updated')
+            return self.client.prs_counts(repo, authors, self.start_date(), self.end_date(), self.state(), self.all_states())
+        self._update_users_data('prs', self.users_prs, prs_counts, self.all_states())
+
+    # PRs and issues from the same issues listing
+    def _update_users_prs_issues(self):
+        self._update_users_datas([('prs', self.users_prs), ('issues', self.users_issues)], lambda repo, authors: self.client.issues_prs_counts(repo, authors, self.start_date(), self.end_date(), self.state(), self.all_states()), self.all_states())
 
     def _update_users_reviews(self):
-        repos = self.client.repos(self.org())
-        totalReposCount = repos.totalCount
-        for user in self.users():
-            Console.print("Getting 'reviews' for '{user}' in organization: '{org}'".format(user=user, org=self.org()))
-            count = 1
-            for repo in repos:
-                Console.progress(count, totalReposCount, status="processing repos".format(name=repo.name))
-                if repo.name in self.repos() and repo.name not in self.skip_repos():
-                    reviews_count = self.client.reviews_count(repo, user, self.start_date(), self.end_date())
-                    if reviews_count == 0 and not self.show_all_stats():
-                            continue
-                    self.users_reviews[user][repo.name] = reviews_count
-                count += 1
-            Console.println()
-        self._update_repo_stats('reviews', self.users_reviews)
-        self._update_summary_stats('reviews', self.users_reviews)
+        self._update_users_data('reviews', self.users_reviews, lambda repo, authors: self.client.reviews_counts(repo, authors, self.start_date(), self.end_date(), self.state(), self.all_states()), self.all_states())
 
     def _update_users_commits(self):
-        repos = self.client.repos(self.org())
-        totalReposCount = repos.totalCount
-        for user in self.users():
-            Console.print("Getting 'commits' for '{user}' in organization: '{org}'".format(user=user, org=self.org()))
-            count = 1
+        self._update_users_data('commits', self.users_commits, lambda repo, authors: self.client.commits_counts(repo, authors, self.start_date(), self.end_date()))
+
+    # the data kinds collected together in one pass over the repos
+    def data_groups(self):
+        groups = []
+        for data in self.data_kinds():
+            if data in ['prs', 'issues'] and self.prs_from_issues():
+                if ['prs', 'issues'] not in groups:
+                    groups.append(['prs', 'issues'])
+            else:
+                groups.append([data])
+        return groups
+
+    # {repo_name: {data: calls}} estimated for the tracked repos from the calls
+    # of past runs, otherwise from the first page of the listings needed
+    def estimate_calls(self):
+        repos = [repo for repo in self.client.repos(self.org()) if repo.name in self.repos() and repo.name not in self.skip_repos()]
+        shared = self.pulls_shared_with_reviews()
+        calls = {}
+        for kinds in self.data_groups():
+            index, sweep = self._init_contributor_index(kinds)
             for repo in repos:
-                Console.progress(count, totalReposCount, status="processing repos".format(name=repo.name))
-                if repo.name in self.repos() and repo.name not in self.skip_repos():
-                    commits_count = self.client.commits_count(repo, user, self.start_date(), self.end_date())
-                    if commits_count == 0 and not self.show_all_stats():
-                            continue
-                    self.users_commits[user][repo.name] = commits_count
-                count += 1
+                if index != None and not sweep and not self.all_users() and len(index.authors(kinds, self.period(), self.state(), repo.name, self.users())) == 0:
+                    continue
+                estimate = self.scheduler.past_calls(repo, kinds)
+                if estimate == None:
+                    estimate = self.client.estimate_calls(repo, kinds, self.state(), self.start_date(), repo.name in shared)
+                calls.setdefault(repo.name, {})['+'.join(kinds)] = math.ceil(estimate)
+        return calls
+
+    def _configure_client(self):
+        self.client.set_rate_limit_data(self.rate_limit_data)
+        self.client.set_prefetch(self.prefetch())
+        self.client.set_resilience(self.retries(), self._parse_duration(self.hedge_after(), '--hedge-after'), self._parse_duration(self.timeout(), '--timeout'))
+        if self.record_dir():
+            self.client.record(self.record_dir())
+        elif self.replay_dir():
+            self.client.replay(self.replay_dir(), self.replay_latency())
+        if self.profile_api() or self.profile_api_file():
+            self.client.api_telemetry.watch_responses()
+
+    # calls of past runs are kept per --state, e.g., all states need more reviews
+    def _schedule_name(self):
+        if self.state() in [None, 'closed']:
+            return 'schedule'
+        return 'schedule-' + self.state()
+
+    # API calls of each run to list the organization repos
+    def estimate_repos_calls(self):
+        return self.client.estimate_repos_calls(len(self.client.repos(self.org())))
+
+    # seconds to make total calls on the workers, waiting for the rate limit to reset when over
+    def _plan_duration(self, total, remaining, limit, reset_at):
+        seconds = total * self.PLAN_CALL_SECONDS / self.workers()
+        if total > remaining and limit > 0:
+            windows = math.ceil((total - remaining) / limit)
+            seconds += max(0, reset_at - time.time()) + (windows - 1) * self.RATE_LIMIT_WINDOW
+        return int(seconds)
+
+    # repos packed biggest first into runs of at most --budget calls, each run
+    # listing the repos again: [(calls, [repo, ...]), ...]
+    def _plan_chunks(self, calls, repos_calls=0):
+        chunks = []
+        repos_totals = sorted([(repo, sum(calls[repo].values())) for repo in calls], key=lambda item: item[1], reverse=True)
+        for repo, total in repos_totals:
+            if repos_calls + total > self.budget():
+                Console.warn("repo '{repo}' needs an estimated {total} API calls, more than --budget {budget}".format(repo=repo, total=repos_calls + total, budget=self.budget()))
+            chunk = None
+            for c in chunks:
+                if c[0] + total <= self.budget():
+                    chunk = c
+                    break
+            if chunk == None:
+                chunk = [repos_calls, []]
+                chunks.append(chunk)
+            chunk[0] += total
+            chunk[1].append(repo)
+        return [(total, sorted(repos)) for total, repos in chunks]
+
+    def _format_duration(self, seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return "{hours}h{minutes:02d}m{seconds:02d}s".format(hours=hours, minutes=minutes, seconds=seconds)
+
+    def plan_map(self):
+        calls = self.estimate_calls()
+        repos_calls = self.estimate_repos_calls()
+        total = repos_calls + sum([sum(repo_calls.values()) for repo_calls in calls.values()])
+        remaining, limit, reset_at = self.client.rate_limit_status()
+        plan = {}
+        plan['request'] = self._request_map('+'.join(self.data_kinds()))
+        plan['calls'] = calls
+        plan['repos_calls'] = repos_calls
+        plan['total'] = total
+        plan['rate_limit'] = {'remaining': remaining, 'limit': limit, 'reset_at': reset_at}
+        plan['duration'] = self._plan_duration(total, remaining, limit, reset_at)
+        if self.budget() > 0:
+            plan['chunks'] = [{'calls': chunk_calls, 'repos': repos} for chunk_calls, repos in self._plan_chunks(calls, repos_calls)]
+        return plan
+
+    # --plan prints the API calls the command would need instead of running it
+    def print_plan(self):
+        plan = self.plan_map()
+        if self.output() in self.OUTPUT_JSON:
+            self._print_output_json(plan)
+            return 0
+        elif self.output() in self.OUTPUT_YAML:
+            self._print_output_yml(plan)
+            return 0
+        Console.print("Plan for: {cmd_line}".format(cmd_line=self.cmd_line()))
+        Console.println()
+        calls, data_totals = plan['calls'], {}
+        for repo in calls:
+            for data in calls[repo]:
+                data_totals[data] = data_totals.get(data, 0) + calls[repo][data]
+        if self.verbose():
+            print(tabulate([[repo, data, calls[repo][data]] for repo in calls for data in calls[repo]], headers=['repo', 'data', 'calls']))
             Console.println()
-        self._update_repo_stats('commits', self.users_commits)
-        self._update_summary_stats('commits', self.users_commits)
+        rows = [[data, len([repo for repo in calls if data in calls[repo]]), data_totals[data]] for data in data_totals]
+        print(tabulate([['repos', '', plan['repos_calls']]] + rows, headers=['data', 'repos', 'calls']))
+        Console.println()
+        rate_limit = plan['rate_limit']
+        Console.print("Estimated {total} API calls, rate limit remaining {remaining} of {limit} resetting in {reset}".format(total=plan['total'], remaining=rate_limit['remaining'], limit=rate_limit['limit'], reset=self._format_duration(max(0, rate_limit['reset_at'] - time.time()))))
+        Console.print("Expected duration with {workers} workers: {duration}".format(workers=self.workers(), duration=self._format_duration(plan['duration'])))
+        for no, chunk in enumerate(plan.get('chunks', []), start=1):
+            Console.print("Run {no} ({calls} calls): {cmd_line}".format(no=no, calls=chunk['calls'], cmd_line=self.cmd_line(chunk['repos'])))
+        return 0
 
     def _init_repos_from_all_repos(self):
         repo_names = []
@@ -449,10 +904,21 @@ class Command:
             return True
         elif state == 'open':
             return True
+        elif state == 'all':
+            return True
         return False
 
+    def check_group_by(self):
+        for dim in self.group_by():
+            if dim not in Aggregator.DIMENSIONS:
+                Console.warn("Invalid --group-by dimension '{dim}', use any of: {dims}".format(dim=dim, dims=','.join(Aggregator.DIMENSIONS)))
+                return False
+        return True
+
     def check_credentials(self):
-        if self.credentials == None:
+        if self.replay_dir() or self.counts_from_events():
+            return True
+        elif self.credentials == None:
             Console.warn("Invalid credentials '{credentials}'".format(credentials=self.credentials))
             return False
         elif self.credentials.access_token() == '' or self.credentials.access_token() == None:
@@ -460,8 +926,19 @@ class Command:
             return False
         return True
 
+    def check_cassette(self):
+        if self.record_dir() and self.replay_dir():
+            Console.warn("Use only one of --record or --replay")
+            return False
+        elif self.replay_dir() and not Cassette(self.replay_dir(), 'record').exists():
+            Console.warn("No cassette to replay in '{replay}'".format(replay=self.replay_dir()))
+            return False
+        return True
+
     def check_required_options(self):
-        if not self.check_month(self.month()):
+        if not self.check_cassette():
+            return False
+        elif not self.check_month(self.month()):
             Console.warn("Invalid month '{month}'".format(month=self.month()))
             return False
         elif not self.check_org(self.org()):
@@ -470,8 +947,21 @@ class Command:
         elif not self.check_state(self.state()):
             Console.warn("Invalid state value '{state}'".format(state=self.state()))
             return False
+        elif not self.check_group_by():
+            return False
+        elif len(self.teams()) > 0 and not self.check_teams_ttl():
+            Console.warn("Invalid --teams-ttl value '{teams_ttl}', e.g., 30m or 1d".format(teams_ttl=self.teams_ttl()))
+            return False
+        elif self.show_plan() and self.counts_from_events():
+            Console.warn("--plan estimates GitHub API calls, there are none with --events")
+            return False
         return True
 
+    # a TTL of 0 would cache memberships forever
+    def check_teams_ttl(self):
+        seconds = self._duration_seconds(self.teams_ttl())
+        return seconds != None and seconds > 0
+
     def check_rl_max(self):
         if '--rl-max' not in self.args:
             return False
@@ -508,6 +998,9 @@ class Command:
     def state(self):
         return self.args['--state']
 
+    def all_states(self):
+        return self.state() == 'all'
+
     def year(self):
         return datetime.now().year
 
@@ -533,6 +1026,99 @@ class Command:
     def users(self):
         return self.args['--users']
 
+    # the repeatable --team and the --teams list
+    def teams(self):
+        return list(self.args.get('--team') or []) + list(self.args.get('--teams') or [])
+
+    def nested_teams(self):
+        return self.args.get('--nested-teams', False)
+
+    def teams_ttl(self):
+        return self.args.get('--teams-ttl') or '1d'
+
+    def prefetch(self):
+        return int(self.args.get('--prefetch') or 1)
+
+    # no repos are started after deadline, and those in flight stop reading further pages
+    def set_deadline(self, deadline):
+        self.deadline = deadline
+        self.client.set_deadline(deadline)
+        self.scheduler.set_deadline(deadline)
+
+    def retries(self):
+        return int(self.args.get('--retries') or Resilience.DEFAULT_RETRIES)
+
+    def hedge_after(self):
+        return self.args.get('--hedge-after') or "{seconds}s".format(seconds=Resilience.DEFAULT_HEDGE_AFTER)
+
+    def timeout(self):
+        return self.args.get('--timeout') or "{seconds}s".format(seconds=Resilience.DEFAULT_READ_TIMEOUT)
+
+    def group_by(self):
+        return self.args.get('--group-by') or []
+
+    # the month collected, e.g., '2020-03'
+    def period(self):
+        return "{year}-{month:02d}".format(year=self.year(), month=self.month_number())
+
+    def stream_output(self):
+        return self.args.get('--stream', False)
+
+    def record_dir(self):
+        return self.args.get('--record')
+
+    def replay_dir(self):
+        return self.args.get('--replay')
+
+    def replay_latency(self):
+        return self.args.get('--replay-latency', False)
+
+    def profile_api(self):
+        return self.args.get('--profile-api', False)
+
+    def profile_file(self):
+        return self.args.get('--profile')
+
+    def profile_cpu(self):
+        return self.args.get('--profile-cpu', False)
+
+    def profile_memory(self):
+        return self.args.get('--profile-memory', False)
+
+    def profile_api_file(self):
+        return self.args.get('--profile-api-file')
+
+    def events_file(self):
+        return self.args.get('--events')
+
+    # counted from the --events store instead of GitHub
+    def counts_from_events(self):
+        return self.events_file() != None
+
+    def max_runtime(self):
+        return self.args.get('--max-runtime')
+
+    def show_plan(self):
+        return self.args.get('--plan', False)
+
+    def budget(self):
+        return int(self.args.get('--budget') or 0)
+
+    def workers(self):
+        return int(self.args.get('--workers') or RepoScheduler.DEFAULT_WORKERS)
+
+    def use_contributor_index(self):
+        return self.args.get('--contributor-index', False)
+
+    def index_sweep(self):
+        return self.args.get('--index-sweep') or '7d'
+
+    def all_users(self):
+        return self.args.get('--all-users', False)
+
+    def top(self):
+        return int(self.args.get('--top') or 0)
+
     def org(self):
         return self.args['ORG']
 
@@ -544,6 +1130,26 @@ class Command:
     def skip_repos(self):
         return self.args['--skip-repos']
 
+    def tracked_repos(self):
+        return [repo for repo in self.repos() if repo not in self.skip_repos()]
+
+    # data collected by this command, one of 'commits', 'prs', 'reviews', 'issues'
+    def data_kinds(self):
+        return [self.name()]
+
+    # when collecting both PRs and issues, PRs are split out of the issues listing
+    def prs_from_issues(self):
+        return 'prs' in self.data_kinds() and 'issues' in self.data_kinds()
+
+    # the repos whose PRs are counted from the PRs listing paged for reviews,
+    # those of this command unless set by a batch for all its jobs
+    def pulls_shared_with_reviews(self):
+        if self.shared_pulls != None:
+            return self.shared_pulls
+        elif 'prs' in self.data_kinds() and 'reviews' in self.data_kinds() and not self.prs_from_issues():
+            return set(self.tracked_repos())
+        return set()
+
     def all_repos(self):
         return self.args['--all-repos']
 
@@ -583,11 +1189,14 @@ class Command:
     def rl_sleep(self):
         return self.args['--rl-sleep']
 
-    def cmd_line(self):
+    def cmd_line(self, repos=None):
         repos_line = "--all-repos"
-        if self.args['--all-repos'] == False:
+        if repos != None:
+            repos_line = "--repos={repos}".format(repos=','.join(repos))
+        elif self.args['--all-repos'] == False:
             repos_line = "--repos={repos} --skip-repos={skip_repos}".format(repos=','.join(self.repos()), skip_repos=','.join(self.skip_repos()))
-        cmd_line = "{name} {month} {org} --users={users}".format(name=self.name(), month=self.month(), users=','.join(self.users()), org=self.org())
+        users_line = "--all-users" if self.all_users() else "--users={users}".format(users=','.join(self.users()))
+        cmd_line = "{name} {month} {org} {users_line}".format(name=self.name(), month=self.month(), users_line=users_line, org=self.org())
         cmd_line += " " + repos_line
         return cmd_line
 
@@ -595,11 +1204,19 @@ class Command:
         Console.verbose("# GH Track output for cmd line: {cmd_line}".format(cmd_line=self.cmd_line()))
 
     def end_comment(self):
+        with self.profiler.span('render'):
+            self._print_group_by_output()
         if self.file() != None:
             Console.print("wrote output file: {file}".format(file=self.file()))
 
         if not self.show_all_stats():
             Console.print("Showing only non-zero stats, use --show-all-stats to view all")
+        incomplete = len([status for data in self.completeness for status in self.completeness[data].values() if status != 'complete'])
+        telemetry = self.client.telemetry()
+        Console.verbose("GitHub API calls: {calls}, retries: {retries}, hedged: {hedges}, circuit breaker pauses: {breaker_opens}".format(calls=telemetry.get('calls'), retries=telemetry.get('retries'), hedges=telemetry.get('hedges'), breaker_opens=telemetry.get('breaker_opens')))
+        Console.verbose("Fetches: {fetches}, coalesced with concurrent ones: {coalesced}, reused: {memo_hits}".format(fetches=telemetry.get('fetches'), coalesced=telemetry.get('coalesced'), memo_hits=telemetry.get('memo_hits')))
+        if incomplete > 0:
+            Console.warn("--max-runtime reached before collecting {incomplete} (repo, data) counts, marked partial or missing".format(incomplete=incomplete))
         Console.ok("OK")
 
     def fetch_repos(self):
@@ -608,11 +1225,52 @@ class Command:
             self.warn("ignoring --repos since --all-repos is set")
         self._init_repos_from_all_repos()
 
+    # adds the per state breakdown to the users map of data with --state=all
+    def _output_with_states(self, output_map):
+        data = output_map['request']['data']
+        if not self.all_states() or data not in self.users_states:
+            return output_map
+        output_map = dict(output_map)
+        output_map['states'] = self.users_states[data]
+        return output_map
+
+    # adds the status of each repo counts of data with --max-runtime, the
+    # cells of all users in a repo share its status
+    def _output_with_completeness(self, output_map):
+        if self.deadline == None:
+            return output_map
+        data = output_map['request']['data']
+        output_map = dict(output_map)
+        output_map['completeness'] = dict([(repo, self._completeness_status(data, repo)) for repo in self.tracked_repos()])
+        return output_map
+
+    # the counts were streamed as collected, ends them with a summary record
+    def _print_output_summary_record(self, output_map):
+        data = output_map['request']['data']
+        users = [user for user in self.users() if sum(output_map.get(user, {}).values()) > 0]
+        summary = dict(output_map['request'])
+        summary.update({'summary': True, 'users': len(users), 'repos': len(self.tracked_repos()),
+                        'total': sum([sum(output_map.get(user, {}).values()) for user in self.users()])})
+        if self.deadline != None:
+            summary['complete'] = all([self._completeness_status(data, repo) == 'complete' for repo in self.tracked_repos()])
+        self.stream.write(summary)
+        self.stream.flush()
+
     def print_output(self, output_map):
-        if self.output() in self.OUTPUT_JSON:
-            self._print_output_json(output_map)
+        if self.outputs != None:
+            self.outputs.append(self._output_with_completeness(self._output_with_states(output_map)))
+            return
+        with self.profiler.span('render'):
+            self._print_output(output_map)
+
+    def _print_output(self, output_map):
+        if self.stream != None:
+            if self.stream.format == 'ndjson':
+                self._print_output_summary_record(output_map)
+        elif self.output() in self.OUTPUT_JSON:
+            self._print_output_json(self._output_with_completeness(self._output_with_states(output_map)))
         elif self.output() in self.OUTPUT_YAML:
-            self._print_output_yml(output_map)
+            self._print_output_yml(self._output_with_completeness(self._output_with_states(output_map)))
         elif self.output() in self.OUTPUT_CSV:
             self._print_output_csv(output_map)
         else:
@@ -621,13 +1279,32 @@ class Command:
             self._print_summarize_output()
 
     def execute(self):
-        self.fetch_repos()
+        try:
+            return self._execute()
+        finally:
+            self.report_profile()
+
+    def _execute(self):
+        with self.profiler.span('resolve/repos'):
+            self.fetch_repos()
         if not self.check_credentials():
             return 1
         elif not self.check_required_options():
             return 1
+        elif self.show_plan():
+            return self.print_plan()
+        if self.max_runtime() and self.deadline == None:
+            self.set_deadline(time.time() + self._parse_duration(self.max_runtime(), '--max-runtime'))
         func = self.dispatch()
-        rc = func()
+        self.progress.add_work(len(self.tracked_repos()) * len(self.data_kinds()))
+        self.stream = self._open_stream()
+        try:
+            rc = func()
+        finally:
+            if self.stream != None:
+                self.stream.close()
+            self.client.save_cassette()
+            self.report_api_profile()
         if rc == None:
             return 0
         else:
@@ -636,6 +1313,40 @@ class Command:
             else:
                 return 1
 
+    # labels of the API report, e.g., to compare the cost of the same report over time
+    def api_report_labels(self):
+        return {'command': self.name(), 'org': self.org(), 'period': self.period()}
+
+    # the time, CPU and memory of the run phases, with --profile-cpu and --profile-memory
+    # the top functions and allocations, saved to the --profile file
+    def report_profile(self):
+        if self.profile_file() == None:
+            return
+        self.profiler.stop()
+        report = self.profiler.report(self.api_report_labels())
+        rows, headers = self.profiler.table(report)
+        Console.print("Run phases, seconds including nested phases, self seconds without:")
+        print(tabulate(rows, headers=headers))
+        self.profiler.save(report, self.profile_file())
+        Console.print("wrote profile: {file}".format(file=self.profile_file()))
+
+    # the GitHub API calls, pages, bytes and latencies of the run, per endpoint
+    def report_api_profile(self):
+        if not self.profile_api() and not self.profile_api_file():
+            return
+        self.client.api_telemetry.unwatch_responses()
+        report = self.client.api_report(self.api_report_labels())
+        if self.profile_api():
+            rows, headers = self.client.api_telemetry.table(report)
+            Console.print("GitHub API profile:")
+            print(tabulate(rows, headers=headers))
+            rate_limit = report['rate_limit']
+            if rate_limit['waits'] > 0:
+                Console.print("Waited {waits} times for --rate-limit, {seconds} seconds".format(waits=rate_limit['waits'], seconds=rate_limit['seconds']))
+        if self.profile_api_file():
+            self.client.api_telemetry.save(report, self.profile_api_file())
+            Console.print("wrote GitHub API profile: {file}".format(file=self.profile_api_file()))
+
     def dispatch(self):
         if self.args['commits']:
             return self.commits
@@ -654,7 +1365,7 @@ class Command:
 class Commits(Command):
     def __init__(self, args, credentials, client):
         self.args = args
-        self.users_commits = {} # {user: {repo_name: commit_count},...}
+        self.users_commits = self._new_users_stats() # {user: {repo_name: commit_count},...}
         super().__init__(self.args, credentials, client)
         self._init_request(self.users_commits, self.name())
         self._init_users_stats(self.users_commits)
@@ -666,7 +1377,8 @@ class Commits(Command):
         self.start_comment()
         Console.print("Getting commits for {total_users} users in {total_repos} repos via GitHub APIs... be patient".format(total_users=len(self.users()), total_repos=len(self.repos())))
         self._update_users_commits()
-        self.print_output(self.users_commits)
+        self._select_top_users(self.users_commits)
+        self.print_output(self.users_commits.to_map())
         self.end_comment()
         return 0
 
@@ -674,7 +1386,7 @@ class Commits(Command):
 class Reviews(Command):
     def __init__(self, args, credentials, client):
         self.args = args
-        self.users_reviews = {} # {user: {repo_name: review_count},...}
+        self.users_reviews = self._new_users_stats() # {user: {repo_name: review_count},...}
         super().__init__(self.args, credentials, client)
         self._init_request(self.users_reviews, self.name())
         self._init_users_stats(self.users_reviews)
@@ -686,7 +1398,8 @@ class Reviews(Command):
         self.start_comment()
         Console.print("Getting reviews for {total_users} users in {total_repos} repos via GitHub APIs... be patient".format(total_users=len(self.users()), total_repos=len(self.repos())))
         self._update_users_reviews()
-        self.print_output(self.users_reviews)
+        self._select_top_users(self.users_reviews)
+        self.print_output(self.users_reviews.to_map())
         self.end_comment()
         return 0
 
@@ -694,7 +1407,7 @@ class Reviews(Command):
 class PRs(Command):
     def __init__(self, args, credentials, client):
         self.args = args
-        self.users_prs = {} # {user: {repo_name: pr_count},...}
+        self.users_prs = self._new_users_stats() # {user: {repo_name: pr_count},...}
         super().__init__(self.args, credentials, client)
         self._init_request(self.users_prs, self.name())
         self._init_users_stats(self.users_prs)
@@ -706,7 +1419,8 @@ class PRs(Command):
         self.start_comment()
         Console.print("Getting prs for {total_users} users in {total_repos} repos via GitHub APIs... be patient".format(total_users=len(self.users()), total_repos=len(self.repos())))
         self._update_users_prs()
-        self.print_output(self.users_prs)
+        self._select_top_users(self.users_prs)
+        self.print_output(self.users_prs.to_map())
         self.end_comment()
         return 0
 
@@ -714,7 +1428,7 @@ class PRs(Command):
 class Issues(Command):
     def __init__(self, args, credentials, client):
         self.args = args
-        self.users_issues = {} # {user: {repo_name: issue_count},...}
+        self.users_issues = self._new_users_stats() # {user: {repo_name: issue_count},...}
         super().__init__(self.args, credentials, client)
         self._init_request(self.users_issues, self.name())
         self._init_users_stats(self.users_issues)
@@ -726,7 +1440,8 @@ class Issues(Command):
         self.start_comment()
         Console.print("Getting issues for {total_users} users in {total_repos} repos via GitHub APIs... be patient".format(total_users=len(self.users()), total_repos=len(self.repos())))
         self._update_users_issues()
-        self.print_output(self.users_issues)
+        self._select_top_users(self.users_issues)
+        self.print_output(self.users_issues.to_map())
         self.end_comment()
         return 0
 
@@ -734,10 +1449,10 @@ class Issues(Command):
 class Stats(Command):
     def __init__(self, args, credentials, client):
         self.args = args
-        self.users_commits = {} # {user: {repo_name: commit_count},...}
-        self.users_prs = {}     # {user: {repo_name: pr_count},...}
-        self.users_issues = {}  # {user: {repo_name: issue_count},...}
-        self.users_reviews = {} # {user: {repo_name: review_count},...}
+        self.users_commits = self._new_users_stats() # {user: {repo_name: commit_count},...}
+        self.users_prs = self._new_users_stats()     # {user: {repo_name: pr_count},...}
+        self.users_issues = self._new_users_stats()  # {user: {repo_name: issue_count},...}
+        self.users_reviews = self._new_users_stats() # {user: {repo_name: review_count},...}
         super().__init__(self.args, credentials, client)
         for data_tuple in [('commits', self.users_commits),
                            ('prs', self.users_prs),
@@ -748,29 +1463,325 @@ class Stats(Command):
 
     def print_stats_output(self):
         if self.stats_commits():
-            self.print_output(self.users_commits)
+            self.print_output(self.users_commits.to_map())
         if self.stats_prs():
-            self.print_output(self.users_prs)
+            self.print_output(self.users_prs.to_map())
         if self.stats_reviews():
-            self.print_output(self.users_reviews)
+            self.print_output(self.users_reviews.to_map())
         if self.stats_issues():
-            self.print_output(self.users_issues)
+            self.print_output(self.users_issues.to_map())
         if self.summarize():
-            self._print_summarize_output()
+            with self.profiler.span('render'):
+                self._print_summarize_output()
 
     def name(self):
       return "stats"
 
+    def data_kinds(self):
+        kinds = []
+        for data, enabled in [('commits', self.stats_commits()),
+                              ('prs', self.stats_prs()),
+                              ('reviews', self.stats_reviews()),
+                              ('issues', self.stats_issues())]:
+            if enabled: kinds.append(data)
+        return kinds
+
     def stats(self):
         self.start_comment()
         if self.stats_commits():
             self._update_users_commits()
-        if self.stats_prs():
+        if self.prs_from_issues():
+            self._update_users_prs_issues()
+        elif self.stats_prs():
             self._update_users_prs()
         if self.stats_reviews():
             self._update_users_reviews()
-        if self.stats_issues():
+        if self.stats_issues() and not self.prs_from_issues():
             self._update_users_issues()
+        self._select_top_users(self.users_commits, self.users_prs, self.users_reviews, self.users_issues)
         self.print_stats_output()
         self.end_comment()
         return 0
+
+# batch command group
+class Batch(Command):
+    JOB_COMMANDS = ['commits', 'prs', 'reviews', 'issues', 'stats']
+    def __init__(self, args, credentials, client):
+        self.args = args
+        super().__init__(self.args, credentials, client)
+
+    def name(self):
+      return "batch"
+
+    def jobs_file(self):
+        return self.args['JOBS_FILE']
+
+    # jobs inherit --all-repos and friends as defaults, batch itself tracks no repos
+    def repos(self):
+        return self.args['--repos']
+
+    def data_kinds(self):
+        return []
+
+    def load_jobs(self):
+        try:
+            import yaml
+            with open(self.jobs_file()) as file:
+                jobs = yaml.safe_load(file)
+        except Exception as e:
+            Console.warn("Invalid jobs file '{jobs_file}': {message}".format(jobs_file=self.jobs_file(), message=e.__str__()))
+            return None
+        if isinstance(jobs, dict) and 'jobs' in jobs:
+            jobs = jobs['jobs']
+        if not isinstance(jobs, list):
+            Console.warn("Jobs file '{jobs_file}' must contain a list of jobs".format(jobs_file=self.jobs_file()))
+            return None
+        for no, job in enumerate(jobs, start=1):
+            if not self.check_job(no, job):
+                return None
+        return jobs
+
+    def check_job(self, no, job):
+        if not isinstance(job, dict):
+            Console.warn("Invalid batch job #{no} in '{jobs_file}'".format(no=no, jobs_file=self.jobs_file()))
+            return False
+        commands = [name for name in self.JOB_COMMANDS if job.get(name)]
+        if len(commands) != 1:
+            Console.warn("Batch job #{no} must set exactly one of: {commands}".format(no=no, commands=', '.join(self.JOB_COMMANDS)))
+            return False
+        return True
+
+    # job values override the batch command line options
+    def job_args(self, job):
+        job_args = copy.deepcopy(self.args)
+        for name in self.JOB_COMMANDS + ['batch', 'serve', 'webhook']:
+            job_args[name] = False
+        job_args['JOBS_FILE'] = None
+        # the batch reports the API profile and profiles of all its jobs once
+        job_args['--profile-api'] = False
+        job_args['--profile-api-file'] = None
+        job_args['--profile'] = None
+        job_args.update(job)
+        return job_args
+
+    def job_command(self, job):
+        command = CLI(self.job_args(job)).command(self.client)
+        command.profiler = self.profiler
+        command.progress = self.progress
+        return command
+
+    # the distinct listings a job needs, mirroring the GHClient fetch cache keys
+    def job_fetches(self, command):
+        fetches = set()
+        for repo in command.tracked_repos():
+            for data in command.data_kinds():
+                if data == 'commits':
+                    fetches.add(('commits', command.org(), repo))
+                elif data == 'issues' or (data == 'prs' and command.prs_from_issues()):
+                    fetches.add(('issues', command.org(), repo, command.state(), command.start_date()))
+                elif data == 'prs' and repo not in command.pulls_shared_with_reviews():
+                    fetches.add(('pulls', command.org(), repo, command.state(), 'created'))
+                else:
+                    fetches.add(('pulls', command.org(), repo, command.state(), 'updated'))
+        return fetches
+
+    # PRs of a repo are counted from the PRs listing paged for the reviews of
+    # any job, rather than from a listing of their own
+    def share_pulls(self, commands):
+        reviewed = set()
+        for command in commands:
+            if 'reviews' in command.data_kinds():
+                reviewed.update([(command.org(), repo, command.state()) for repo in command.tracked_repos()])
+        for command in commands:
+            if not command.prs_from_issues():
+                command.shared_pulls = set([repo for repo in command.tracked_repos() if (command.org(), repo, command.state()) in reviewed])
+
+    def plan(self, commands):
+        self.share_pulls(commands)
+        all_fetches, total = set(), 0
+        for command in commands:
+            fetches = self.job_fetches(command)
+            total += len(fetches)
+            all_fetches.update(fetches)
+        return (all_fetches, total)
+
+    def batch(self):
+        jobs = self.load_jobs()
+        if jobs == None:
+            return 1
+        commands = [self.job_command(job) for job in jobs]
+        fetches, total = self.plan(commands)
+        Console.print("Running {total_jobs} jobs needing {fetches} distinct repo fetches ({total} without sharing)".format(total_jobs=len(commands), fetches=len(fetches), total=total))
+        if self.max_runtime():
+            self.set_deadline(time.time() + self._parse_duration(self.max_runtime(), '--max-runtime'))
+        rc = 0
+        for no, command in enumerate(commands, start=1):
+            if self.deadline != None:
+                command.set_deadline(self.deadline)
+            Console.print("Batch job {no}/{total_jobs}: {cmd_line}".format(no=no, total_jobs=len(commands), cmd_line=command.cmd_line()))
+            job_rc = command.execute()
+            if job_rc != 0:
+                Console.warn("batch job {no} failed with: {rc}".format(no=no, rc=job_rc))
+                rc = job_rc
+        return rc
+
+    def execute(self):
+        if not self.check_credentials():
+            return 1
+        elif not self.check_cassette():
+            return 1
+        try:
+            return self.batch()
+        finally:
+            self.client.save_cassette()
+            self.report_api_profile()
+            self.report_profile()
+
+    def api_report_labels(self):
+        return {'command': self.name(), 'jobs_file': os.path.basename(self.jobs_file())}
+
+# serve command group
+class Serve(Batch):
+    # options of the commands that queries can set, e.g., GET /prs?month=mar&users=user1,user2&state=all
+    QUERY_OPTIONS = ['--users', '--team', '--teams', '--nested-teams', '--all-users', '--top', '--repos', '--skip-repos', '--all-repos',
+                     '--state', '--group-by', '--show-all-stats', '--commits', '--prs', '--reviews', '--issues', '--contributor-index']
+    MAX_FETCHES = 10000 # listings and reviews kept between queries, least recently used dropped first
+    def __init__(self, args, credentials, client):
+        self.args = args
+        super().__init__(self.args, credentials, client)
+        self.gate = PriorityGate()
+        # the queries share the client configured by serve, and its fetches
+        self.client.set_max_fetches(self.MAX_FETCHES)
+        self.client.configured = True
+
+    def name(self):
+      return "serve"
+
+    def port(self):
+        return int(self.args.get('--port') or 8080)
+
+    def refresh(self):
+        return self._parse_duration(self.args.get('--refresh') or '15m', '--refresh')
+
+    # a query is a job of the command at path, its parameters are the query
+    # options without leading dashes and MONTH as month, ORG is the served one
+    def query_job(self, command, params):
+        if 'month' not in params:
+            raise ValueError("Missing query parameter 'month'")
+        job = {command: True, 'MONTH': params['month'], '--output': 'json', '--file': None, '--stream': False}
+        for name, value in params.items():
+            if name == 'month':
+                continue
+            if '--' + name not in self.QUERY_OPTIONS:
+                raise ValueError("Invalid query parameter '{name}', use month or any of: {options}".format(name=name, options=', '.join([option[2:] for option in self.QUERY_OPTIONS])))
+            job['--' + name] = {'true': True, 'false': False}.get(value.lower(), value)
+        return job
+
+    def job_command(self, job):
+        command = CLI(self.job_args(job)).command(self.client)
+        command.progress = Progress(enabled=False)
+        return command
+
+    # collects the output maps of a query instead of printing them, the repos
+    # of background queries are only started while no other query runs
+    def query_report(self, command, params, background=False):
+        command = self.job_command(self.query_job(command, params))
+        command.outputs = []
+        command.scheduler.set_gate(self.gate, background)
+        if command.execute() != 0:
+            raise ValueError("Invalid query {params}, see the ght serve output".format(params=params))
+        return {'reports': command.outputs, 'repos': ["{org}/{repo}".format(org=command.org(), repo=repo) for repo in command.tracked_repos()]}
+
+    def execute(self):
+        if not self.check_credentials():
+            return 1
+        elif not self.check_cassette():
+            return 1
+        elif not self.check_org(self.org()):
+            Console.warn("Invalid org value '{org}'".format(org=self.org()))
+            return 1
+        # http.server is only imported when serving, it is slow to import
+        from serve import ReportServer
+        server = ReportServer(self.query_report, self.port(), self.refresh(), invalidate_func=self.client.invalidate)
+        Console.print("Serving reports of '{org}' on {base_url}, e.g., {base_url}/prs?month=mar&users=user1,user2".format(org=self.org(), base_url=server.base_url()))
+        server.start()
+        try:
+            while not server.stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.client.save_cassette()
+        return 0
+
+# webhook command group, stores the GitHub webhook events of the repos of ORG
+# in the --events store that the other commands count from with --events
+class Webhook(Command):
+    def __init__(self, args, credentials, client):
+        self.args = args
+        super().__init__(self.args, credentials, client)
+
+    def name(self):
+      return "webhook"
+
+    def data_kinds(self):
+        return []
+
+    # the webhook fills the store from GitHub
+    def counts_from_events(self):
+        return False
+
+    def port(self):
+        return int(self.args.get('--port') or 8080)
+
+    def host(self):
+        return self.args.get('--host') or '127.0.0.1'
+
+    def webhook_secret(self):
+        return self.args.get('--webhook-secret') or os.getenv('GHTRACK_WEBHOOK_SECRET')
+
+    def reconcile(self):
+        return self._parse_duration(self.args.get('--reconcile') or '1h', '--reconcile')
+
+    def backfill(self):
+        return self._parse_duration(self.args.get('--backfill') or '31d', '--backfill')
+
+    # the tracked repos and those with events
+    def reconciled_repos(self, store):
+        names = set(self.tracked_repos()) | set([full_name.split('/', 1)[1] for full_name in store.repos(self.org())])
+        # new repos of the org are listed again
+        self.client.invalidate([self.org()])
+        return [repo for repo in self.client.repos(self.org()) if repo.name in names and repo.name not in self.skip_repos()]
+
+    def execute(self):
+        if not self.check_credentials():
+            return 1
+        elif not self.check_cassette():
+            return 1
+        elif not self.check_org(self.org()):
+            Console.warn("Invalid org value '{org}'".format(org=self.org()))
+            return 1
+        elif self.events_file() == None:
+            Console.warn("Missing --events store file")
+            return 1
+        elif not self.webhook_secret():
+            Console.warn("Missing --webhook-secret, or GHTRACK_WEBHOOK_SECRET, set in the GitHub webhook")
+            return 1
+        # http.server and sqlite3 are only imported by this command
+        from events import EventStore, EventSync
+        from webhook import WebhookServer
+        store = EventStore(self.events_file())
+        sync = EventSync(self.client, store, self.backfill())
+        server = WebhookServer(store, self.webhook_secret(), self.port(), self.org(), lambda: sync.sync(self.reconciled_repos(store)), self.reconcile(), self.host())
+        Console.print("Receiving webhook events of '{org}' on {base_url}/webhook into '{events}'".format(org=self.org(), base_url=server.base_url(), events=self.events_file()))
+        server.start()
+        try:
+            while not server.stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.client.save_cassette()
+        return 0
@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import io, os, tempfile
+import io, os, sys, time, yaml, shutil, tempfile, subprocess
 
 from unittest import TestCase
 from unittest.mock import patch, Mock
@@ -49,6 +49,11 @@ class TestCLI(TestCase):
                          'issues': False,
                          'stats': False}
 
+    def test_lazy_imports(self):
+        modules = subprocess.check_output([sys.executable, '-c', "import sys, cli; print(' '.join(sorted(sys.modules)))"], cwd=os.path.dirname(os.path.abspath(__file__)), text=True).split()
+        for module in ['github', 'yaml', 'tabulate']:
+            self.assertFalse(module in modules)
+
     def test_command(self):
         self.arguments['commits'] = True
         cli = CLI(self.arguments)
@@ -104,6 +109,12 @@ class CommandTestCase:
                          'issues': False,
                          'stats': False}
         self.args = self.arguments
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
 
     @patch('client.GHClient')
     def __create_mock_client(self, MockGHClient):
@@ -112,6 +123,7 @@ class CommandTestCase:
     @patch('client.GHClient')
     def __create_mock_client_get_repos(self, MockGHClient):
         client = MockGHClient()
+        client.configured = False
         class Repo:
             def __init__(self, name):
                 self.name = name
@@ -221,6 +233,7 @@ class CommandTestCase:
         cli = CLI(test_args)
         self.assertTrue(cli.command().check_state('open'))
         self.assertTrue(cli.command().check_state('closed'))
+        self.assertTrue(cli.command().check_state('all'))
         self.assertFalse(cli.command().check_state('fake-state'))
         self.assertFalse(cli.command().check_state(''))
         self.assertFalse(cli.command().check_state(None))
@@ -534,6 +547,144 @@ class CommandTestCase:
         self.assertEqual(cli.command().client.rate_limit_data.max_calls(), 200)
         self.assertEqual(cli.command().client.rate_limit_data.sleep(), 1*60*60)
 
+class TestTeams(TestCase):
+    def setUp(self):
+        self.arguments = CommandTestCase.TEST_ARGS.copy()
+        self.arguments['--users'] = ['fake-user1']
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
+
+    @patch('client.GHClient')
+    def __create_mock_client_teams(self, MockGHClient):
+        client = MockGHClient()
+        client.configured = False
+        client.team_members.return_value = ['fake-user1', 'fake-user3']
+        return client
+
+    def test_teams(self):
+        self.arguments['--teams'] = 'fake-org/fake-team,other-org/other-team'
+        client = self.__create_mock_client_teams()
+        command = CLI(self.arguments.copy()).command(client)
+        self.assertEqual(command.users(), ['fake-user1', 'fake-user3'])
+        client.team_members.assert_any_call('fake-org', 'fake-team', False)
+        client.team_members.assert_any_call('other-org', 'other-team', False)
+
+    def test_teams_cached(self):
+        self.arguments['--teams'] = 'fake-team'
+        self.arguments['--nested-teams'] = True
+        client = self.__create_mock_client_teams()
+        CLI(self.arguments.copy()).command(client)
+        command = CLI(self.arguments.copy()).command(client)
+        self.assertEqual(client.team_members.call_count, 1)
+        client.team_members.assert_called_with('fake-org', 'fake-team', True)
+        self.assertEqual(command.users(), ['fake-user1', 'fake-user3'])
+
+    def test_teams_from_cache(self):
+        self.arguments['--teams'] = 'fake-team'
+        DiskCache('teams', 60, self.cache_dir).set('fake-org/fake-team', ['fake-user4'])
+        client = self.__create_mock_client_teams()
+        command = CLI(self.arguments.copy()).command(client)
+        self.assertEqual(client.team_members.call_count, 0)
+        self.assertEqual(command.users(), ['fake-user1', 'fake-user4'])
+
+    def test_team_repeated(self):
+        self.arguments['--team'] = ['fake-org/fake-team', 'other-team']
+        self.arguments['--teams'] = 'fake-org/third-team'
+        client = self.__create_mock_client_teams()
+        command = CLI(self.arguments.copy()).command(client)
+        self.assertEqual(command.users(), ['fake-user1', 'fake-user3'])
+        self.assertEqual(client.team_members.call_count, 3)
+        client.team_members.assert_any_call('fake-org', 'other-team', False)
+
+    def test_invalid_teams_ttl(self):
+        for teams_ttl in ['1y', '0d']:
+            self.arguments['--teams'] = 'fake-team'
+            self.arguments['--teams-ttl'] = teams_ttl
+            client = self.__create_mock_client_teams()
+            command = CLI(self.arguments.copy()).command(client)
+            self.assertEqual(client.team_members.call_count, 0)
+            self.assertFalse(command.check_required_options())
+
+class TestContributorIndex(TestCase):
+    def setUp(self):
+        self.arguments = CommandTestCase.TEST_ARGS.copy()
+        self.arguments.update({'stats': False, 'prs': True, '--contributor-index': True, '--repos': ['fake-repo1', 'fake-repo2']})
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
+
+    @patch('client.GHClient')
+    def __create_mock_client_index(self, MockGHClient):
+        client = MockGHClient()
+        client.configured = False
+        class Repo:
+            def __init__(self, name):
+                self.name = name
+        client.repos.return_value = [Repo('fake-repo1'), Repo('fake-repo2')]
+        client.stats_contributors.return_value = []
+        client.prs_counts.side_effect = lambda repo, authors, start_date, end_date, state, by_state: {'fake-user1': 1} if repo.name == 'fake-repo1' else {}
+        return client
+
+    def test_sweep_then_skip(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            client = self.__create_mock_client_index()
+            self.assertEqual(CLI(self.arguments.copy()).command(client).execute(), 0)
+            self.assertEqual(client.prs_counts.call_count, 2)
+            # only sweeps of commits index the contributor stats
+            self.assertEqual(client.stats_contributors.call_count, 0)
+
+            client = self.__create_mock_client_index()
+            command = CLI(self.arguments.copy()).command(client)
+            self.assertEqual(command.execute(), 0)
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(client.prs_counts.call_count, 1)
+        self.assertEqual(client.prs_counts.call_args[0][1], ['fake-user1'])
+        self.assertEqual(command.users_prs['fake-user1']['fake-repo1'], 1)
+
+    # repos a sweep cut short by the deadline did not finish are swept again
+    def test_sweep_partial(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            client = self.__create_mock_client_index()
+            client.pop_partial.side_effect = lambda repo: repo.name == 'fake-repo2'
+            arguments = self.arguments.copy()
+            arguments['--max-runtime'] = '10m'
+            command = CLI(arguments).command(client)
+            self.assertEqual(command.execute(), 0)
+            self.assertEqual(command.completeness['prs']['fake-repo2'], 'partial')
+
+            client = self.__create_mock_client_index()
+            self.assertEqual(CLI(self.arguments.copy()).command(client).execute(), 0)
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(client.prs_counts.call_count, 2)
+
+    # the sweep of a month says nothing of the activity in the others
+    def test_sweep_other_month(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            client = self.__create_mock_client_index()
+            self.assertEqual(CLI(self.arguments.copy()).command(client).execute(), 0)
+            client = self.__create_mock_client_index()
+            arguments = self.arguments.copy()
+            arguments['MONTH'] = 'feb'
+            self.assertEqual(CLI(arguments).command(client).execute(), 0)
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(client.prs_counts.call_count, 2)
+
 class TestCommits(CommandTestCase, TestCase):
     def setUp(self):
         super().setUp()
@@ -545,7 +696,8 @@ class TestCommits(CommandTestCase, TestCase):
     @patch('client.GHClient')
     def __create_mock_client_commits(self, MockGHClient):
         client = MockGHClient()
-        client.commits_count.return_value = 0
+        client.configured = False
+        client.commits_counts.return_value = {}
         return client
 
     def test_execute(self):
@@ -571,7 +723,8 @@ class TestReviews(CommandTestCase, TestCase):
     @patch('client.GHClient')
     def __create_mock_client_reviews(self, MockGHClient):
         client = MockGHClient()
-        client.reviews_count.return_value = 0
+        client.configured = False
+        client.reviews_counts.return_value = {}
         return client
 
     def test_execute(self):
@@ -604,7 +757,8 @@ class TestPRs(CommandTestCase, TestCase):
     @patch('client.GHClient')
     def __create_mock_client_prs(self, MockGHClient):
         client = MockGHClient()
-        client.prs_count.return_value = 0
+        client.configured = False
+        client.prs_counts.return_value = {}
         return client
 
     def test_execute(self):
@@ -637,7 +791,8 @@ class TestIssues(CommandTestCase, TestCase):
     @patch('client.GHClient')
     def __create_mock_client_issues(self, MockGHClient):
         client = MockGHClient()
-        client.issues_count.return_value = 0
+        client.configured = False
+        client.issues_counts.return_value = {}
         return client
 
     def test_execute(self):
@@ -674,10 +829,26 @@ class TestStats(CommandTestCase, TestCase):
     @patch('client.GHClient')
     def __create_mock_client_stats(self, MockGHClient):
         client = MockGHClient()
-        client.issues_count.return_value = 0
-        client.commits_count.return_value = 1
-        client.reviews_count.return_value = 2
-        client.prs_count.return_value = 3
+        client.configured = False
+        client.issues_counts.return_value = {}
+        client.commits_counts.return_value = {}
+        client.reviews_counts.return_value = {}
+        client.prs_counts.return_value = {}
+        return client
+
+    @patch('client.GHClient')
+    def __create_mock_client_all_users(self, MockGHClient):
+        client = MockGHClient()
+        client.configured = False
+        class Repo:
+            def __init__(self, name):
+                self.name = name
+        client.repos.return_value = [Repo('fake-repo1'), Repo('fake-repo2')]
+        client.commits_counts.return_value = {'fake-user1': 1, 'fake-user2': 5, 'fake-user3': 0}
+        client.prs_counts.return_value = {'fake-user1': 2, 'fake-user3': 1}
+        client.reviews_counts.return_value = {'fake-user4': 1}
+        client.issues_counts.return_value = {}
+        client.issues_prs_counts.return_value = (client.prs_counts.return_value, client.issues_counts.return_value)
         return client
 
     def test_execute(self):
@@ -699,5 +870,395 @@ class TestStats(CommandTestCase, TestCase):
         rc = cli.command(client).execute()
         self.assertEqual(rc, 0)
 
+    def test_stats_all_users(self):
+        self.arguments['--all-users'] = True
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        rc = command.execute()
+        self.assertEqual(rc, 0)
+        client.issues_prs_counts.assert_any_call(client.repos.return_value[1], None, command.start_date(), command.end_date(), 'closed', False)
+        self.assertEqual(command.users(), ['fake-user1', 'fake-user2', 'fake-user3', 'fake-user4'])
+        self.assertEqual(command.users_commits['fake-user2'], {'fake-repo1': 5, 'fake-repo2': 5})
+        self.assertEqual(command.summary_stats['prs']['fake-repo1'], 3)
+
+    def test_stats_plan(self):
+        self.arguments['--plan'] = True
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1']
+        client = self.__create_mock_client_all_users()
+        client.rate_limit_status.return_value = (10, 5000, time.time() + 600)
+        client.estimate_calls.side_effect = self.__estimate_calls
+        client.estimate_repos_calls.return_value = 2
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            command = CLI(self.arguments).command(client)
+            rc = command.execute()
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(rc, 0)
+        client.commits_counts.assert_not_called()
+        client.issues_prs_counts.assert_not_called()
+        client.estimate_calls.assert_any_call(client.repos.return_value[0], ['reviews'], 'closed', command.start_date(), False)
+        self.assertEqual(command.plan_map()['calls']['fake-repo1'], {'commits': 1, 'prs+issues': 2, 'reviews': 5})
+        self.assertEqual(command.plan_map()['repos_calls'], 2)
+        self.assertEqual(command.plan_map()['total'], 18)
+        self.assertTrue("Estimated 18 API calls, rate limit remaining 10 of 5000" in output)
+
+    def __estimate_calls(self, repo, kinds, state, start_date, shared_pulls):
+        return {'commits': 1, 'prs+issues': 2, 'reviews': 5}['+'.join(kinds)]
+
+    def test_stats_plan_budget(self):
+        self.arguments['--plan'] = True
+        self.arguments['--budget'] = '10'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        client = self.__create_mock_client_all_users()
+        client.rate_limit_status.return_value = (10, 5000, time.time() + 600)
+        client.estimate_calls.side_effect = self.__estimate_calls
+        client.estimate_repos_calls.return_value = 2
+        command = CLI(self.arguments).command(client)
+        self.assertEqual(command.plan_map()['chunks'], [{'calls': 10, 'repos': ['fake-repo1']}, {'calls': 10, 'repos': ['fake-repo2']}])
+        self.assertEqual(command.cmd_line(['fake-repo1']), "stats mar knative --users= --repos=fake-repo1")
+
+    def test_plan_duration(self):
+        command = CLI(self.arguments).command(self.__create_mock_client_stats())
+        self.assertEqual(command._plan_duration(80, 100, 5000, time.time()), 10)
+        self.assertEqual(command._plan_duration(5100, 100, 5000, time.time() + 600), 600 + 637)
+        self.assertEqual(command._plan_duration(10100, 100, 5000, time.time() + 600), 600 + 3600 + 1262)
+
+    def test_stats_prs_issues_single_pass(self):
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user3']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        self.assertEqual(command.execute(), 0)
+        self.assertEqual(client.issues_prs_counts.call_count, 2)
+        self.assertEqual(client.prs_counts.call_count, 0)
+        self.assertEqual(client.issues_counts.call_count, 0)
+        self.assertEqual(command.users_prs['fake-user1'], {'fake-repo1': 2, 'fake-repo2': 2})
+
+    def test_stats_prs_only(self):
+        self.arguments['--issues'] = False
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        self.assertEqual(command.execute(), 0)
+        self.assertEqual(client.prs_counts.call_count, 2)
+        self.assertEqual(client.issues_prs_counts.call_count, 0)
+        # from the PRs listing paged for the reviews
+        client.prs_counts.assert_any_call(client.repos.return_value[1], command.users(), command.start_date(), command.end_date(), 'closed', False, 'updated')
+
+    def test_stats_max_runtime(self):
+        self.arguments['--max-runtime'] = '10m'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user2']
+        client = self.__create_mock_client_all_users()
+        client.pop_partial.side_effect = lambda repo: repo.name == 'fake-repo1'
+        command = CLI(self.arguments).command(client)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(command.execute(), 0)
+        finally:
+            sys.stdout = stdout
+        client.set_deadline.assert_called_with(command.deadline)
+        self.assertEqual(command.completeness['prs'], {'fake-repo1': 'partial', 'fake-repo2': 'complete'})
+        rows = command._extract_user_repo_data('commits', command.users_commits)
+        self.assertEqual(rows[0], ['user', 'repo', 'data', 'state', 'count', 'completeness'])
+        self.assertTrue(['fake-user2', 'fake-repo1', 'commits', 'closed', 5, 'partial'] in rows)
+        self.assertEqual(command._output_with_completeness(command.users_reviews.to_map())['completeness'], {'fake-repo1': 'partial', 'fake-repo2': 'complete'})
+
+    def test_stats_max_runtime_reached(self):
+        self.arguments['--max-runtime'] = '0s'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(command.execute(), 0)
+        finally:
+            sys.stdout = stdout
+        client.commits_counts.assert_not_called()
+        self.assertEqual(command.completeness['reviews'], {'fake-repo1': 'missing', 'fake-repo2': 'missing'})
+        self.assertTrue(['fake-user1', 'fake-repo2', 'prs', 'closed', 0, 'missing'] in command._extract_user_repo_data('prs', command.users_prs))
+
+    def test_stats_ndjson(self):
+        self.arguments['--output'] = 'ndjson'
+        self.arguments['--file'] = os.path.join(self.cache_dir, 'output.ndjson')
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user2']
+        client = self.__create_mock_client_all_users()
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(CLI(self.arguments).command(client).execute(), 0)
+        finally:
+            sys.stdout = stdout
+        with open(self.arguments['--file']) as file:
+            records = [json.loads(line) for line in file]
+        self.assertTrue({'user': 'fake-user2', 'repo': 'fake-repo1', 'data': 'commits', 'state': 'closed', 'count': 5} in records)
+        self.assertEqual(len([record for record in records if 'summary' not in record]), 10)
+        summaries = [record for record in records if record.get('summary') == True]
+        self.assertEqual([summary['data'] for summary in summaries], ['commits', 'prs', 'reviews', 'issues'])
+        self.assertEqual(summaries[0]['total'], 12)
+
+    # streams the counts of a run cut short, fake-repo1 partial with 10m and both repos missing with 0s
+    def __stream_max_runtime(self, output, max_runtime):
+        self.arguments.update({'--output': output, '--stream': True, '--max-runtime': max_runtime, '--file': os.path.join(self.cache_dir, 'output.' + output),
+                               '--repos': ['fake-repo1', 'fake-repo2'], '--users': ['fake-user1', 'fake-user2']})
+        client = self.__create_mock_client_all_users()
+        client.pop_partial.side_effect = lambda repo: repo.name == 'fake-repo1'
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(CLI(self.arguments).command(client).execute(), 0)
+        finally:
+            sys.stdout = stdout
+        with open(self.arguments['--file']) as file:
+            if output == 'csv':
+                return list(csv.DictReader(file))
+            return [json.loads(line) for line in file if 'summary' not in json.loads(line)]
+
+    def test_stats_ndjson_max_runtime(self):
+        records = self.__stream_max_runtime('ndjson', '10m')
+        self.assertTrue({'user': 'fake-user2', 'repo': 'fake-repo1', 'data': 'commits', 'state': 'closed', 'count': 5, 'completeness': 'partial'} in records)
+        self.assertTrue(all([record['completeness'] == ('partial' if record['repo'] == 'fake-repo1' else 'complete') for record in records]))
+        os.remove(self.arguments['--file'])
+        records = self.__stream_max_runtime('ndjson', '0s')
+        self.assertEqual(len(records), 2 * 2 * 4)
+        self.assertTrue({'user': 'fake-user1', 'repo': 'fake-repo2', 'data': 'prs', 'state': 'closed', 'count': 0, 'completeness': 'missing'} in records)
+
+    def test_stats_csv_stream_max_runtime(self):
+        rows = self.__stream_max_runtime('csv', '10m')
+        self.assertEqual(list(rows[0].keys()), ['user', 'repo', 'data', 'state', 'count', 'completeness'])
+        self.assertTrue({'user': 'fake-user2', 'repo': 'fake-repo1', 'data': 'commits', 'state': 'closed', 'count': '5', 'completeness': 'partial'} in rows)
+        os.remove(self.arguments['--file'])
+        rows = self.__stream_max_runtime('csv', '0s')
+        self.assertEqual(len(rows), 2 * 2 * 4)
+        self.assertTrue(all([row['completeness'] == 'missing' and row['count'] == '0' for row in rows]))
+
+    def test_stats_ndjson_stdout(self):
+        self.arguments['--output'] = 'ndjson'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user2']
+        client = self.__create_mock_client_all_users()
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+        try:
+            self.assertEqual(CLI(self.arguments).command(client).execute(), 0)
+            output, status = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            common.STDERR = False
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(len([record for record in records if 'summary' not in record]), 10)
+        self.assertTrue("OK" in status)
+
+    def test_stats_csv_stream(self):
+        self.arguments['--output'] = 'csv'
+        self.arguments['--stream'] = True
+        self.arguments['--file'] = os.path.join(self.cache_dir, 'output.csv')
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1']
+        client = self.__create_mock_client_all_users()
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(CLI(self.arguments).command(client).execute(), 0)
+        finally:
+            sys.stdout = stdout
+        with open(self.arguments['--file']) as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['user', 'repo', 'data', 'state', 'count'])
+        self.assertEqual(len(rows), 11)
+        self.assertTrue(['fake-user1', 'fake-repo2', 'prs', 'closed', '2'] in rows)
+
+    def test_stats_group_by(self):
+        self.arguments['--output'] = 'json'
+        self.arguments['--group-by'] = ['user', 'data']
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user2']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(command.execute(), 0)
+        finally:
+            sys.stdout = stdout
+        totals = command.aggregator.totals(('user', 'data'))
+        self.assertEqual(totals[('fake-user2', 'commits')], sum(command.users_commits['fake-user2'].values()))
+        self.assertFalse(('fake-user3', 'commits') in totals)
+        self.assertEqual(command.summary_stats['commits'], command.users_commits.repo_totals())
+
+    def test_stats_no_group_by(self):
+        command = CLI(self.arguments).command(self.__create_mock_client_all_users())
+        self.assertEqual(list(command.aggregator.groupings.keys()), [('data', 'repo')])
+
+    def test_stats_cassette_options(self):
+        client = self.__create_mock_client_all_users()
+        self.arguments['--replay'] = self.cache_dir
+        command = CLI(self.arguments).command(client)
+        client.replay.assert_called_with(self.cache_dir, False)
+        self.assertFalse(command.check_cassette())
+        self.arguments['--record'] = self.cache_dir
+        self.assertFalse(CLI(self.arguments).command(client).check_cassette())
+        self.arguments['--replay'] = None
+        command = CLI(self.arguments).command(client)
+        client.record.assert_called_with(self.cache_dir)
+        self.assertTrue(command.check_cassette())
+        self.assertEqual(command.execute(), 0)
+        client.save_cassette.assert_called()
+
+    def test_stats_profile_api_file(self):
+        client = self.__create_mock_client_all_users()
+        self.arguments['--profile-api-file'] = os.path.join(self.cache_dir, 'ght.prom')
+        command = CLI(self.arguments).command(client)
+        client.api_telemetry.watch_responses.assert_called()
+        self.assertEqual(command.execute(), 0)
+        self.assertEqual(client.api_report.call_args[0][0]['command'], 'stats')
+        client.api_telemetry.save.assert_called_with(client.api_report(), self.arguments['--profile-api-file'])
+
+    def test_stats_profile(self):
+        client = self.__create_mock_client_all_users()
+        self.arguments['--profile'] = os.path.join(self.cache_dir, 'profile.json')
+        self.assertEqual(CLI(self.arguments).command(client).execute(), 0)
+        with open(self.arguments['--profile']) as file:
+            report = json.load(file)
+        self.assertEqual(report['labels']['command'], 'stats')
+        self.assertTrue('render' in report['phases'] and 'resolve/repos' in report['phases'])
+
+    def test_stats_group_by_invalid(self):
+        self.arguments['--group-by'] = ['user', 'fake-dim']
+        command = CLI(self.arguments).command(self.__create_mock_client_all_users())
+        self.assertEqual(command.execute(), 1)
+
+    def test_stats_all_states(self):
+        self.arguments['--state'] = 'all'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        self.arguments['--users'] = ['fake-user1', 'fake-user2']
+        client = self.__create_mock_client_all_users()
+        client.issues_prs_counts.return_value = ({'open': {'fake-user1': 1}, 'closed': {'fake-user1': 2, 'fake-user2': 0}}, {'open': {}, 'closed': {}})
+        client.reviews_counts.return_value = {'open': {}, 'closed': {'fake-user2': 3}}
+        command = CLI(self.arguments).command(client)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.assertEqual(command.execute(), 0)
+        finally:
+            sys.stdout = stdout
+        client.issues_prs_counts.assert_any_call(client.repos.return_value[1], ['fake-user1', 'fake-user2'], command.start_date(), command.end_date(), 'all', True)
+        self.assertEqual(command.users_prs['fake-user1']['fake-repo1'], 3)
+        self.assertEqual(command.users_states['prs']['fake-user1']['fake-repo1'], {'open': 1, 'closed': 2})
+        rows = command._extract_user_repo_data('prs', command.users_prs)
+        self.assertEqual(rows[0], ['user', 'repo', 'data', 'state', 'count'])
+        self.assertTrue(['fake-user1', 'fake-repo2', 'prs', 'open', 1] in rows)
+        self.assertTrue(['fake-user1', 'fake-repo2', 'prs', 'closed', 2] in rows)
+        self.assertTrue(['fake-user2', 'fake-repo1', 'commits', 'all', 5] in command._extract_user_repo_data('commits', command.users_commits))
+        header, table = command._extract_summary_stats_table()
+        self.assertEqual(header, ['data', 'repo', 'state', 'total'])
+        self.assertTrue(['reviews', 'fake-repo1', 'closed', 3] in table)
+        self.assertTrue(['prs', 'fake-repo2', 'open', 1] in table)
+        self.assertTrue(['commits', 'fake-repo2', 'all', 6] in table)
+
+    def test_stats_all_users_top(self):
+        self.arguments['--all-users'] = True
+        self.arguments['--top'] = '2'
+        self.arguments['--repos'] = ['fake-repo1', 'fake-repo2']
+        client = self.__create_mock_client_all_users()
+        command = CLI(self.arguments).command(client)
+        rc = command.execute()
+        self.assertEqual(rc, 0)
+        self.assertEqual(command.users(), ['fake-user2', 'fake-user1'])
+        self.assertFalse('fake-user3' in command.users_prs)
+        self.assertFalse('fake-user4' in command.users_reviews)
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.arguments = CommandTestCase.TEST_ARGS.copy()
+        self.arguments.update({'stats': False, 'batch': True, 'JOBS_FILE': None, 'MONTH': None, 'ORG': None,
+                               '--users': [], '--repos': [], '--skip-repos': []})
+        self.jobs_file = tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False)
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+
+    def tearDown(self):
+        os.remove(self.jobs_file.name)
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
+
+    def __write_jobs(self, jobs):
+        yaml.dump(jobs, self.jobs_file)
+        self.jobs_file.close()
+        self.arguments['JOBS_FILE'] = self.jobs_file.name
+
+    def __create_fake_client(self):
+        class Login:
+            def __init__(self, login):
+                self.login = login
+                self.created_at = datetime(year=datetime.now().year, month=1, day=2)
+
+        class PullRequest:
+            def __init__(self, id, login):
+                self.id = id
+                self.user = Login(login)
+                self.created_at = self.user.created_at
+                self.updated_at = self.created_at
+
+            def get_reviews(self):
+                return []
+
+        class Repo:
+            def __init__(self, name):
+                self.name = name
+                self.pulls_calls = 0
+
+            def get_pulls(self, state='closed', sort='created', direction='desc'):
+                self.pulls_calls += 1
+                return [PullRequest(1, 'fake-user1'), PullRequest(2, 'fake-user2')]
+
+        self.fake_repos = [Repo('fake-repo1'), Repo('fake-repo2')]
+        github = Mock()
+        github.get_organization.return_value.get_repos.return_value = self.fake_repos
+        return GHClient('fake-access-token', github)
+
+    def test_name(self):
+        self.assertEqual(CLI(self.arguments).command().name(), 'batch')
+
+    def test_load_jobs_invalid(self):
+        self.__write_jobs([{'prs': True, 'commits': True, 'MONTH': 'january', 'ORG': 'fake-org'}])
+        self.assertEqual(CLI(self.arguments).command().load_jobs(), None)
+
+    def test_job_args(self):
+        self.arguments['--state'] = 'open'
+        command = CLI(self.arguments).command()
+        job_args = command.job_args({'prs': True, 'MONTH': 'march', 'ORG': 'fake-org', '--users': 'fake-user1'})
+        self.assertTrue(job_args['prs'])
+        self.assertFalse(job_args['batch'])
+        self.assertEqual(job_args['--state'], 'open')
+        self.assertEqual(job_args['MONTH'], 'march')
+
+    def test_batch_shares_fetches(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        job = {'MONTH': 'january', 'ORG': 'fake-org', '--repos': 'fake-repo1,fake-repo2', '--output': 'json'}
+        self.__write_jobs([dict(job, prs=True, **{'--users': 'fake-user1'}),
+                           dict(job, prs=True, **{'--users': 'fake-user2'}),
+                           dict(job, reviews=True, **{'--users': 'fake-user1,fake-user2'})])
+        try:
+            command = CLI(self.arguments).command(self.__create_fake_client())
+            rc = command.execute()
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(rc, 0)
+        self.assertTrue("needing 2 distinct repo fetches (6 without sharing)" in output)
+        for repo in self.fake_repos:
+            self.assertEqual(repo.pulls_calls, 1)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
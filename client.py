@@ -12,18 +12,44 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
+import math, time, threading
 
-from github import Github
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from collections import OrderedDict
+from concurrent.futures import Future
 
 from common import *
+from paginator import PrefetchPaginator, Listing
+from resilience import Resilience
+from cassette import Cassette
+from telemetry import ApiTelemetry
 
 class GHClient:
-    def __init__(self, access_token, client=None):
+    STATES = ['open', 'closed']
+    ENDPOINTS = {'commits': 'stats/contributors'} # endpoint families of fetch cache kinds named otherwise
+    def __init__(self, access_token, client=None, base_url=None):
         self.client = client
         self.access_token = access_token
+        self.base_url = base_url # None for api.github.com
+        self.host = urlparse(base_url).netloc if base_url else Resilience.DEFAULT_HOST
         self.rate_limit_data = RateLimitData(0, 0)
         self.api_calls = 0
+        self.total_calls = 0
+        self.resilience = Resilience()
+        self.calls_by_repo = {} # {repo_key: API calls}
+        self.fetch_cache = OrderedDict() # {(kind, key...): Listing or [items]}, shared by all commands using this client
+        self.max_fetches = None # fetches kept in fetch_cache, least recently used dropped first, None for all
+        self.in_flight = {} # {(kind, key...): Future} of fetches being made
+        self.fetch_stats = {'fetches': 0, 'coalesced': 0, 'memo_hits': 0}
+        self.prefetch = PrefetchPaginator.DEFAULT_PREFETCH
+        self.deadline = None # epoch seconds after which listings stop being read
+        self.partial_repos = set() # repo keys whose listings were cut short by the deadline
+        self.cassette = None # records or replays the HTTP exchanges
+        self.api_telemetry = ApiTelemetry()
+        self.configured = False # by a long running command for all the commands it runs, e.g., ght serve
+        self.lock = threading.Lock() # guards fetch_cache
+        self.api_calls_lock = threading.Lock()
 
     def _week_in(self, week_date, start_date, end_date):
         week_number = week_date.date().isocalendar()[1]
@@ -33,108 +59,466 @@ class GHClient:
             return True
         return False
 
+    # PyGithub 2 dates are timezone aware while the month window is naive UTC
+    def _utc(self, date):
+        if date.tzinfo == None:
+            return date
+        return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _in_window(self, date, start_date, end_date):
+        date = self._utc(date)
+        return date >= start_date and date <= end_date
+
     def _init_authors_count_map(self, authors):
         authors_count = {}
-        for author in authors:
+        for author in authors or []:
             authors_count[author] = 0
         return authors_count
 
-    def _count_check_api_calls(self):
-        if not self.rate_limit_data.enabled:
+    # authors are matched per item, so use a set instead of scanning a list
+    def _authors_set(self, authors):
+        if authors == None or isinstance(authors, (set, frozenset)):
+            return authors
+        return set(authors)
+
+    # authors of None tracks every author found
+    def _tracked(self, login, authors):
+        return authors == None or login in authors
+
+    def _count_author(self, counts, login, count=1):
+        counts[login] = counts.get(login, 0) + count
+
+    # counts are kept per item state: {'open': {author: count, ...}, 'closed': {...}}
+    def _init_states_count_map(self, authors, state):
+        states = self.STATES if state == 'all' else [state]
+        return dict([(s, self._init_authors_count_map(authors)) for s in states])
+
+    def _count_state_author(self, states_counts, state, item, login):
+        if state == 'all':
+            state = item.state
+        self._count_author(states_counts.setdefault(state, {}), login)
+
+    # returns the per state counts with by_state, otherwise totals per author
+    def _states_counts(self, states_counts, by_state):
+        if by_state:
+            return states_counts
+        counts = {}
+        for state_counts in states_counts.values():
+            for author in state_counts:
+                self._count_author(counts, author, state_counts[author])
+        return counts
+
+    def _count_api_call(self):
+        with self.api_calls_lock:
+            self.total_calls += 1
+            if self.rate_limit_data.enabled():
+                self.api_calls += 1
+
+    # sleeps once --rate-limit calls were made, before the next request is
+    # sent so that the wait is not taken for a slow request and hedged
+    def _check_api_calls(self):
+        with self.api_calls_lock:
+            if not self.rate_limit_data.enabled():
+                return
+            if self.api_calls >= self.rate_limit_data.max_calls():
+                sleep = self.rate_limit_data.sleep()
+                Console.println()
+                Console.warn("Rate limit API calls reach '{max_calls}' and sleeping for '{sleep}' seconds".format(max_calls=self.rate_limit_data.max_calls(), sleep=sleep))
+                time.sleep(sleep)
+                self.api_telemetry.add_rate_limit_wait(sleep)
+                self.api_calls = 0
+
+    def _endpoint(self, kind):
+        return self.ENDPOINTS.get(kind, kind)
+
+    # every GitHub API request goes through here, repo_key attributes it to a
+    # repo and endpoint to a family in the telemetry, each attempt of a retried
+    # request counts as a call
+    def _call(self, request_func, repo_key=None, endpoint='other'):
+        outcomes = [] # of the attempts made, an attempt after a failed one is a retry
+        def attempt():
+            if repo_key != None:
+                with self.api_calls_lock:
+                    self.calls_by_repo[repo_key] = self.calls_by_repo.get(repo_key, 0) + 1
+            self._count_api_call()
+            if len(outcomes) > 0 and not outcomes[-1]:
+                self.api_telemetry.add_retry(endpoint)
+            start = time.time()
+            try:
+                result = request_func()
+            except Exception:
+                outcomes.append(False)
+                self.api_telemetry.add_call(endpoint, time.time() - start, error=True)
+                raise
+            outcomes.append(True)
+            self.api_telemetry.add_call(endpoint, time.time() - start)
+            return result
+        return self.resilience.call(attempt, self.host, self._check_api_calls)
+
+    # a page of a listing of endpoint
+    def _page(self, page_func, repo_key, endpoint):
+        page = self._call(page_func, repo_key, endpoint)
+        self.api_telemetry.add_page(endpoint)
+        return page
+
+    def _repo_key(self, repo):
+        return getattr(repo, 'full_name', repo.name)
+
+    # runs create_func once per key for the client lifetime: the first caller
+    # creates the value while concurrent callers for the same key wait for it,
+    # and later callers reuse it
+    def _single_flight(self, key, create_func):
+        with self.lock:
+            if key in self.fetch_cache:
+                self.fetch_cache.move_to_end(key)
+                self.fetch_stats['memo_hits'] += 1
+                self.api_telemetry.add_cache_hit(self._endpoint(key[0]))
+                return self.fetch_cache[key]
+            leader = key not in self.in_flight
+            if leader:
+                self.in_flight[key] = Future()
+                self.fetch_stats['fetches'] += 1
+            else:
+                self.fetch_stats['coalesced'] += 1
+                self.api_telemetry.add_cache_hit(self._endpoint(key[0]))
+            flight = self.in_flight[key]
+        if not leader:
+            return flight.result()
+        try:
+            value = create_func()
+        except Exception as e:
+            with self.lock:
+                del(self.in_flight[key])
+            flight.set_exception(e)
+            raise
+        with self.lock:
+            self.fetch_cache[key] = value
+            while self.max_fetches != None and len(self.fetch_cache) > self.max_fetches:
+                self.fetch_cache.popitem(last=False)
+            del(self.in_flight[key])
+        flight.set_result(value)
+        return value
+
+    # fetches and materializes a non paginated result once per key, so that
+    # repeated users, commands or batch jobs asking for the same data reuse it
+    def _fetch(self, key, fetch_func, repo_key=None):
+        return self._single_flight(key, lambda: list(self._call(fetch_func, repo_key, self._endpoint(key[0])) or []))
+
+    # same as _fetch for paginated lists, pages are prefetched in the background
+    # and only read as far as the callers need, concurrent readers of a listing
+    # wait for the same pages
+    def _listing(self, key, list_func, repo_key=None, prefetch=None):
+        prefetch = self.prefetch if prefetch == None else prefetch
+        endpoint = self._endpoint(key[0])
+        return self._single_flight(key, lambda: Listing(PrefetchPaginator(list_func(), prefetch, fetch_page=lambda page: self._page(page, repo_key, endpoint))))
+
+    # pulls listed newest first by sort, 'created' or 'updated'
+    def _pulls(self, repo, state, sort):
+        repo_key = self._repo_key(repo)
+        return self._listing(('pulls', repo_key, state, sort), lambda: repo.get_pulls(state=state, sort=sort, direction='desc'), repo_key)
+
+    def _reviews(self, repo, pr):
+        repo_key = self._repo_key(repo)
+        # a PR's reviews rarely fill a page, fetching the next one ahead would double the calls
+        return self._listing(('reviews', repo_key, pr.id), lambda: pr.get_reviews(), repo_key, 0)
+
+    def _issues(self, repo, state, since):
+        repo_key = self._repo_key(repo)
+        return self._listing(('issues', repo_key, state, since), lambda: repo.get_issues(state=state, since=since, sort='created', direction='desc'), repo_key)
+
+    def _stats_contributors(self, repo):
+        repo_key = self._repo_key(repo)
+        return self._fetch(('commits', repo_key), lambda: repo.get_stats_contributors(), repo_key)
+
+    def stats_contributors(self, repo):
+        return self._stats_contributors(repo)
+
+    # items of a listing dated since start_date estimated from its first page,
+    # newest first, extrapolating the dates it spans when all of them are
+    def _sample_listing(self, list_func, date_func, start_date, repo_key, endpoint):
+        page = PrefetchPaginator(list_func(), 0, fetch_page=lambda page: self._page(page, repo_key, endpoint)).read_page() or []
+        dates = [self._utc(date_func(item)) for item in page]
+        since = [date for date in dates if date >= start_date]
+        if len(page) < PrefetchPaginator.PER_PAGE or len(since) < len(dates):
+            return len(since)
+        now = datetime.utcnow()
+        return math.ceil(len(since) * (now - start_date).total_seconds() / max(1, (now - dates[-1]).total_seconds()))
+
+    # pages read to list items, the last one possibly empty, and those fetched ahead
+    def _listing_calls(self, items):
+        return items // PrefetchPaginator.PER_PAGE + 1 + self.prefetch
+
+    # API calls to count kinds in repo since start_date, estimated from the
+    # first page of the listings needed: their pages and a reviews call per
+    # PR updated since start_date, with shared_pulls PRs are counted from the
+    # listing paged for the reviews
+    def estimate_calls(self, repo, kinds, state, start_date, shared_pulls=False):
+        repo_key = self._repo_key(repo)
+        calls = 0
+        if 'commits' in kinds:
+            calls += 1
+        if 'issues' in kinds:
+            issues = self._sample_listing(lambda: repo.get_issues(state=state, since=start_date, sort='created', direction='desc'), lambda i: i.created_at, start_date, repo_key, 'issues')
+            calls += self._listing_calls(issues)
+        elif 'prs' in kinds and not shared_pulls:
+            prs = self._sample_listing(lambda: repo.get_pulls(state=state, sort='created', direction='desc'), lambda pr: pr.created_at, start_date, repo_key, 'pulls')
+            calls += self._listing_calls(prs)
+        if 'reviews' in kinds:
+            prs = self._sample_listing(lambda: repo.get_pulls(state=state, sort='updated', direction='desc'), lambda pr: pr.updated_at, start_date, repo_key, 'pulls')
+            calls += self._listing_calls(prs) + prs
+        return calls
+
+    # API calls to list the repos of an organization with repos
+    def estimate_repos_calls(self, repos):
+        return 1 + self._listing_calls(repos)
+
+    # API calls made so far for repo
+    def repo_calls(self, repo):
+        with self.api_calls_lock:
+            return self.calls_by_repo.get(self._repo_key(repo), 0)
+
+    def fetch_keys(self):
+        return list(self.fetch_cache.keys())
+
+    # drops what was fetched for the repos of repo_keys, e.g., 'org/repo', so
+    # that their next fetches get fresh data, readers of a dropped listing keep it
+    def invalidate(self, repo_keys):
+        repo_keys = set(repo_keys)
+        with self.lock:
+            for key in [key for key in self.fetch_cache if len(key) > 1 and key[1] in repo_keys]:
+                del(self.fetch_cache[key])
+
+    def set_deadline(self, deadline):
+        self.deadline = deadline
+
+    def _past_deadline(self):
+        return self.deadline != None and time.time() >= self.deadline
+
+    # whether the counts of repo were cut short by the deadline, and clears it
+    def pop_partial(self, repo):
+        with self.lock:
+            repo_key = self._repo_key(repo)
+            partial = repo_key in self.partial_repos
+            self.partial_repos.discard(repo_key)
+            return partial
+
+    # stops listings of repo at items past_window or at the deadline, marking repo partial
+    def _stop(self, repo, past_window):
+        def stop(item):
+            if past_window(item):
+                return True
+            if self._past_deadline():
+                with self.lock:
+                    self.partial_repos.add(self._repo_key(repo))
+                return True
+            return False
+        return stop
+
+    def set_max_fetches(self, max_fetches):
+        self.max_fetches = max_fetches
+
+    def set_prefetch(self, prefetch):
+        self.prefetch = prefetch
+
+    def set_resilience(self, retries, hedge_after, read_timeout):
+        self.resilience.configure(retries, hedge_after, read_timeout)
+
+    # run counters: API calls, retries, hedged requests, circuit breaker pauses,
+    # fetches made and those saved by coalescing or reuse
+    def telemetry(self):
+        telemetry = self.resilience.telemetry()
+        telemetry['calls'] = self.total_calls
+        with self.lock:
+            telemetry.update(self.fetch_stats)
+        return telemetry
+
+    # records the HTTP exchanges with GitHub to a cassette in directory
+    def record(self, directory):
+        self._use_cassette(Cassette(directory, 'record', base_url=self.base_url))
+
+    # serves the HTTP exchanges from the cassette in directory instead of GitHub,
+    # waiting as long as recorded with latency, from the base URL recorded with
+    def replay(self, directory, latency=False):
+        self._use_cassette(Cassette(directory, 'replay', latency))
+        if self.cassette.base_url:
+            self.base_url = self.cassette.base_url
+            self.host = urlparse(self.base_url).netloc
+
+    def _use_cassette(self, cassette):
+        if self.cassette != None:
             return
-        self.api_calls += 1
-        if self.api_calls >= self.rate_limit_data.max_calls():
-            Console.println()
-            Console.warn("Rate limit API calls reach '{max_calls}' and sleeping for '{sleep}' seconds".format(max_calls=self.rate_limit_data.max_calls(), sleep=self.rate_limit_data.sleep()))
-            time.sleep(self.rate_limit_data.sleep())
-            self.api_calls = 0
+        self.cassette = cassette
+        self.cassette.install()
+
+    def save_cassette(self):
+        if self.cassette != None:
+            self.cassette.save()
+
+    # the API telemetry of the run so far, see ApiTelemetry.report
+    def api_report(self, labels={}):
+        return self.api_telemetry.report(labels)
 
     def set_rate_limit_data(self, rl):
         self.rate_limit_data = rl
 
+    # PyGithub is imported on first use, it is the slowest part of starting ght
     def get_client(self):
         if self.client == None:
-            self.client = Github(self.access_token)
+            from github import Github
+            options = {'base_url': self.base_url} if self.base_url else {}
+            access_token = self.access_token
+            if self.cassette != None and self.cassette.mode == 'replay':
+                # no need to space out or authenticate requests that never reach GitHub
+                options['seconds_between_requests'] = None
+                access_token = None
+            self.client = Github(access_token, per_page=PrefetchPaginator.PER_PAGE, timeout=self.resilience.timeout(), retry=self.resilience.github_retry(), **options)
         return self.client
 
+    # (remaining, limit, reset_at epoch seconds) of the core API rate limit
+    def rate_limit_status(self):
+        client = self.get_client()
+        remaining, limit = self.resilience.call(lambda: client.rate_limiting, self.host)
+        return (remaining, limit, client.rate_limiting_resettime)
+
+    # calls left in the rate limit as of the last response, None before any,
+    # never making a request unlike rate_limit_status
+    def quota_remaining(self):
+        if self.client == None:
+            return None
+        requester = getattr(self.client, 'requester', None)
+        limits = requester.rate_limiting if requester != None else vars(self.client).get('rate_limiting')
+        if isinstance(limits, tuple) and len(limits) == 2 and isinstance(limits[0], int) and limits[1] >= 0:
+            return limits[0]
+        return None
+
     def repos(self, org):
-        self._count_check_api_calls()
-        ghorg = self.get_client().get_organization(org)
-        return ghorg.get_repos()
+        return list(self._listing(('repos', org), lambda: self._call(lambda: self.get_client().get_organization(org), endpoint='org').get_repos()))
+
+    def team_members(self, org, team_slug, nested=False):
+        team = self._call(lambda: self.get_client().get_organization(org).get_team_by_slug(team_slug), endpoint='teams')
+        return sorted(self._team_members(team, nested))
+
+    def _team_members(self, team, nested):
+        members = set(self._call(lambda: [member.login for member in team.get_members()], endpoint='teams'))
+        if nested:
+            for child_team in self._call(lambda: list(team.get_teams()), endpoint='teams'):
+                members.update(self._team_members(child_team, nested))
+        return members
+
+    # a review submitted in the window updates its PR, so PRs last updated
+    # before the window are past it
+    def _reviewed_pulls(self, repo, pr_state, start_date):
+        return self._pulls(repo, pr_state, 'updated').iter(stop=self._stop(repo, lambda pr: self._utc(pr.updated_at) < start_date))
+
+    def _created_pulls(self, repo, state, start_date):
+        return self._pulls(repo, state, 'created').iter(stop=self._stop(repo, lambda pr: self._utc(pr.created_at) < start_date))
+
+    def _created_issues(self, repo, state, start_date):
+        return self._issues(repo, state, start_date).iter(stop=self._stop(repo, lambda i: self._utc(i.created_at) < start_date))
 
-    def reviews_count(self, repo, author, start_date, end_date, pr_state='close'):
-        self._count_check_api_calls()
-        prs = repo.get_pulls(state=pr_state)
+    # PRs of repo in any state updated since, newest first, e.g., to sync an event store
+    def updated_pulls(self, repo, since):
+        return self._pulls(repo, 'all', 'updated').iter(stop=lambda pr: self._utc(pr.updated_at) < since)
+
+    def reviews(self, repo, pr):
+        return self._reviews(repo, pr)
+
+    # issues of repo in any state updated since, PRs included
+    def updated_issues(self, repo, since):
+        return self._issues(repo, 'all', since)
+
+    def is_pull_request(self, issue):
+        return self._is_pull_request(issue)
+
+    def reviews_count(self, repo, author, start_date, end_date, pr_state='closed'):
+        prs = self._reviewed_pulls(repo, pr_state, start_date)
         reviews_count = 0
         for pr in prs:
-            self._count_check_api_calls()
-            reviews = pr.get_reviews()
+            reviews = self._reviews(repo, pr)
             for r in reviews:
                 try:
-                    if r.user.login == author and (r.submitted_at >= start_date and r.submitted_at <= end_date):
+                    if r.user.login == author and self._in_window(r.submitted_at, start_date, end_date):
                         reviews_count += 1
                 except Exception as e:
                     Console.warn("problem reading review: {r_id} from pr: {pr_id}, message: {message}".format(r_id=r.id, pr_id=pr.id, message=e.__str__()))
         return reviews_count
 
-    def reviews_counts(self, repo, authors, start_date, end_date, pr_state='close'):
-        self._count_check_api_calls()
-        prs = repo.get_pulls(state=pr_state)
-        reviews_counts = self._init_authors_count_map(authors)
+    # reviews are counted in the state of their PR
+    def reviews_counts(self, repo, authors, start_date, end_date, pr_state='closed', by_state=False):
+        authors = self._authors_set(authors)
+        prs = self._reviewed_pulls(repo, pr_state, start_date)
+        reviews_counts = self._init_states_count_map(authors, pr_state)
         for pr in prs:
-            self._count_check_api_calls()
-            reviews = pr.get_reviews()
+            reviews = self._reviews(repo, pr)
             for r in reviews:
                 try:
-                    if r.user.login in authors and (r.submitted_at >= start_date and r.submitted_at <= end_date):
-                        if r.user.login in reviews_counts:
-                            reviews_counts[r.user.login] += 1
+                    if self._tracked(r.user.login, authors) and self._in_window(r.submitted_at, start_date, end_date):
+                        self._count_state_author(reviews_counts, pr_state, pr, r.user.login)
                 except Exception as e:
                     Console.warn("problem reading review: {r_id} from pr: {pr_id}, message: {message}".format(r_id=r.id, pr_id=pr.id, message=e.__str__()))
-        return reviews_counts
+        return self._states_counts(reviews_counts, by_state)
 
-    def prs_count(self, repo, author, start_date, end_date, state='close'):
-        self._count_check_api_calls()
-        prs = repo.get_pulls(state=state)
+    def prs_count(self, repo, author, start_date, end_date, state='closed'):
+        prs = self._created_pulls(repo, state, start_date)
         prs_count = 0
         for pr in prs:
-            if pr.user.login == author and (pr.created_at >= start_date and pr.created_at <= end_date):
+            if pr.user.login == author and self._in_window(pr.created_at, start_date, end_date):
                 prs_count += 1
         return prs_count
 
-    def prs_counts(self, repo, authors, start_date, end_date, state='close'):
-        self._count_check_api_calls()
-        prs = repo.get_pulls(state=state)
-        prs_counts = self._init_authors_count_map(authors)
+    # with sort 'updated' PRs are read from the listing that reviews_counts
+    # pages, a PR created in the window was also updated in it, so that
+    # collecting both PRs and reviews of repo pages a single PRs listing
+    def prs_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False, sort='created'):
+        authors = self._authors_set(authors)
+        if sort == 'updated':
+            prs = self._reviewed_pulls(repo, state, start_date)
+        else:
+            prs = self._created_pulls(repo, state, start_date)
+        prs_counts = self._init_states_count_map(authors, state)
         for pr in prs:
-            if pr.user.login in authors and (pr.created_at >= start_date and pr.created_at <= end_date):
-                if pr.user.login in prs_counts:
-                    prs_counts[pr.user.login] += 1
-        return prs_counts
-
-    def issues_count(self, repo, author, start_date, end_date, state='close'):
-        self._count_check_api_calls()
-        issues = repo.get_issues(state=state, since=start_date)
+            if self._tracked(pr.user.login, authors) and self._in_window(pr.created_at, start_date, end_date):
+                self._count_state_author(prs_counts, state, pr, pr.user.login)
+        return self._states_counts(prs_counts, by_state)
+
+    # the issues listing also returns PRs, marked with a pull_request field,
+    # read from the listed data since PyGithub fetches each issue without it
+    def _is_pull_request(self, issue):
+        raw_data = getattr(issue, '_rawData', None)
+        if isinstance(raw_data, dict):
+            return raw_data.get('pull_request') != None
+        return getattr(issue, 'pull_request', None) != None
+
+    def issues_count(self, repo, author, start_date, end_date, state='closed'):
+        issues = self._created_issues(repo, state, start_date)
         issues_count = 0
         for i in issues:
-            if i.user.login == author and (i.created_at >= start_date and i.created_at <= end_date):
+            if self._is_pull_request(i):
+                continue
+            if i.user.login == author and self._in_window(i.created_at, start_date, end_date):
                 issues_count += 1
         return issues_count
 
-    def issues_counts(self, repo, authors, start_date, end_date, state='close'):
-        self._count_check_api_calls()
-        issues = repo.get_issues(state=state, since=start_date)
-        issues_counts = self._init_authors_count_map(authors)
+    def issues_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False):
+        return self.issues_prs_counts(repo, authors, start_date, end_date, state, by_state)[1]
+
+    # pages the issues listing once and splits it into (prs_counts, issues_counts)
+    def issues_prs_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False):
+        authors = self._authors_set(authors)
+        issues = self._created_issues(repo, state, start_date)
+        prs_counts = self._init_states_count_map(authors, state)
+        issues_counts = self._init_states_count_map(authors, state)
         for i in issues:
-            if i.user.login in authors and (i.created_at >= start_date and i.created_at <= end_date):
-                if i.user.login in issues_counts:
-                    issues_counts[i.user.login] += 1
-        return issues_counts
+            if self._tracked(i.user.login, authors) and self._in_window(i.created_at, start_date, end_date):
+                if self._is_pull_request(i):
+                    self._count_state_author(prs_counts, state, i, i.user.login)
+                else:
+                    self._count_state_author(issues_counts, state, i, i.user.login)
+        return (self._states_counts(prs_counts, by_state), self._states_counts(issues_counts, by_state))
 
     def commits_count(self, repo, author, start_date, end_date):
         commits_count = 0
-        self._count_check_api_calls()
-        for sc in repo.get_stats_contributors():
+        for sc in self._stats_contributors(repo):
             if sc.author.login == author:
                 for w in sc.weeks:
                     if self._week_in(w.w, start_date, end_date): 
@@ -142,12 +526,11 @@ class GHClient:
         return commits_count
 
     def commits_counts(self, repo, authors, start_date, end_date):
+        authors = self._authors_set(authors)
         commits_counts = self._init_authors_count_map(authors)
-        self._count_check_api_calls()
-        for sc in repo.get_stats_contributors():
-            if sc.author.login in authors:
+        for sc in self._stats_contributors(repo):
+            if self._tracked(sc.author.login, authors):
                 for w in sc.weeks:
                     if self._week_in(w.w, start_date, end_date):
-                        if sc.author.login in commits_counts:
-                            commits_counts[sc.author.login] += w.c
+                        self._count_author(commits_counts, sc.author.login, w.c)
         return commits_counts
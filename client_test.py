@@ -12,11 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os, cli, unittest
+import os, cli, time, threading, unittest
 
 from unittest.mock import patch, Mock
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from client import *
+from github import GithubException
+from resilience import Resilience
 
 class TestGHClient(unittest.TestCase):
     def setUp(self):
@@ -40,10 +42,14 @@ class TestGHClient(unittest.TestCase):
                 self.created_at = datetime.now()
 
         class Fake:
+            ids = 0
             def __init__(self,no):
+                Fake.ids += 1
+                self.id = Fake.ids
                 self.no = no
                 self.user = FakeUser(no)
                 self.created_at = datetime.now()
+                self.updated_at = self.created_at
 
         class FakeReview(Fake):
             def __init__(self, no):
@@ -51,16 +57,18 @@ class TestGHClient(unittest.TestCase):
                 self.submitted_at = self.created_at
 
         class FakePullRequest(Fake):
-            def __init__(self, no, reviews=[]):
+            def __init__(self, no, reviews=[], state='closed'):
                 Fake.__init__(self, no)
                 self.reviews = reviews
+                self.state = state
 
             def get_reviews(self):
                 return self.reviews
 
         class FakeIssue(Fake):
-            def __init__(self, no):
+            def __init__(self, no, pull_request=None):
                 Fake.__init__(self, no)
+                self.pull_request = pull_request
 
         class FakeWeek:
             def __init__(self, commit_count):
@@ -76,22 +84,36 @@ class TestGHClient(unittest.TestCase):
         class FakeRepo:
             def __init__(self, name):
                 self.name = name
+                self.pulls_calls = 0
 
-            def get_pulls(self, state='close'):
+            def get_pulls(self, state='closed', sort='created', direction='desc'):
+                self.pulls_calls += 1
                 fake_reviews0 = [FakeReview(0), FakeReview(0), FakeReview(0)]
                 fake_reviews1 = [FakeReview(1), FakeReview(1)]
                 fake_reviews2 = [FakeReview(2)]
-                return [FakePullRequest(0, fake_reviews0), FakePullRequest(1, fake_reviews1), FakePullRequest(1), FakePullRequest(2), FakePullRequest(2, fake_reviews2), FakePullRequest(2)]
+                return [FakePullRequest(0, fake_reviews0), FakePullRequest(1, fake_reviews1), FakePullRequest(1), FakePullRequest(2), FakePullRequest(2, fake_reviews2), FakePullRequest(2, [FakeReview(3)], 'open')]
 
-            def get_issues(self, since=datetime.now(), state='close'):
-                return [FakeIssue(0), FakeIssue(1), FakeIssue(1), FakeIssue(2), FakeIssue(2), FakeIssue(2)]
+            def get_issues(self, since=datetime.now(), state='closed', sort='created', direction='desc'):
+                return [FakeIssue(0), FakeIssue(1), FakeIssue(1), FakeIssue(2), FakeIssue(2), FakeIssue(2), FakeIssue(0, 'fake-pull'), FakeIssue(2, 'fake-pull')]
 
             def get_stats_contributors(self):
                 fake_weeks0 = [FakeWeek(1), FakeWeek(1), FakeWeek(1)]
                 fake_weeks1 = [FakeWeek(1)]
                 return [FakeStatContributor(0, fake_weeks0), FakeStatContributor(1, fake_weeks1), FakeStatContributor(2, [])]
 
+        class FakeTeam:
+            def __init__(self, members, teams=[]):
+                self.members = members
+                self.teams = teams
+
+            def get_members(self):
+                return [FakeUser(no) for no in self.members]
+
+            def get_teams(self):
+                return self.teams
+
         org.get_repos.return_value = [FakeRepo('fake-repo0'), FakeRepo('fake-repo1'), FakeRepo('fake-repo2')]
+        org.get_team_by_slug.return_value = FakeTeam([0, 1], [FakeTeam([1, 2], [FakeTeam([3])])])
         client.get_organization.return_value = org
         return client
 
@@ -103,6 +125,121 @@ class TestGHClient(unittest.TestCase):
         self.assertTrue(self.client.repos('fake-org') != None)
         self.assertTrue(len(self.client.repos('fake-org')) == 3)
 
+    def test_team_members(self):
+        self.assertEqual(self.client.team_members('fake-org', 'fake-team'), ['user0', 'user1'])
+
+    def test_team_members_nested(self):
+        self.assertEqual(self.client.team_members('fake-org', 'fake-team', True), ['user0', 'user1', 'user2', 'user3'])
+
+    def test_fetch_cache(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        end_date = datetime.now()+timedelta(days=1)
+        self.client.prs_count(fake_repo, 'user0', self.start_date, end_date)
+        self.client.prs_count(fake_repo, 'user1', self.start_date, end_date)
+        self.assertEqual(fake_repo.pulls_calls, 1)
+        self.client.reviews_count(fake_repo, 'user0', self.start_date, end_date)
+        self.client.reviews_count(fake_repo, 'user1', self.start_date, end_date)
+        self.assertEqual(fake_repo.pulls_calls, 2)
+        self.assertTrue(('pulls', 'fake-repo0', 'closed', 'created') in self.client.fetch_keys())
+
+    def test_max_fetches(self):
+        self.client.set_max_fetches(2)
+        for key in ['fake-key0', 'fake-key1', 'fake-key0', 'fake-key2']:
+            self.client._single_flight(('commits', key), lambda: [key])
+        self.assertEqual(self.client.fetch_keys(), [('commits', 'fake-key0'), ('commits', 'fake-key2')])
+
+    def test_repo_calls(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        end_date = datetime.now()+timedelta(days=1)
+        self.assertEqual(self.client.repo_calls(fake_repo), 0)
+        self.client.prs_count(fake_repo, 'user0', self.start_date, end_date)
+        self.client.prs_count(fake_repo, 'user1', self.start_date, end_date)
+        self.assertEqual(self.client.repo_calls(fake_repo), 1)
+        self.client.commits_count(fake_repo, 'user0', self.start_date, end_date)
+        self.assertEqual(self.client.repo_calls(fake_repo), 2)
+
+    def test_fetch_single_flight(self):
+        calls = []
+        started, release = threading.Event(), threading.Event()
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return ['fake-item']
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.client._fetch(('fake', 'key'), fetch)))]
+        threads[0].start()
+        started.wait(5)
+        for i in range(3):
+            threads.append(threading.Thread(target=lambda: results.append(self.client._fetch(('fake', 'key'), fetch))))
+            threads[-1].start()
+        while self.client.telemetry()['coalesced'] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['fake-item']]*4)
+        self.assertEqual(self.client._fetch(('fake', 'key'), fetch), ['fake-item'])
+        telemetry = self.client.telemetry()
+        self.assertEqual((telemetry['fetches'], telemetry['coalesced'], telemetry['memo_hits']), (1, 3, 1))
+
+    def test_fetch_single_flight_error(self):
+        def fetch():
+            raise GithubException(404, 'fake-error', None)
+        with self.assertRaises(GithubException):
+            self.client._fetch(('fake', 'key'), fetch)
+        self.assertEqual(self.client._fetch(('fake', 'key'), lambda: ['fake-item']), ['fake-item'])
+
+    def test_call_retry(self):
+        self.client.resilience = Resilience(hedge_after=0, sleep=lambda seconds: None)
+        failures = [GithubException(502, 'fake-error', None)]
+        def request():
+            if len(failures) > 0:
+                raise failures.pop()
+            return 'fake-result'
+        self.assertEqual(self.client._call(request, 'fake-repo0'), 'fake-result')
+        self.assertEqual(self.client.telemetry()['retries'], 1)
+        self.assertEqual(self.client.telemetry()['calls'], 2)
+        self.assertEqual(self.client.calls_by_repo['fake-repo0'], 2)
+
+    def test_call_api_telemetry(self):
+        self.client.resilience = Resilience(hedge_after=0, sleep=lambda seconds: None)
+        failures = [GithubException(502, 'fake-error', None)]
+        def request():
+            if len(failures) > 0:
+                raise failures.pop()
+            return ['fake-item']
+        self.client._fetch(('commits', 'fake-repo0'), request, 'fake-repo0')
+        self.client._fetch(('commits', 'fake-repo0'), request, 'fake-repo0')
+        stats = self.client.api_report()['endpoints']['stats/contributors']
+        self.assertEqual((stats['calls'], stats['errors'], stats['retries'], stats['cache_hits']), (2, 1, 1, 1))
+        self.assertEqual(sum(stats['buckets']), 2)
+
+    def test_rate_limit_disabled(self):
+        self.client.set_rate_limit_data(RateLimitData(1, 60, False))
+        with patch('time.sleep') as sleep:
+            self.client._call(lambda: 'fake-result')
+            self.client._call(lambda: 'fake-result')
+        sleep.assert_not_called()
+        self.assertEqual(self.client.api_calls, 0)
+        self.assertEqual(self.client.telemetry()['calls'], 2)
+
+    def test_rate_limit_wait(self):
+        self.client.set_rate_limit_data(RateLimitData(2, 60, True))
+        with patch('time.sleep') as sleep:
+            for i in range(3):
+                self.client._call(lambda: 'fake-result')
+        sleep.assert_called_once_with(60)
+        self.assertEqual(self.client.api_report()['rate_limit'], {'waits': 1, 'seconds': 60})
+
+    def test_quota_remaining(self):
+        self.assertEqual(self.client.quota_remaining(), None)
+        self.client.client = Mock(requester=Mock(rate_limiting=(4200, 5000)))
+        self.assertEqual(self.client.quota_remaining(), 4200)
+        self.client.client = Mock(requester=Mock(rate_limiting=(-1, -1)))
+        self.assertEqual(self.client.quota_remaining(), None)
+
     def test_reviews_count(self):
         fake_repo = self.client.repos('fake-org')[0]
         reviews_count = self.client.reviews_count(fake_repo, 'user0', self.start_date, datetime.now()+timedelta(days=1))
@@ -127,6 +264,39 @@ class TestGHClient(unittest.TestCase):
         self.assertTrue(prs_counts['user1'] == 2)
         self.assertTrue(prs_counts['user2'] == 3)
 
+    def test_prs_counts_all_authors(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        prs_counts = self.client.prs_counts(fake_repo, None, self.start_date, datetime.now()+timedelta(days=1))
+        self.assertEqual(prs_counts, {'user0': 1, 'user1': 2, 'user2': 3})
+
+    def test_prs_counts_shared_with_reviews(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        end_date = datetime.now()+timedelta(days=1)
+        prs_counts = self.client.prs_counts(fake_repo, None, self.start_date, end_date, 'closed', False, 'updated')
+        self.assertEqual(prs_counts, self.client.prs_counts(fake_repo, None, self.start_date, end_date))
+        self.client.reviews_counts(fake_repo, None, self.start_date, end_date)
+        self.assertEqual(fake_repo.pulls_calls, 2)
+
+    def test_prs_counts_deadline(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        self.client.set_deadline(time.time() - 1)
+        prs_counts = self.client.prs_counts(fake_repo, None, self.start_date, datetime.now()+timedelta(days=1))
+        self.assertEqual(prs_counts, {})
+        self.assertTrue(self.client.pop_partial(fake_repo))
+        self.assertFalse(self.client.pop_partial(fake_repo))
+
+    def test_prs_counts_by_state(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        prs_counts = self.client.prs_counts(fake_repo, ['user0', 'user2'], self.start_date, datetime.now()+timedelta(days=1), 'all', True)
+        self.assertEqual(prs_counts, {'open': {'user0': 0, 'user2': 1}, 'closed': {'user0': 1, 'user2': 2}})
+        prs_counts = self.client.prs_counts(fake_repo, ['user0', 'user2'], self.start_date, datetime.now()+timedelta(days=1), 'all')
+        self.assertEqual(prs_counts, {'user0': 1, 'user2': 3})
+
+    def test_reviews_counts_by_state(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        reviews_counts = self.client.reviews_counts(fake_repo, ['user0', 'user3'], self.start_date, datetime.now()+timedelta(days=1), 'all', True)
+        self.assertEqual(reviews_counts, {'open': {'user0': 0, 'user3': 1}, 'closed': {'user0': 3, 'user3': 0}})
+
     def test_issues_count(self):
         fake_repo = self.client.repos('fake-org')[0]
         issues_count = self.client.issues_count(fake_repo, 'user0', self.start_date, datetime.now()+timedelta(days=1))
@@ -139,6 +309,33 @@ class TestGHClient(unittest.TestCase):
         self.assertTrue(issues_counts['user1'] == 2)
         self.assertTrue(issues_counts['user2'] == 3)
 
+    def test_issues_prs_counts(self):
+        fake_repo = self.client.repos('fake-org')[0]
+        prs_counts, issues_counts = self.client.issues_prs_counts(fake_repo, ['user0', 'user1', 'user2'], self.start_date, datetime.now()+timedelta(days=1))
+        self.assertEqual(prs_counts, {'user0': 1, 'user1': 0, 'user2': 1})
+        self.assertEqual(issues_counts, {'user0': 1, 'user1': 2, 'user2': 3})
+
+    def test_is_pull_request_raw_data(self):
+        class FakeGithubIssue:
+            def __init__(self, raw_data):
+                self._rawData = raw_data
+
+            @property
+            def pull_request(self):
+                raise Exception('fake-lazy-fetch')
+        self.assertTrue(self.client._is_pull_request(FakeGithubIssue({'pull_request': {'url': 'fake-url'}})))
+        self.assertFalse(self.client._is_pull_request(FakeGithubIssue({'number': 1})))
+
+    def test_in_window_utc(self):
+        start_date, end_date = datetime(2020, 3, 1), datetime(2020, 3, 31)
+        self.assertTrue(self.client._in_window(datetime(2020, 3, 1, 1, tzinfo=timezone(timedelta(hours=-2))), start_date, end_date))
+        self.assertFalse(self.client._in_window(datetime(2020, 3, 1, 1, tzinfo=timezone(timedelta(hours=2))), start_date, end_date))
+
+    def test_base_url(self):
+        client = GHClient('fake-access-token', base_url='http://127.0.0.1:8080')
+        self.assertEqual(client.host, '127.0.0.1:8080')
+        self.assertEqual(client.get_client().requester.base_url, 'http://127.0.0.1:8080')
+
     def test_commits_count(self):
         fake_repo = self.client.repos('fake-org')[0]
         commits_count = self.client.commits_count(fake_repo, 'user0', self.start_date, datetime.now()+timedelta(days=1))
@@ -16,6 +16,7 @@ import sys
 from random import randint
 
 VERBOSE=False
+STDERR=False # status and warnings to stderr, e.g., while records stream to stdout
 
 class Colors:
     HEADER = '\033[95m'
@@ -28,38 +29,31 @@ class Colors:
     UNDERLINE = '\033[4m'
 
 class Console:
+    def _file():
+        return sys.stderr if STDERR else sys.stdout
+
     def verbose(msg):
         if VERBOSE:
-            print(f"{Colors.OKBLUE}{msg}{Colors.ENDC}".format(msg=str(msg)))
+            print(f"{Colors.OKBLUE}{msg}{Colors.ENDC}", file=Console._file())
 
     def print(msg=''):
-        print(msg)
+        print(msg, file=Console._file())
 
     def println(no=1):
         for i in range(no):
-            print()
+            print(file=Console._file())
 
     def ok(msg):
-        print(f"{Colors.OKGREEN}{msg}{Colors.ENDC}".format(msg=str(msg)))
+        print(f"{Colors.OKGREEN}{msg}{Colors.ENDC}", file=Console._file())
 
     def error(msg):
         Console.fail(msg)
 
     def fail(msg):
-        print(f"{Colors.FAIL}Error: {msg}{Colors.ENDC}".format(msg=str(msg)))
+        print(f"{Colors.FAIL}Error: {msg}{Colors.ENDC}", file=Console._file())
 
     def warn(msg):
-        print(f"{Colors.WARNING}Warning: {msg}{Colors.ENDC}".format(msg=str(msg)))
-
-    def progress(count, total, status=''):
-        bar_len = 60
-        filled_len = int(round(bar_len * count / float(total)))
-
-        percents = round(100.0 * count / float(total), 1)
-        bar = '=' * filled_len + '-' * (bar_len - filled_len)
-
-        sys.stdout.write('[%s] %s%s ...%s\r' % (bar, percents, '%', status))
-        sys.stdout.flush()
+        print(f"{Colors.WARNING}Warning: {msg}{Colors.ENDC}", file=Console._file())
 
 class RateLimitData:
     DEFAULT_RATE_LIMIT_MAX = 100
@@ -50,11 +50,9 @@ class TestConsole(unittest.TestCase):
         Console.warn("WARN")
         self.assertTrue("WARN" in sys.stdout.getvalue())
 
-    def test_progress(self):
-        Console.progress(1, 100, "100")
-        output = sys.stdout.getvalue()
-        self.assertTrue("[=" in output)
-        self.assertTrue("100" in output)
+    def test_braces(self):
+        Console.warn('502 {"message": "Server Error"}')
+        self.assertTrue('{"message": "Server Error"}' in sys.stdout.getvalue())
 
 class TestRateLimitData(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,103 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from cache import DiskCache
+
+# persistent map of the repos each user was active in per data kind, per
+# organization, along with the users whose activity was fully swept for each
+# data kind, month and state, a sweep of all states covers each of them and
+# commits are swept for all months at once from the contributor stats which
+# cover every week
+# {'sweeps': {'prs': {'2020-03/closed': {'at': timestamp, 'users': ['user0', ...]}, ...}, 'commits': {'*': {...}}},
+#  'activity': {'prs': {'user0': {'repo0': last_active_timestamp, ...}, ...}, ...}}
+class ContributorIndex:
+    # queries are for months of the current year so keep a year of activity
+    ACTIVITY_WINDOW = 366*24*3600
+    ALL_PERIODS_KINDS = ['commits']
+    def __init__(self, org, cache=None):
+        self.org = org
+        self.cache = cache or DiskCache('contributors', 0)
+        self.data = self.cache.get(org, {})
+        if 'activity' not in self.data:
+            # indexes without activity per kind are swept again
+            self.data = {'sweeps': {}, 'activity': {}}
+        self.skipped = 0
+        self.__known = {}
+
+    # the keys of the sweeps covering kind in period and state, the first one is swept
+    def _sweep_keys(self, kind, period, state):
+        if kind in self.ALL_PERIODS_KINDS:
+            return ['*']
+        return ["{period}/{state}".format(period=period, state=s) for s in [state, 'all']]
+
+    def _sweeps(self, kind, period, state):
+        sweeps = self.data['sweeps'].get(kind, {})
+        return [sweeps[key] for key in self._sweep_keys(kind, period, state) if key in sweeps]
+
+    def swept_at(self, kind, period, state):
+        return max([sweep['at'] for sweep in self._sweeps(kind, period, state)] + [0])
+
+    def needs_sweep(self, kind, sweep_period, period, state):
+        return time.time() - self.swept_at(kind, period, state) > sweep_period
+
+    # users are known once a full sweep collected their activity for kind in period and state
+    def known(self, kind, period, state, user):
+        key = (kind, period, state)
+        if key not in self.__known:
+            self.__known[key] = set([user for sweep in self._sweeps(kind, period, state) for user in sweep['users']])
+        return user in self.__known[key]
+
+    # whether user was active in repo in any of kinds, or any kind with None
+    def active(self, user, repo, kinds=None):
+        for kind in kinds or self.data['activity'].keys():
+            last_active = self.data['activity'].get(kind, {}).get(user, {}).get(repo)
+            if last_active != None and time.time() - last_active <= self.ACTIVITY_WINDOW:
+                return True
+        return False
+
+    # the users that may have a non-zero count of any of kinds in repo in period and state
+    def authors(self, kinds, period, state, repo, users):
+        authors = [user for user in users if not all([self.known(kind, period, state, user) for kind in kinds]) or self.active(user, repo, kinds)]
+        self.skipped += len(users) - len(authors)
+        return authors
+
+    # at is when user was active, e.g., the end of the month counted
+    def add_activity(self, kind, user, repo, at):
+        repos = self.data['activity'].setdefault(kind, {}).setdefault(user, {})
+        repos[repo] = max(repos.get(repo, 0), at)
+
+    def add_contributors(self, repo, stats_contributors):
+        for sc in stats_contributors:
+            if sc.author == None:
+                continue
+            for w in sc.weeks:
+                if w.c > 0:
+                    self.add_activity('commits', sc.author.login, repo, w.w.timestamp())
+
+    def mark_swept(self, kind, period, state, users):
+        key = self._sweep_keys(kind, period, state)[0]
+        self.data['sweeps'].setdefault(kind, {})[key] = {'at': time.time(), 'users': sorted(users)}
+        self.__known = {}
+
+    def save(self):
+        for kind_activity in self.data['activity'].values():
+            for user, repos in kind_activity.items():
+                for repo in [repo for repo in repos if time.time() - repos[repo] > self.ACTIVITY_WINDOW]:
+                    del(repos[repo])
+        for sweeps in self.data['sweeps'].values():
+            for key in [key for key in sweeps if time.time() - sweeps[key]['at'] > self.ACTIVITY_WINDOW]:
+                del(sweeps[key])
+        self.cache.set(self.org, self.data)
@@ -0,0 +1,95 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, shutil, tempfile, unittest
+
+from datetime import datetime, timedelta
+from contributors import *
+
+class TestContributorIndex(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.index = ContributorIndex('fake-org', DiskCache('contributors', 0, self.cache_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_needs_sweep(self):
+        self.assertTrue(self.index.needs_sweep('prs', 60, '2020-03', 'closed'))
+        self.index.mark_swept('prs', '2020-03', 'closed', ['fake-user1'])
+        self.assertFalse(self.index.needs_sweep('prs', 60, '2020-03', 'closed'))
+        self.assertTrue(self.index.needs_sweep('prs', 60, '2020-04', 'closed'))
+        self.assertTrue(self.index.needs_sweep('prs', 60, '2020-03', 'open'))
+        self.assertTrue(self.index.needs_sweep('reviews', 60, '2020-03', 'closed'))
+        self.index.mark_swept('prs', '2020-04', 'all', ['fake-user1'])
+        self.assertFalse(self.index.needs_sweep('prs', 60, '2020-04', 'open'))
+        self.index.mark_swept('commits', '2020-03', 'closed', ['fake-user1'])
+        self.assertFalse(self.index.needs_sweep('commits', 60, '2020-05', 'open'))
+
+    def test_authors(self):
+        self.index.add_activity('prs', 'fake-user1', 'fake-repo1', time.time())
+        self.index.mark_swept('prs', '2020-03', 'closed', ['fake-user1', 'fake-user2'])
+        self.assertEqual(self.index.authors(['prs'], '2020-03', 'closed', 'fake-repo1', ['fake-user1', 'fake-user2', 'fake-user3']), ['fake-user1', 'fake-user3'])
+        self.assertEqual(self.index.authors(['prs'], '2020-03', 'closed', 'fake-repo2', ['fake-user1', 'fake-user2']), [])
+        self.assertEqual(self.index.authors(['prs', 'reviews'], '2020-03', 'closed', 'fake-repo2', ['fake-user1']), ['fake-user1'])
+        self.assertEqual(self.index.skipped, 3)
+
+    # the activity of other kinds, or a sweep of other months, never skips a repo
+    def test_authors_per_kind_and_month(self):
+        self.index.add_activity('commits', 'fake-user1', 'fake-repo1', time.time())
+        self.index.mark_swept('reviews', '2020-03', 'closed', ['fake-user1'])
+        self.assertEqual(self.index.authors(['reviews'], '2020-03', 'closed', 'fake-repo1', ['fake-user1']), [])
+        self.assertEqual(self.index.authors(['reviews'], '2020-04', 'closed', 'fake-repo1', ['fake-user1']), ['fake-user1'])
+        self.assertEqual(self.index.authors(['commits'], '2020-03', 'closed', 'fake-repo1', ['fake-user1']), ['fake-user1'])
+        self.assertTrue(self.index.active('fake-user1', 'fake-repo1'))
+        self.assertFalse(self.index.active('fake-user1', 'fake-repo1', ['reviews']))
+
+    def test_active_window(self):
+        self.index.add_activity('prs', 'fake-user1', 'fake-repo1', time.time() - ContributorIndex.ACTIVITY_WINDOW - 1)
+        self.assertFalse(self.index.active('fake-user1', 'fake-repo1'))
+
+    def test_add_contributors(self):
+        class Week:
+            def __init__(self, c):
+                self.w = datetime.now() - timedelta(days=7)
+                self.c = c
+
+        class Author:
+            def __init__(self, login):
+                self.login = login
+
+        class StatContributor:
+            def __init__(self, login, weeks):
+                self.author = Author(login)
+                self.weeks = weeks
+
+        self.index.add_contributors('fake-repo1', [StatContributor('fake-user1', [Week(0), Week(2)]), StatContributor('fake-user2', [Week(0)])])
+        self.assertTrue(self.index.active('fake-user1', 'fake-repo1', ['commits']))
+        self.assertFalse(self.index.active('fake-user2', 'fake-repo1'))
+
+    def test_save(self):
+        self.index.add_activity('commits', 'fake-user1', 'fake-repo1', time.time())
+        self.index.mark_swept('commits', '2020-03', 'closed', ['fake-user1'])
+        self.index.save()
+        index = ContributorIndex('fake-org', DiskCache('contributors', 0, self.cache_dir))
+        self.assertTrue(index.active('fake-user1', 'fake-repo1', ['commits']))
+        self.assertTrue(index.known('commits', '2020-03', 'closed', 'fake-user1'))
+
+    def test_load_without_activity_per_kind(self):
+        DiskCache('contributors', 0, self.cache_dir).set('fake-org', {'sweeps': {'prs': {'at': time.time(), 'users': ['fake-user1']}}, 'users': {}})
+        index = ContributorIndex('fake-org', DiskCache('contributors', 0, self.cache_dir))
+        self.assertTrue(index.needs_sweep('prs', 60, '2020-03', 'closed'))
+
+if __name__ == '__main__':
+    unittest.main()
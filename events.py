@@ -0,0 +1,232 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sqlite3, threading
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from client import GHClient
+
+AT_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# naive UTC, as the month windows, of a datetime or a GitHub ISO 8601 string
+def _utc(date):
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+    if date.tzinfo != None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+def _at(date):
+    return _utc(date).strftime(AT_FORMAT)
+
+def _login(user):
+    return (user or {}).get('login')
+
+# the last update of an item, to keep the latest of the events received out of order
+def _updated(item, default):
+    return _at(item.get('updated_at') or item.get(default))
+
+# rows (kind, repo, id, user, state, at, parent, count, updated) of the items
+# of a GitHub webhook event, counted as the ght commands count them: PRs and
+# issues when created, reviews when submitted in the state of their PR, and
+# commits pushed to the default branch
+def event_rows(event, payload):
+    repo = payload.get('repository', {}).get('full_name')
+    rows = []
+    if repo == None:
+        return rows
+    if event in ['pull_request', 'pull_request_review'] and 'pull_request' in payload:
+        pull = payload['pull_request']
+        rows.append(('prs', repo, str(pull['number']), _login(pull.get('user')), pull['state'], _at(pull['created_at']), None, 1, _updated(pull, 'created_at')))
+        if event == 'pull_request_review' and payload.get('review', {}).get('submitted_at') != None:
+            review = payload['review']
+            rows.append(('reviews', repo, str(review['id']), _login(review.get('user')), pull['state'], _at(review['submitted_at']), str(pull['number']), 1, _at(review['submitted_at'])))
+    elif event == 'issues' and 'issue' in payload and payload['issue'].get('pull_request') == None:
+        issue = payload['issue']
+        rows.append(('issues', repo, str(issue['number']), _login(issue.get('user')), issue['state'], _at(issue['created_at']), None, 1, _updated(issue, 'created_at')))
+    elif event == 'push' and payload.get('ref') == 'refs/heads/' + str(payload['repository'].get('default_branch')):
+        for commit in payload.get('commits', []):
+            if commit.get('distinct', True) and (commit.get('author') or {}).get('username') != None:
+                rows.append(('commits', repo, commit['id'], commit['author']['username'], None, _at(commit['timestamp']), None, 1, _at(commit['timestamp'])))
+    return [row for row in rows if row[3] != None]
+
+# SQLite store of the PRs, issues, reviews and commits of repos, filled from
+# webhook events and reconciliation syncs, one row per item so that the same
+# event received twice, or an item both received and synced, counts once, and
+# an item is only updated from a more recent update
+class EventStore:
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path) != '':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS events (kind TEXT NOT NULL, repo TEXT NOT NULL, id TEXT NOT NULL, user TEXT NOT NULL, '
+                                    'state TEXT, at TEXT NOT NULL, parent TEXT, count INTEGER NOT NULL DEFAULT 1, updated TEXT NOT NULL, PRIMARY KEY (kind, repo, id))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS events_at ON events (kind, repo, at)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS syncs (repo TEXT PRIMARY KEY, at TEXT NOT NULL)')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    # adds rows or updates them when more recent, the reviews of PRs take their state
+    def upsert(self, rows):
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT INTO events (kind, repo, id, user, state, at, parent, count, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                                        'ON CONFLICT (kind, repo, id) DO UPDATE SET user = excluded.user, state = excluded.state, at = excluded.at, '
+                                        'parent = excluded.parent, count = excluded.count, updated = excluded.updated WHERE excluded.updated >= events.updated', rows)
+            self.connection.executemany("UPDATE events SET state = (SELECT pull.state FROM events AS pull WHERE pull.kind = 'prs' AND pull.repo = events.repo AND pull.id = events.parent) "
+                                        "WHERE kind = 'reviews' AND repo = ? AND parent = ?", set([(row[1], row[2]) for row in rows if row[0] == 'prs']))
+        return len(rows)
+
+    # stores the items of a webhook event, returns the rows stored, deleted
+    # issues are removed
+    def ingest(self, event, payload):
+        if event == 'issues' and payload.get('action') == 'deleted' and 'issue' in payload:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM events WHERE kind = 'issues' AND repo = ? AND id = ?", (payload['repository']['full_name'], str(payload['issue']['number'])))
+            return 1
+        return self.upsert(event_rows(event, payload))
+
+    # the commits of user in the week starting at week from contributor stats,
+    # replacing those pushed that week
+    def set_week_commits(self, repo, user, week, count):
+        start, end = _at(week), _at(_utc(week) + timedelta(days=7))
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM events WHERE kind = 'commits' AND repo = ? AND user = ? AND at >= ? AND at < ?", (repo, user, start, end))
+            if count > 0:
+                self.connection.execute('INSERT INTO events (kind, repo, id, user, state, at, parent, count, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        ('commits', repo, 'week:{user}:{start}'.format(user=user, start=start), user, None, start, None, count, end))
+
+    # [(user, state, at, count), ...] of kind in repo at start_date to end_date, in state unless 'all' or None
+    def items(self, kind, repo, start_date, end_date, state=None):
+        query = 'SELECT user, state, at, count FROM events WHERE kind = ? AND repo = ? AND at >= ? AND at <= ?'
+        params = [kind, repo, _at(start_date), _at(end_date)]
+        if state != None and state != 'all':
+            query += ' AND state = ?'
+            params.append(state)
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [(user, item_state, datetime.strptime(at, AT_FORMAT), count) for user, item_state, at, count in rows]
+
+    # full names of the repos of org with events
+    def repos(self, org):
+        with self.lock:
+            rows = self.connection.execute('SELECT DISTINCT repo FROM events WHERE repo LIKE ? ORDER BY repo', (org + '/%',)).fetchall()
+        return [row[0] for row in rows]
+
+    def synced(self, repo):
+        with self.lock:
+            row = self.connection.execute('SELECT at FROM syncs WHERE repo = ?', (repo,)).fetchone()
+        return datetime.strptime(row[0], AT_FORMAT) if row != None else None
+
+    def set_synced(self, repo, at):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO syncs (repo, at) VALUES (?, ?)', (repo, _at(at)))
+
+    # {kind: rows}
+    def stats(self):
+        with self.lock:
+            return dict(self.connection.execute('SELECT kind, COUNT(*) FROM events GROUP BY kind').fetchall())
+
+# fills the gaps of webhook events, e.g., while the receiver was down, by
+# fetching the items of repos updated since their last sync, or backfill
+# seconds before now for their first one
+class EventSync:
+    OVERLAP = 3600 # seconds synced again before the last sync
+    def __init__(self, client, store, backfill=31*24*3600, clock=datetime.utcnow):
+        self.client = client
+        self.store = store
+        self.backfill = backfill
+        self.clock = clock
+
+    def _since(self, repo_key, now):
+        synced = self.store.synced(repo_key)
+        if synced == None:
+            return now - timedelta(seconds=self.backfill)
+        return synced - timedelta(seconds=self.OVERLAP)
+
+    # syncs repos, returns the rows stored
+    def sync(self, repos):
+        total = 0
+        for repo in repos:
+            repo_key = getattr(repo, 'full_name', repo.name)
+            now = self.clock()
+            since = self._since(repo_key, now)
+            # listings are fetched again rather than read from the client fetch cache
+            self.client.invalidate([repo_key])
+            rows = []
+            for pull in self.client.updated_pulls(repo, since):
+                rows.append(('prs', repo_key, str(pull.number), pull.user.login, pull.state, _at(pull.created_at), None, 1, _at(pull.updated_at)))
+                for review in self.client.reviews(repo, pull):
+                    if review.user != None and review.submitted_at != None:
+                        rows.append(('reviews', repo_key, str(review.id), review.user.login, pull.state, _at(review.submitted_at), str(pull.number), 1, _at(review.submitted_at)))
+            for issue in self.client.updated_issues(repo, since):
+                if not self.client.is_pull_request(issue):
+                    updated = getattr(issue, 'updated_at', None) or issue.created_at
+                    rows.append(('issues', repo_key, str(issue.number), issue.user.login, issue.state, _at(issue.created_at), None, 1, _at(updated)))
+            total += self.store.upsert(rows)
+            # weekly counts of contributor stats, only of the weeks over
+            for stats in self.client.stats_contributors(repo):
+                for week in stats.weeks:
+                    if _utc(week.w) + timedelta(days=7) > since and _utc(week.w) + timedelta(days=7) <= now:
+                        self.store.set_week_commits(repo_key, stats.author.login, week.w, week.c)
+            self.store.set_synced(repo_key, now)
+        return total
+
+# a GHClient counting from an EventStore instead of GitHub, so that the ght
+# commands run with --events make no API calls
+class EventsClient(GHClient):
+    def __init__(self, store):
+        super().__init__(None)
+        self.store = store
+
+    def repos(self, org):
+        return [SimpleNamespace(name=full_name.split('/', 1)[1], full_name=full_name) for full_name in self.store.repos(org)]
+
+    def stats_contributors(self, repo):
+        return []
+
+    def _stored_counts(self, kind, repo, authors, start_date, end_date, state, by_state):
+        authors = self._authors_set(authors)
+        states_counts = self._init_states_count_map(authors, state)
+        for user, item_state, at, count in self.store.items(kind, self._repo_key(repo), start_date, end_date, state):
+            if self._tracked(user, authors):
+                self._count_author(states_counts.setdefault(item_state if state == 'all' else state, {}), user, count)
+        return self._states_counts(states_counts, by_state)
+
+    def prs_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False, sort='created'):
+        return self._stored_counts('prs', repo, authors, start_date, end_date, state, by_state)
+
+    def issues_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False):
+        return self._stored_counts('issues', repo, authors, start_date, end_date, state, by_state)
+
+    def issues_prs_counts(self, repo, authors, start_date, end_date, state='closed', by_state=False):
+        return (self.prs_counts(repo, authors, start_date, end_date, state, by_state), self.issues_counts(repo, authors, start_date, end_date, state, by_state))
+
+    def reviews_counts(self, repo, authors, start_date, end_date, pr_state='closed', by_state=False):
+        return self._stored_counts('reviews', repo, authors, start_date, end_date, pr_state, by_state)
+
+    # commits are counted per week as from contributor stats, see GHClient.commits_counts
+    def commits_counts(self, repo, authors, start_date, end_date):
+        authors = self._authors_set(authors)
+        commits_counts = self._init_authors_count_map(authors)
+        for user, state, at, count in self.store.items('commits', self._repo_key(repo), start_date - timedelta(days=7), end_date + timedelta(days=7)):
+            if self._tracked(user, authors) and self._week_in(at, start_date, end_date):
+                self._count_author(commits_counts, user, count)
+        return commits_counts
@@ -0,0 +1,140 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io, os, json, shutil, tempfile, unittest, contextlib
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from docopt import docopt
+
+import ghtrack
+from cli import CLI
+from client import GHClient
+from synthetic import SyntheticOrg, FakeGithub
+from events import *
+
+WEBHOOKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test', 'webhooks')
+
+# a recorded webhook payload, moved to year
+def load_payload(event, year=2020):
+    with open(os.path.join(WEBHOOKS_DIR, event + '.json')) as file:
+        return json.loads(file.read().replace('"2020-', '"{year}-'.format(year=year)))
+
+class TestEventStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = EventStore(os.path.join(self.directory, 'events.db'))
+        self.repo = SimpleNamespace(name='fake-repo', full_name='fake-org/fake-repo')
+        self.start_date, self.end_date = datetime(2020, 3, 1), datetime(2020, 3, 31)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_event_rows(self):
+        self.assertEqual(event_rows('issues', load_payload('issues')),
+                         [('issues', 'fake-org/fake-repo', '13', 'fake-user2', 'open', '2020-03-06T08:00:00', None, 1, '2020-03-06T08:00:00')])
+        commits = event_rows('push', load_payload('push'))
+        self.assertEqual([(row[3], row[5]) for row in commits], [('fake-user1', '2020-03-05T16:40:00'), ('fake-user1', '2020-03-05T16:40:30')])
+        push = dict(load_payload('push'), ref='refs/heads/fix-docs')
+        self.assertEqual(event_rows('push', push), [])
+        issue = load_payload('issues')
+        issue['issue']['pull_request'] = {'url': 'https://api.github.com/repos/fake-org/fake-repo/pulls/13'}
+        self.assertEqual(event_rows('issues', issue), [])
+
+    # the PR closed before an earlier review of it is received stays closed
+    def test_ingest_out_of_order(self):
+        for event in ['pull_request', 'pull_request_review', 'pull_request_review', 'issues', 'push']:
+            self.store.ingest(event, load_payload(event))
+        self.assertEqual(self.store.stats(), {'prs': 1, 'reviews': 1, 'issues': 1, 'commits': 2})
+        self.assertEqual(self.store.items('reviews', 'fake-org/fake-repo', self.start_date, self.end_date, 'closed'),
+                         [('fake-user2', 'closed', datetime(2020, 3, 4, 9, 30), 1)])
+        self.store.ingest('issues', dict(load_payload('issues'), action='deleted'))
+        self.assertEqual(self.store.items('issues', 'fake-org/fake-repo', self.start_date, self.end_date), [])
+        self.assertEqual(self.store.repos('fake-org'), ['fake-org/fake-repo'])
+
+    def test_events_client(self):
+        for event in ['pull_request', 'pull_request_review', 'issues', 'push']:
+            self.store.ingest(event, load_payload(event))
+        client = EventsClient(self.store)
+        self.assertEqual([repo.full_name for repo in client.repos('fake-org')], ['fake-org/fake-repo'])
+        self.assertEqual(client.prs_counts(self.repo, ['fake-user1', 'fake-user2'], self.start_date, self.end_date), {'fake-user1': 1, 'fake-user2': 0})
+        self.assertEqual(client.reviews_counts(self.repo, None, self.start_date, self.end_date, 'all', True), {'open': {}, 'closed': {'fake-user2': 1}})
+        self.assertEqual(client.issues_prs_counts(self.repo, None, self.start_date, self.end_date, 'open'), ({}, {'fake-user2': 1}))
+        self.assertEqual(client.commits_counts(self.repo, ['fake-user1'], self.start_date, self.end_date), {'fake-user1': 2})
+        self.store.set_week_commits('fake-org/fake-repo', 'fake-user1', datetime(2020, 3, 2), 5)
+        self.assertEqual(client.commits_counts(self.repo, ['fake-user1'], self.start_date, self.end_date), {'fake-user1': 5})
+        self.assertEqual(client.total_calls, 0)
+
+    def test_sync(self):
+        org = SyntheticOrg(repos=2, prs=60, reviews=1, issues=20, users=5, year=2020)
+        github = FakeGithub(org)
+        client = GHClient('fake-access-token', github)
+        repos = client.repos(org.name)
+        sync = EventSync(client, self.store, 365*24*3600, clock=lambda: datetime(2021, 1, 1))
+        self.store.ingest('pull_request', dict(load_payload('pull_request'), repository={'full_name': repos[0].full_name}))
+        self.assertTrue(sync.sync(repos) > 0)
+        events_client = EventsClient(self.store)
+        for repo in repos:
+            self.assertEqual(events_client.reviews_counts(repo, None, self.start_date, self.end_date, 'all', True),
+                             client.reviews_counts(repo, None, self.start_date, self.end_date, 'all', True))
+            self.assertEqual(events_client.issues_prs_counts(repo, org.users, self.start_date, self.end_date, 'closed'),
+                             client.issues_prs_counts(repo, org.users, self.start_date, self.end_date, 'closed'))
+            self.assertEqual(events_client.commits_counts(repo, org.users, self.start_date, self.end_date),
+                             client.commits_counts(repo, org.users, self.start_date, self.end_date))
+        self.assertEqual(self.store.synced(repos[0].full_name), datetime(2021, 1, 1))
+        stats = self.store.stats()
+        calls = github.total_calls()
+        sync.clock = lambda: datetime(2021, 1, 2)
+        sync.sync(repos)
+        self.assertEqual(self.store.stats(), stats)
+        self.assertTrue(github.total_calls() - calls < calls)
+
+class TestEventsCommand(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.directory
+        self.events_file = os.path.join(self.directory, 'events.db')
+        store = EventStore(self.events_file)
+        for event in ['pull_request', 'pull_request_review', 'issues', 'push']:
+            store.ingest(event, load_payload(event, datetime.now().year))
+        store.close()
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.directory)
+
+    def test_stats(self):
+        argv = ['stats', 'mar', 'fake-org', '--all-repos', '--all-users', '--commits', '--prs', '--reviews', '--issues', '--state=all',
+                '--events=' + self.events_file, '--output=json']
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            command = CLI(docopt(ghtrack.__doc__, argv=argv)).command()
+            self.assertEqual(command.execute(), 0)
+        self.assertTrue(isinstance(command.client, EventsClient))
+        self.assertEqual(command.users_prs['fake-user1']['fake-repo'], 1)
+        self.assertEqual(command.users_reviews['fake-user2']['fake-repo'], 1)
+        self.assertEqual(command.users_issues['fake-user2']['fake-repo'], 1)
+        self.assertEqual(command.users_commits['fake-user1']['fake-repo'], 2)
+
+    def test_plan_rejected(self):
+        argv = ['prs', 'mar', 'fake-org', '--all-repos', '--users=fake-user1', '--events=' + self.events_file, '--plan']
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(CLI(docopt(ghtrack.__doc__, argv=argv)).command().execute(), 1)
+        self.assertTrue("--plan estimates GitHub API calls" in output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""GH Track fake GitHub server
+
+Serves a synthetic organization through the GitHub REST endpoints used by ght,
+e.g., to run ght with --base-url=http://localhost:8080 without github.com.
+
+Usage:
+  fake_server.py [options]
+
+Options:
+  --port=8080                    Port to listen on [default: 8080].
+  --org=synthetic-org            Name of the organization [default: synthetic-org].
+  --repos=N                      Repos in the organization [default: 10].
+  --prs=N                        PRs per repo [default: 100].
+  --reviews=N                    Reviews per PR [default: 2].
+  --issues=N                     Issues per repo [default: 50].
+  --users=N                      Users in the organization [default: 20].
+  --seed=N                       Seed of the synthetic organization [default: 0].
+  --latency=0.0                  Seconds waited before each response [default: 0.0].
+  --error-rate=0.0               Ratio of requests failing with a 502 error [default: 0.0].
+  --rate-limit=5000              API calls allowed per hour [default: 5000].
+  --computing=0                  Number of 202 responses to contributor stats before they are ready [default: 0].
+  -h --help                      Show this screen.
+"""
+
+import re, json, time, random, hashlib, threading
+
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import SyntheticOrg
+
+def _date(date):
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# a GitHub REST API stand-in with pagination, ETags, rate limit headers,
+# contributor stats being computed (202), latency and injected errors
+class FakeServer:
+    def __init__(self, org, port=0, latency=0, error_rate=0, rate_limit=5000, computing=0, seed=0):
+        self.org = org
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.remaining = rate_limit
+        self.reset = int(time.time()) + 3600
+        self.computing = computing
+        self.computed = {} # {repo: 202 responses sent}
+        self.random = random.Random(seed)
+        self.requests = {} # {endpoint: requests}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def base_url(self):
+        return 'http://127.0.0.1:{port}'.format(port=self.server.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    # counts a request to endpoint, returns the calls remaining in the rate limit window
+    def _count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if time.time() >= self.reset:
+                self.remaining, self.reset = self.rate_limit, int(time.time()) + 3600
+            return self.remaining
+
+    # as on GitHub, conditional requests answered with 304 are not counted
+    def _consume(self):
+        with self.lock:
+            self.remaining = max(0, self.remaining - 1)
+            return self.remaining
+
+    def _fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def _computing(self, repo_name):
+        with self.lock:
+            sent = self.computed.get(repo_name, 0)
+            if sent >= self.computing:
+                return False
+            self.computed[repo_name] = sent + 1
+            return True
+
+    def _repo_json(self, base_url, repo):
+        return {'id': self.org.repos.index(repo) + 1, 'name': repo['name'], 'full_name': repo['full_name'],
+                'url': base_url + '/repos/' + repo['full_name'], 'size': repo['size'],
+                'open_issues_count': repo['open_issues_count'], 'pushed_at': _date(repo['pushed_at']),
+                'owner': {'login': self.org.name}}
+
+    def _item_json(self, base_url, repo, item, kind):
+        json_item = {'id': item['id'], 'user': {'login': item['user']}}
+        for field in ['number', 'state']:
+            if field in item:
+                json_item[field] = item[field]
+        for field in ['created_at', 'updated_at', 'submitted_at']:
+            if field in item:
+                json_item[field] = _date(item[field])
+        if kind == 'pulls':
+            json_item['url'] = '{base_url}/repos/{repo}/pulls/{number}'.format(base_url=base_url, repo=repo['full_name'], number=item['number'])
+        if kind == 'issues':
+            json_item['url'] = '{base_url}/repos/{repo}/issues/{number}'.format(base_url=base_url, repo=repo['full_name'], number=item['number'])
+            if item.get('pull_request') != None:
+                json_item['pull_request'] = {'url': json_item['url'].replace('/issues/', '/pulls/')}
+        return json_item
+
+    def _stats_json(self, repo):
+        return [{'author': {'login': stats['author']}, 'total': sum([week['c'] for week in stats['weeks']]),
+                 'weeks': [{'w': int(week['w'].timestamp()), 'a': 0, 'd': 0, 'c': week['c']} for week in stats['weeks']]}
+                for stats in repo['contributors']]
+
+    # (endpoint, status, body, paginated) of a GET of path, None when not found
+    def route(self, base_url, path, query):
+        match = re.fullmatch(r'/orgs/([^/]+)', path)
+        if match:
+            return ('org', 200, {'login': self.org.name, 'id': 1, 'url': base_url + '/orgs/' + self.org.name}, False)
+        if re.fullmatch(r'/orgs/([^/]+)/repos', path):
+            return ('repos', 200, [self._repo_json(base_url, repo) for repo in self.org.repos], True)
+        if path == '/rate_limit':
+            rate = {'limit': self.rate_limit, 'remaining': self.remaining, 'reset': self.reset, 'used': self.rate_limit - self.remaining}
+            return ('rate_limit', 200, {'resources': {'core': rate}, 'rate': rate}, False)
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)(/.*)?', path)
+        repo = self.org.repo(match.group(2)) if match else None
+        if repo == None:
+            return None
+        rest = match.group(3) or ''
+        if rest == '':
+            return ('repo', 200, self._repo_json(base_url, repo), False)
+        if rest == '/pulls':
+            pulls = self.org.pulls(repo, query.get('state', 'open'), query.get('sort', 'created'))
+            if query.get('direction') == 'asc':
+                pulls.reverse()
+            return ('pulls', 200, [self._item_json(base_url, repo, pull, 'pulls') for pull in pulls], True)
+        match = re.fullmatch(r'/pulls/(\d+)/reviews', rest)
+        if match:
+            pulls = [pull for pull in repo['pulls'] if pull['number'] == int(match.group(1))]
+            if len(pulls) == 0:
+                return None
+            return ('reviews', 200, [self._item_json(base_url, repo, review, 'reviews') for review in pulls[0]['reviews']], True)
+        if rest == '/issues':
+            since = datetime.strptime(query['since'], '%Y-%m-%dT%H:%M:%SZ') if 'since' in query else None
+            issues = self.org.issues(repo, query.get('state', 'open'), since)
+            return ('issues', 200, [self._item_json(base_url, repo, issue, 'issues') for issue in issues], True)
+        match = re.fullmatch(r'/issues/(\d+)', rest)
+        if match:
+            issues = [issue for issue in self.org.issues(repo, 'all') if issue['number'] == int(match.group(1))]
+            if len(issues) == 0:
+                return None
+            return ('issue', 200, self._item_json(base_url, repo, issues[0], 'issues'), False)
+        if rest == '/stats/contributors':
+            if self._computing(repo['name']):
+                return ('stats/contributors', 202, {}, False)
+            return ('stats/contributors', 200, self._stats_json(repo), False)
+        return None
+
+def _handler(fake_server):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'FakeGitHub/1.0'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, headers={}):
+            data = json.dumps(body).encode('utf-8') if body != None else b''
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status != 304:
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _rate_headers(self, remaining):
+            return {'X-RateLimit-Limit': str(fake_server.rate_limit), 'X-RateLimit-Remaining': str(remaining),
+                    'X-RateLimit-Reset': str(fake_server.reset), 'X-RateLimit-Resource': 'core'}
+
+        def _page(self, url, items, query):
+            per_page = min(int(query.get('per_page', 30)), 100)
+            page = int(query.get('page', 1))
+            last = max(1, (len(items) + per_page - 1) // per_page)
+            links = []
+            for rel, page_no in [('next', page + 1), ('last', last)]:
+                if page < last:
+                    links.append('<{url}?{query}>; rel="{rel}"'.format(url=url, query=urlencode(dict(query, page=page_no)), rel=rel))
+            return items[(page - 1)*per_page:page*per_page], {'Link': ', '.join(links)} if len(links) > 0 else {}
+
+        def do_GET(self):
+            if fake_server.latency > 0:
+                time.sleep(fake_server.latency)
+            url = urlparse(self.path)
+            query = dict([(key, values[0]) for key, values in parse_qs(url.query).items()])
+            base_url = 'http://' + self.headers.get('Host', '127.0.0.1')
+            route = fake_server.route(base_url, url.path, query)
+            if fake_server._count(route[0] if route != None else 'not_found') == 0:
+                return self._send(403, {'message': 'API rate limit exceeded'}, self._rate_headers(0))
+            if fake_server._fail():
+                return self._send(502, {'message': 'Server Error'}, self._rate_headers(fake_server._consume()))
+            if route == None:
+                return self._send(404, {'message': 'Not Found'}, self._rate_headers(fake_server._consume()))
+            endpoint, status, body, paginated = route
+            headers = {}
+            if paginated:
+                body, headers = self._page(base_url + url.path, body, query)
+            etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                headers.update(self._rate_headers(fake_server.remaining))
+                return self._send(304, None, headers)
+            headers.update(self._rate_headers(fake_server._consume()))
+            self._send(status, body, headers)
+    return Handler
+
+if __name__ == '__main__':
+    from docopt import docopt
+    args = docopt(__doc__)
+    org = SyntheticOrg(args['--org'], repos=int(args['--repos']), prs=int(args['--prs']), reviews=int(args['--reviews']),
+                       issues=int(args['--issues']), users=int(args['--users']), seed=int(args['--seed']))
+    server = FakeServer(org, int(args['--port']), float(args['--latency']), float(args['--error-rate']),
+                        int(args['--rate-limit']), int(args['--computing']), int(args['--seed']))
+    print("Serving '{org}' ({users}) on {base_url}".format(org=org.name, users=','.join(org.users), base_url=server.base_url()))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
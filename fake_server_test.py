@@ -0,0 +1,90 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json, unittest, urllib.request, urllib.error
+
+from datetime import datetime
+
+from client import GHClient
+from synthetic import SyntheticOrg
+from fake_server import *
+
+class TestFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.org = SyntheticOrg(repos=2, prs=150, reviews=1, issues=10, users=5, year=2020)
+        self.server = FakeServer(self.org).start()
+        self.client = GHClient('fake-access-token', base_url=self.server.base_url())
+        self.client.set_resilience(0, 0, 5)
+        self.start_date, self.end_date = datetime(2020, 3, 1), datetime(2020, 3, 31)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def __get(self, path, headers={}):
+        request = urllib.request.Request(self.server.base_url() + path, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return (response.status, response.headers, response.read())
+        except urllib.error.HTTPError as e:
+            return (e.code, e.headers, e.read())
+
+    def test_repos(self):
+        self.assertEqual([repo.name for repo in self.client.repos('synthetic-org')], ['repo0', 'repo1'])
+
+    def test_pagination(self):
+        status, headers, body = self.__get('/repos/synthetic-org/repo0/pulls?state=all&per_page=100')
+        self.assertEqual(len(json.loads(body)), 100)
+        self.assertTrue('page=2' in headers['Link'] and 'rel="next"' in headers['Link'])
+        status, headers, body = self.__get('/repos/synthetic-org/repo0/pulls?state=all&per_page=100&page=2')
+        self.assertEqual(len(json.loads(body)), 50)
+        self.assertEqual(headers['Link'], None)
+
+    def test_etag(self):
+        status, headers, body = self.__get('/orgs/synthetic-org')
+        remaining = headers['X-RateLimit-Remaining']
+        status, headers, body = self.__get('/orgs/synthetic-org', {'If-None-Match': headers['ETag']})
+        self.assertEqual(status, 304)
+        self.assertEqual(headers['X-RateLimit-Remaining'], remaining)
+
+    def test_rate_limit(self):
+        self.server.rate_limit = self.server.remaining = 1
+        self.assertEqual(self.__get('/orgs/synthetic-org')[0], 200)
+        self.assertEqual(self.__get('/orgs/synthetic-org')[0], 403)
+
+    def test_counts(self):
+        repo = self.client.repos('synthetic-org')[0]
+        expected = {}
+        for pull in self.org.pulls(self.org.repos[0], 'closed'):
+            if pull['created_at'] >= self.start_date and pull['created_at'] <= self.end_date:
+                expected[pull['user']] = expected.get(pull['user'], 0) + 1
+        self.assertEqual(self.client.prs_counts(repo, None, self.start_date, self.end_date), expected)
+        self.assertEqual(self.client.issues_prs_counts(repo, None, self.start_date, self.end_date)[0], expected)
+        self.assertFalse('issue' in self.server.requests)
+
+    def test_computing(self):
+        self.server.computing = 1
+        repo = self.client.repos('synthetic-org')[0]
+        self.assertEqual(len(self.client.stats_contributors(repo)), 5)
+        self.assertEqual(self.server.requests['stats/contributors'], 2)
+
+    def test_errors(self):
+        self.server.error_rate = 1
+        self.client.resilience.sleep = lambda seconds: None
+        self.client.set_resilience(2, 0, 5)
+        with self.assertRaises(Exception):
+            self.client.repos('synthetic-org')
+        self.assertEqual(self.server.requests['org'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
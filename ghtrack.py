@@ -17,11 +17,14 @@
 """GitHub track
 
 Usage:
-  ght commits MONTH ORG [options]
-  ght prs MONTH ORG [options]
-  ght reviews MONTH ORG [options]
-  ght issues MONTH ORG [options]
-  ght stats MONTH ORG [options]
+  ght commits MONTH ORG [--team=ORG/TEAM]... [options]
+  ght prs MONTH ORG [--team=ORG/TEAM]... [options]
+  ght reviews MONTH ORG [--team=ORG/TEAM]... [options]
+  ght issues MONTH ORG [--team=ORG/TEAM]... [options]
+  ght stats MONTH ORG [--team=ORG/TEAM]... [options]
+  ght batch JOBS_FILE [options]
+  ght serve ORG [options]
+  ght webhook ORG [options]
 
   ght (-h | --help)
   ght (-v | --version)
@@ -41,18 +44,54 @@ Options:
   --rl-max=100                   Max number of API calls before sleeping [default: 100].
   --rl-sleep=30m                 Time to sleep once max API calls reach, e.g., 30m, 1h for 30 mins, 1 hour [default: 30m].
 
-  -s --state=closed              State one of 'open' or 'closed' [default: closed].
+  -s --state=closed              State one of 'open', 'closed' or 'all' [default: closed].
 
   --users=user1,user2,...        List of GitHub user IDs to track.
+  --team=ORG/TEAM                GitHub team whose members are added to the users to track, repeatable.
+  --teams=org/team1,...          List of GitHub teams whose members are added to the users to track.
+  --nested-teams                 Also add members of child teams of --team and --teams.
+  --teams-ttl=1d                 Time to cache teams members, e.g., 30m, 1d [default: 1d].
+  --all-users                    Track every author found in the tracked repos instead of --users.
+  --top=N                        Only show the N most active users, 0 for all [default: 0].
 
   --all-repos                    Track all repositories in GitHub organization.
   --repos=repo1,repo2,...        List of repositories in GitHub organization to track.
   --skip-repos=repo1,repo2,...   List of repositories in GitHub organization to skip.
+  --contributor-index            Skip repos where tracked users had no activity, using a persisted contributor index.
+  --index-sweep=7d               Time between full sweeps of all repos refreshing the contributor index [default: 7d].
+  --group-by=user,data           Also output totals grouped by any of: user, repo, data, state, period.
   --show-all-stats               Show all stats even when 0 or non-existant for a user [default: False].
 
+  --plan                         Print the estimated GitHub API calls and duration without collecting any data.
+  --budget=N                     With --plan, split the repos into runs of at most N API calls each [default: 0].
+  --max-runtime=10m              Stop starting repos after this duration and output counts marked complete, partial or missing.
+  --retries=3                    Number of retries of GitHub API requests failing with server or network errors [default: 3].
+  --timeout=30s                  Read timeout of GitHub API requests [default: 30s].
+  --hedge-after=10s              Send a second identical request when one takes longer than this, 0s to disable [default: 10s].
+  --workers=4                    Number of repos processed in parallel, biggest repos first [default: 4].
+  --prefetch=1                   Number of pages of GitHub listings to fetch ahead in the background [default: 1].
+  --profile-api                  Print the GitHub API calls, pages, bytes, errors, retries, cache hits and latencies of the run per endpoint.
+  --profile-api-file=FILE        Save the GitHub API profile of the run to FILE, as a Prometheus textfile if it ends with .prom, otherwise as JSON.
+  --profile=FILE                 Save the time, CPU and memory of the run phases (resolving, collecting, aggregating, rendering) to FILE as JSON.
+  --profile-cpu                  With --profile, also profile the functions of all threads with cProfile, saved to FILE.pstats.
+  --profile-memory               With --profile, also trace memory allocations with tracemalloc, the top ones per phase.
+
+  --port=8080                    Port of the local HTTP API of ght serve or ght webhook [default: 8080].
+  --host=127.0.0.1               Address ght webhook listens on, e.g., 0.0.0.0 for GitHub to reach it without a proxy [default: 127.0.0.1].
+  --refresh=15m                  Time between background refreshes of the reports served by ght serve [default: 15m].
+  --events=FILE                  Count from the events stored in this SQLite file by ght webhook instead of calling GitHub.
+  --webhook-secret=SECRET        Secret of the GitHub webhook to verify events received by ght webhook, defaults to $GHTRACK_WEBHOOK_SECRET.
+  --reconcile=1h                 Time between ght webhook syncs of the repos with GitHub filling gaps of missed events [default: 1h].
+  --backfill=31d                 Time before now fetched by the first ght webhook sync of a repo [default: 31d].
+
   -a --access-token=ACCESS_TOKEN Your GitHub access token to access GitHub APIs.
+  --base-url=URL                 GitHub API URL, e.g., of GitHub Enterprise or a local fake server, defaults to https://api.github.com.
+  --record=DIR                   Record the HTTP exchanges with GitHub to a compressed cassette in DIR.
+  --replay=DIR                   Replay the cassette recorded in DIR instead of calling GitHub.
+  --replay-latency               With --replay, wait as long as each recorded exchange took.
 
-  -o --output=CSV                The format of the output: text, json, yml, or csv [default: text].
+  -o --output=CSV                The format of the output: text, json, yml, csv or ndjson [default: text].
+  --stream                       With csv output, write rows as each repo is collected.
   -f --file=output.csv           The file path to save results file.
 
   -h --help                      Show this screen.
@@ -62,10 +101,11 @@ Options:
 import os, sys, traceback
 
 from docopt import docopt
-from cli import *
 
 if __name__ == '__main__':
     args = docopt(__doc__, version='GH Track v0.3.5.3')
+    # imported after docopt so that --help and --version return without loading cli
+    from cli import *
     command = CLI(args).command()
     rc = command.execute()
     if rc != 0:
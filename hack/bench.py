@@ -0,0 +1,152 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""GH Track benchmarks
+
+Runs ght commands against a synthetic organization and records the wall time,
+GitHub API calls, pages read and peak memory of each, compared to a baseline.
+
+Usage:
+  bench.py [options]
+
+Options:
+  --commands=commits,prs,...     Commands to run [default: commits,prs,reviews,issues,stats].
+  --repos=N                      Repos in the synthetic organization [default: 10].
+  --prs=N                        PRs per repo [default: 100].
+  --reviews=N                    Reviews per PR [default: 2].
+  --issues=N                     Issues per repo [default: 50].
+  --users=N                      Users in the organization, all tracked [default: 20].
+  --weeks=N                      Weeks of contributor stats [default: 52].
+  --seed=N                       Seed of the synthetic organization [default: 0].
+  --latency=0.0                  Seconds waited by each API call [default: 0.0].
+  --runs=N                       Runs of each command, the median time is kept [default: 3].
+  --month=mar                    Month collected [default: mar].
+  --prefetch=N                   Pages fetched ahead by ght, reading ahead makes the calls vary between runs [default: 0].
+  --args=ARGS                    More ght options for all commands, e.g., '--workers=8' [default: ].
+  --output=results.json          File to save the results to.
+  --baseline=FILE                Baseline results to compare to [default: hack/bench-baseline.json].
+  --tolerance=0.5                Allowed slowdown and memory growth over the baseline, as a ratio [default: 0.5].
+  --update-baseline              Save the results as the new baseline.
+  -h --help                      Show this screen.
+"""
+
+import os, sys, io, json, time, shutil, platform, tempfile, statistics, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from docopt import docopt
+
+import ghtrack
+from cli import CLI, tabulate
+from client import GHClient
+from synthetic import SyntheticOrg, FakeGithub
+
+SIZES = ['repos', 'prs', 'reviews', 'issues', 'users', 'weeks', 'seed']
+MIN_SLOWDOWN = 0.1 # seconds, shorter differences are noise
+
+def command_args(command, org, month, prefetch, extra_args):
+    argv = [command, month, org.name, '--all-repos', '--users=' + ','.join(org.users), '--access-token=fake-access-token', '--prefetch=' + str(prefetch)]
+    if command == 'stats':
+        argv += ['--commits', '--prs', '--reviews', '--issues']
+    return docopt(ghtrack.__doc__, argv=argv + extra_args.split())
+
+# runs command once, returns its measures
+def run(command, org, args, latency):
+    github = FakeGithub(org, latency)
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        rc = CLI(args).command(GHClient('fake-access-token', github)).execute()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        sys.stdout = stdout
+    if rc != 0:
+        raise Exception("'{command}' failed: {rc}".format(command=command, rc=rc))
+    calls = dict(sorted(github.calls.items()))
+    pages = sum([count for endpoint, count in calls.items() if endpoint not in ['org', 'stats/contributors']])
+    return {'seconds': seconds, 'calls': sum(calls.values()), 'pages': pages, 'peak_memory_kb': peak // 1024, 'calls_by_endpoint': calls}
+
+def bench(args):
+    sizes = dict([(size, int(args['--' + size])) for size in SIZES])
+    org = SyntheticOrg('bench-org', **sizes)
+    results = {'sizes': sizes, 'latency': float(args['--latency']), 'prefetch': int(args['--prefetch']), 'args': args['--args'], 'python': platform.python_version(), 'commands': {}}
+    for command in args['--commands'].split(','):
+        runs = []
+        for i in range(int(args['--runs'])):
+            cache_dir = tempfile.mkdtemp()
+            os.environ['GHTRACK_CACHE_DIR'] = cache_dir
+            try:
+                runs.append(run(command, org, command_args(command, org, args['--month'], int(args['--prefetch']), args['--args']), float(args['--latency'])))
+            finally:
+                shutil.rmtree(cache_dir)
+        result = runs[0]
+        result['seconds'] = round(statistics.median([r['seconds'] for r in runs]), 4)
+        result['peak_memory_kb'] = max([r['peak_memory_kb'] for r in runs])
+        results['commands'][command] = result
+    return results
+
+# listings read by a command: the repos, the pulls and issues of each repo
+# and the reviews of each PR, each may stop with pages fetched ahead unread
+def listings(result, sizes):
+    calls = result['calls_by_endpoint']
+    return 1 + sizes['repos'] * len([endpoint for endpoint in ['pulls', 'issues'] if endpoint in calls]) + calls.get('reviews', 0)
+
+# regressions of results over baseline: more calls or pages, beyond those
+# fetched ahead with --prefetch, or slower or bigger beyond tolerance, times
+# depend on the machine the baseline was made on
+def compare(results, baseline, tolerance):
+    table, regressions = [], []
+    for command, result in results['commands'].items():
+        base = baseline['commands'].get(command)
+        if base == None:
+            continue
+        prefetched = max(results.get('prefetch', 0), baseline.get('prefetch', 0)) * listings(base, baseline['sizes'])
+        for measure in ['calls', 'pages', 'seconds', 'peak_memory_kb']:
+            allowed = base[measure] + prefetched if measure in ['calls', 'pages'] else base[measure] * (1 + tolerance)
+            if measure == 'seconds':
+                allowed = max(allowed, base[measure] + MIN_SLOWDOWN)
+            regressed = result[measure] > allowed
+            table.append([command, measure, base[measure], result[measure], 'REGRESSION' if regressed else 'ok'])
+            if regressed:
+                regressions.append((command, measure))
+    return table, regressions
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    results = bench(args)
+    print(tabulate([[command, r['seconds'], r['calls'], r['pages'], r['peak_memory_kb']] for command, r in results['commands'].items()],
+                   headers=['command', 'seconds', 'calls', 'pages', 'peak memory (KB)']))
+    if args['--output']:
+        with open(args['--output'], 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args['--update-baseline']:
+        with open(args['--baseline'], 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print("\nSaved baseline '{baseline}'".format(baseline=args['--baseline']))
+        sys.exit(0)
+    if not os.path.exists(args['--baseline']):
+        sys.exit(0)
+    with open(args['--baseline']) as file:
+        baseline = json.load(file)
+    if baseline['sizes'] != results['sizes']:
+        print("\nBaseline '{baseline}' is for other sizes: {sizes}".format(baseline=args['--baseline'], sizes=baseline['sizes']))
+        sys.exit(0)
+    table, regressions = compare(results, baseline, float(args['--tolerance']))
+    print()
+    print(tabulate(table, headers=['command', 'measure', 'baseline', 'result', '']))
+    sys.exit(1 if len(regressions) > 0 else 0)
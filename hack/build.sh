@@ -79,6 +79,24 @@ run() {
     exit 0
   fi
 
+  # Build the single file zipapp
+  if $(has_flag --zipapp -z); then
+    py_zipapp
+    exit 0
+  fi
+
+  # Run the benchmarks
+  if $(has_flag --bench -B); then
+    py_bench
+    exit 0
+  fi
+
+  # Measure startup time
+  if $(has_flag --bench-startup -b); then
+    py_bench_startup
+    exit 0
+  fi
+
   # Run only docker-image
   if $(has_flag --docker-image); then
     if [[ -z "${docker_username}" ]]; then
@@ -132,6 +150,48 @@ py_build() {
   echo "🧹 Linting *.py sources"
 }
 
+py_zipapp() {
+  local build_dir=$(mktemp -d /tmp/ghtrack-zipapp.XXXXXX)
+
+  echo "📦 Building ght.pyz"
+  for file in *.py; do
+    [[ $file == *_test.py ]] || cp $file $build_dir/
+  done
+  mv $build_dir/ghtrack.py $build_dir/__main__.py
+  if $(has_flag --with-deps); then
+    python3 -m pip install --quiet --target $build_dir -r requirements.txt
+  fi
+  # Legacy .pyc files next to the sources are loaded from the zip without compiling
+  python3 -m compileall -q -b $build_dir
+  python3 -m zipapp $build_dir -o ght.pyz -p "/usr/bin/env python3"
+  rm -rf $build_dir
+  echo "✅ ./ght.pyz"
+}
+
+py_bench() {
+  echo "⏱  Benchmarks"
+  python3 hack/bench.py
+}
+
+py_bench_startup() {
+  local runs=${RUNS:-10}
+
+  echo "⏱  Startup time (average of $runs runs)"
+  python3 -X importtime -c "import cli" 2>&1 | tail -1 | awk -F'|' '{ printf "   import cli:%16.1f ms\n", $2 / 1000 }'
+  local targets=("./ghtrack.py")
+  [ -f ght.pyz ] && targets+=("./ght.pyz")
+  for target in "${targets[@]}"; do
+    for args in "--version" "--help" "commits Foo fake-org --access-token=fake"; do
+      local start=$(date +%s%N)
+      for i in $(seq $runs); do
+        python3 $target $args >/dev/null 2>&1 || true
+      done
+      local end=$(date +%s%N)
+      printf "   %-12s %-45s %6d ms\n" "$target" "$args" $(( (end - start) / runs / 1000000 ))
+    done
+  done
+}
+
 py_test() {
   local test_output=$(mktemp /tmp/ghtrack-test-output.XXXXXX)
 
@@ -302,6 +362,10 @@ with the following options:
 -d  --docker                  Generates Docker image and push using DOCKER_USERNAME
     --docker-image            Generates Docker image only
     --docker-push             Pushes Docker image using DOCKER_USERNAME
+-z  --zipapp                  Build ./ght.pyz, a single file zipapp with precompiled modules
+    --with-deps               Bundle the requirements into ./ght.pyz when used with --zipapp
+-B  --bench                   Run the benchmarks on a synthetic organization, compared to hack/bench-baseline.json
+-b  --bench-startup           Measure the startup time of ght (and ./ght.pyz if built)
 -h  --help                    Display this help message
     --verbose                 More output
     --debug                   Debug information for this script (set -x)
@@ -320,6 +384,7 @@ Examples:
 * Compile with tests: ................ build.sh -f -t
 * Generate and push docker image: .... build.sh --docker
 * Build and all and tests: ........... build.sh --all
+* Build a standalone ght.pyz: ........ build.sh --zipapp --with-deps
 EOT
 }
 
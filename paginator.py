@@ -0,0 +1,124 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+# pages through a PyGithub PaginatedList fetching the next pages in the
+# background while the current one is consumed, plain iterables are one page
+class PrefetchPaginator:
+    PER_PAGE = 100
+    DEFAULT_PREFETCH = 1
+    executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ght-prefetch')
+    def __init__(self, paginated_list, prefetch=DEFAULT_PREFETCH, per_page=PER_PAGE, fetch_page=None):
+        self.paginated_list = paginated_list
+        self.prefetch = prefetch
+        self.per_page = per_page
+        self.fetch_page = fetch_page or (lambda page: page())
+        self.next_page = 0
+        self.last_page = None
+        self.pages = {} # {page_no: future}
+        self.lock = threading.Lock()
+
+    def _paged(self):
+        return hasattr(self.paginated_list, 'get_page')
+
+    def _get_page(self, page_no):
+        if not self._paged():
+            return self.fetch_page(lambda: list(self.paginated_list))
+        return self.fetch_page(lambda: self.paginated_list.get_page(page_no))
+
+    def _submit(self, page_no):
+        if page_no not in self.pages and (self.last_page == None or page_no <= self.last_page):
+            self.pages[page_no] = self.executor.submit(self._get_page, page_no)
+
+    def done(self):
+        return self.last_page != None and self.next_page > self.last_page
+
+    # returns the next page of items or None once all pages were read
+    def read_page(self):
+        with self.lock:
+            if self.done():
+                return None
+            page_no = self.next_page
+            self.next_page += 1
+            self._submit(page_no)
+            if self._paged():
+                for ahead in range(1, self.prefetch + 1):
+                    self._submit(page_no + ahead)
+            future = self.pages.pop(page_no)
+        items = future.result()
+        with self.lock:
+            if not self._paged() or len(items) < self.per_page:
+                self.last_page = page_no
+                self.__cancel()
+        if len(items) == 0:
+            return None
+        return items
+
+    def __cancel(self):
+        for page_no in list(self.pages.keys()):
+            if self.pages[page_no].cancel():
+                del(self.pages[page_no])
+
+    # stops fetching ahead, e.g., once the items read are past the dates of interest
+    def stop(self):
+        with self.lock:
+            self.__cancel()
+
+    def __iter__(self):
+        while True:
+            items = self.read_page()
+            if items == None:
+                return
+            for item in items:
+                yield item
+
+# a lazily paged listing keeping the items read so far, so that later readers
+# reuse them and only page further when they need more
+class Listing:
+    def __init__(self, paginator):
+        self.paginator = paginator
+        self.items = []
+        self.lock = threading.Lock()
+
+    def pages(self):
+        return self.paginator.next_page
+
+    # yields items until stop(item) is True, listings are sorted so that once
+    # an item is past the window all the following ones are too
+    def iter(self, stop=None):
+        index = 0
+        while True:
+            if index < len(self.items):
+                item = self.items[index]
+                index += 1
+                if stop != None and stop(item):
+                    self.paginator.stop()
+                    return
+                yield item
+                continue
+            with self.lock:
+                if index >= len(self.items):
+                    page = self.paginator.read_page()
+                    if page == None:
+                        return
+                    self.items.extend(page)
+
+    def __iter__(self):
+        return self.iter()
+
+    def __len__(self):
+        return len(list(self.iter()))
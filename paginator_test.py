@@ -0,0 +1,89 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading, unittest
+
+from paginator import *
+
+class FakePaginatedList:
+    def __init__(self, total, per_page=3):
+        self.total = total
+        self.per_page = per_page
+        self.pages_read = []
+        self.lock = threading.Lock()
+
+    def get_page(self, page):
+        with self.lock:
+            self.pages_read.append(page)
+        start = page * self.per_page
+        return list(range(start, min(start + self.per_page, self.total)))
+
+class TestPrefetchPaginator(unittest.TestCase):
+    def test_iter(self):
+        fake_list = FakePaginatedList(8)
+        paginator = PrefetchPaginator(fake_list, per_page=3)
+        self.assertEqual(list(paginator), list(range(8)))
+        # at most prefetch pages are read past the last one
+        self.assertTrue(set([0, 1, 2]) <= set(fake_list.pages_read) <= set([0, 1, 2, 3]))
+
+    def test_iter_full_last_page(self):
+        fake_list = FakePaginatedList(6)
+        paginator = PrefetchPaginator(fake_list, prefetch=0, per_page=3)
+        self.assertEqual(list(paginator), list(range(6)))
+        self.assertEqual(fake_list.pages_read, [0, 1, 2])
+
+    def test_prefetch(self):
+        fake_list = FakePaginatedList(30)
+        paginator = PrefetchPaginator(fake_list, prefetch=2, per_page=3)
+        self.assertEqual(paginator.read_page(), [0, 1, 2])
+        paginator.pages[2].result()
+        self.assertEqual(sorted(fake_list.pages_read), [0, 1, 2])
+        self.assertEqual(paginator.read_page(), [3, 4, 5])
+
+    def test_iterable(self):
+        calls = []
+        paginator = PrefetchPaginator([1, 2, 3], fetch_page=lambda page: calls.append(1) or page())
+        self.assertEqual(list(paginator), [1, 2, 3])
+        self.assertEqual(len(calls), 1)
+
+    def test_fetch_page(self):
+        calls = []
+        paginator = PrefetchPaginator(FakePaginatedList(5), prefetch=0, per_page=3, fetch_page=lambda page: calls.append(1) or page())
+        self.assertEqual(list(paginator), list(range(5)))
+        self.assertEqual(len(calls), 2)
+
+class TestListing(unittest.TestCase):
+    def test_iter_stop(self):
+        fake_list = FakePaginatedList(30)
+        listing = Listing(PrefetchPaginator(fake_list, prefetch=0, per_page=3))
+        self.assertEqual(list(listing.iter(stop=lambda item: item >= 4)), [0, 1, 2, 3])
+        self.assertEqual(fake_list.pages_read, [0, 1])
+
+    def test_reuse(self):
+        fake_list = FakePaginatedList(30)
+        listing = Listing(PrefetchPaginator(fake_list, prefetch=0, per_page=3))
+        self.assertEqual(list(listing.iter(stop=lambda item: item >= 2)), [0, 1])
+        self.assertEqual(list(listing.iter(stop=lambda item: item >= 2)), [0, 1])
+        self.assertEqual(fake_list.pages_read, [0])
+        self.assertEqual(list(listing.iter(stop=lambda item: item >= 7)), list(range(7)))
+        self.assertEqual(fake_list.pages_read, [0, 1, 2])
+        self.assertEqual(listing.pages(), 3)
+
+    def test_len(self):
+        listing = Listing(PrefetchPaginator(FakePaginatedList(7), per_page=3))
+        self.assertEqual(len(listing), 7)
+        self.assertEqual(list(listing), list(range(7)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io, sys, json, time, threading
+
+# a phase of a run being timed, see Profiler.span
+class _Span:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler._exit(self)
+        return False
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+# times the phases of a run, e.g., 'resolve/repos', 'collect/prs',
+# 'aggregate/prs' and 'render', in wall and process CPU seconds, with the
+# memory allocated and peak per phase and the top allocations with memory, and
+# the functions of all threads with cpu, spans of the same name add up, the
+# self seconds of a span leave out those of the spans nested in it, e.g.,
+# 'aggregate/prs' in 'collect/prs'
+class Profiler:
+    TOP = 20 # functions and allocations kept in the summary
+    NO_SPAN = _NoSpan()
+    def __init__(self, enabled=False, cpu=False, memory=False):
+        self.enabled = enabled
+        self.cpu = enabled and cpu
+        self.memory = enabled and memory
+        self.phases = {} # {name: {'count': N, 'seconds': S, 'self_seconds': S, 'cpu_seconds': S, 'allocated_kb': KB, 'peak_kb': KB}}
+        self.allocations = [] # top allocations still held at the end of the run
+        self.stack = [] # spans entered in the main thread, outer first
+        self.profiles = [] # cProfile.Profile per thread with cpu
+        self.started = None
+        self.seconds = 0
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return self.NO_SPAN
+        return _Span(self, name)
+
+    def start(self):
+        if not self.enabled or self.started != None:
+            return
+        self.started = time.perf_counter()
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cpu:
+            self._start_cpu()
+
+    # cProfile only profiles the thread it is enabled in before Python 3.12,
+    # so threads started afterwards, e.g., workers, enable their own
+    def _start_cpu(self):
+        import cProfile
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_thread_cpu)
+
+    def _start_thread_cpu(self, frame, event, arg):
+        import cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        if self.started == None:
+            return
+        self.seconds = time.perf_counter() - self.started
+        self.started = None
+        if self.cpu:
+            threading.setprofile(None)
+            for profile in self.profiles:
+                profile.disable()
+        if self.memory:
+            import tracemalloc
+            self.allocations = self._top_allocations()
+            tracemalloc.stop()
+
+    def _memory(self):
+        import tracemalloc
+        return tracemalloc.get_traced_memory()
+
+    def _enter(self, span):
+        span.nested = 0.0
+        if threading.current_thread() is not threading.main_thread():
+            span.main = False
+            return
+        span.main = True
+        if self.memory:
+            current, peak = self._memory()
+            if len(self.stack) > 0:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+            import tracemalloc
+            tracemalloc.reset_peak()
+            span.allocated, span.peak = current, current
+        self.stack.append(span)
+        span.start, span.cpu_start = time.perf_counter(), time.process_time()
+
+    def _exit(self, span):
+        seconds, cpu_seconds = time.perf_counter() - span.start, time.process_time() - span.cpu_start
+        with self.lock:
+            phase = self.phases.setdefault(span.name, {'count': 0, 'seconds': 0.0, 'self_seconds': 0.0, 'cpu_seconds': 0.0})
+            phase['count'] += 1
+            phase['seconds'] += seconds
+            phase['self_seconds'] += seconds - span.nested
+            phase['cpu_seconds'] += cpu_seconds
+        if not span.main:
+            return
+        self.stack.pop()
+        if len(self.stack) > 0:
+            self.stack[-1].nested += seconds
+        if self.memory:
+            current, peak = self._memory()
+            span.peak = max(span.peak, peak)
+            if len(self.stack) > 0:
+                self.stack[-1].peak = max(self.stack[-1].peak, span.peak)
+            phase['allocated_kb'] = phase.get('allocated_kb', 0) + (current - span.allocated) // 1024
+            phase['peak_kb'] = max(phase.get('peak_kb', 0), span.peak // 1024)
+
+    def _top_allocations(self):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        return [{'line': '{file}:{line}'.format(file=stat.traceback[0].filename, line=stat.traceback[0].lineno),
+                 'kb': stat.size // 1024, 'count': stat.count} for stat in snapshot.statistics('lineno')[:self.TOP]]
+
+    def _cpu_stats(self):
+        import pstats
+        with self.lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def _top_functions(self, stats):
+        functions = []
+        for (file, line, function), (calls, primitive_calls, total, cumulative, callers) in stats.stats.items():
+            functions.append({'function': '{file}:{line}({function})'.format(file=file, line=line, function=function),
+                              'calls': calls, 'seconds': round(total, 4), 'cumulative_seconds': round(cumulative, 4)})
+        return sorted(functions, key=lambda f: f['cumulative_seconds'], reverse=True)[:self.TOP]
+
+    def report(self, labels={}):
+        with self.lock:
+            phases = dict([(name, dict(phase)) for name, phase in self.phases.items()])
+        for phase in phases.values():
+            phase['seconds'] = round(phase['seconds'], 4)
+            phase['self_seconds'] = round(phase['self_seconds'], 4)
+            phase['cpu_seconds'] = round(phase['cpu_seconds'], 4)
+        report = {'labels': labels, 'seconds': round(self.seconds, 4), 'phases': phases}
+        if self.memory:
+            report['allocations'] = self.allocations
+        if self.cpu and len(self.profiles) > 0:
+            report['functions'] = self._top_functions(self._cpu_stats())
+        return report
+
+    # the self seconds add up to the run time covered by spans, the seconds of
+    # nested spans are also in those of the spans around them
+    def table(self, report):
+        rows = [[name, phase['count'], phase['seconds'], phase['self_seconds'], phase['cpu_seconds'], phase.get('allocated_kb', ''), phase.get('peak_kb', '')]
+                for name, phase in report['phases'].items()]
+        return rows, ['phase', 'count', 'seconds', 'self seconds', 'cpu seconds', 'allocated KB', 'peak KB']
+
+    # saves report to file_name as JSON, and with cpu the functions stats to
+    # file_name.pstats, e.g., for python -m pstats or snakeviz
+    def save(self, report, file_name):
+        with open(file_name, 'w') as file:
+            json.dump(report, file, indent=2)
+        if self.cpu and len(self.profiles) > 0:
+            self._cpu_stats().dump_stats(file_name + '.pstats')
@@ -0,0 +1,100 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, sys, json, time, pstats, shutil, tempfile, threading, unittest
+
+from profiler import *
+
+def busy_function(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled(self):
+        profiler = Profiler()
+        profiler.start()
+        with profiler.span('collect/prs'):
+            pass
+        profiler.stop()
+        self.assertEqual(profiler.phases, {})
+        self.assertTrue(profiler.span('render') is Profiler.NO_SPAN)
+
+    def test_spans(self):
+        profiler = Profiler(True)
+        profiler.start()
+        for i in range(3):
+            with profiler.span('aggregate/prs'):
+                busy_function(0.01)
+        with profiler.span('render'):
+            time.sleep(0.05)
+        profiler.stop()
+        report = profiler.report({'command': 'prs'})
+        self.assertEqual(report['phases']['aggregate/prs']['count'], 3)
+        self.assertTrue(report['phases']['aggregate/prs']['cpu_seconds'] >= 0.03)
+        self.assertTrue(report['phases']['render']['seconds'] >= 0.05)
+        self.assertTrue(report['phases']['render']['cpu_seconds'] < 0.05)
+        self.assertTrue(report['seconds'] >= 0.08)
+        self.assertFalse('functions' in report or 'allocations' in report)
+
+    def test_nested_spans(self):
+        profiler = Profiler(True)
+        with profiler.span('collect/prs'):
+            with profiler.span('aggregate/prs'):
+                time.sleep(0.05)
+        report = profiler.report()
+        self.assertTrue(report['phases']['collect/prs']['seconds'] >= 0.05)
+        self.assertTrue(report['phases']['collect/prs']['self_seconds'] < 0.05)
+        self.assertEqual(report['phases']['aggregate/prs']['self_seconds'], report['phases']['aggregate/prs']['seconds'])
+
+    def test_memory(self):
+        profiler = Profiler(True, memory=True)
+        profiler.start()
+        with profiler.span('collect/prs'):
+            with profiler.span('aggregate/prs'):
+                items = [str(i) * 10 for i in range(20000)]
+                del(items)
+            kept = [str(i) * 10 for i in range(10000)]
+        profiler.stop()
+        report = profiler.report()
+        self.assertTrue(report['phases']['aggregate/prs']['peak_kb'] > 500)
+        self.assertTrue(report['phases']['collect/prs']['peak_kb'] >= report['phases']['aggregate/prs']['peak_kb'])
+        # what collect/prs still holds at its end, not what aggregate/prs freed
+        self.assertTrue(report['phases']['collect/prs']['allocated_kb'] >= (sys.getsizeof(kept) + sum([sys.getsizeof(item) for item in kept])) // 1024)
+        self.assertTrue(report['phases']['aggregate/prs']['allocated_kb'] < 100)
+        self.assertTrue(any([os.path.basename(__file__) in allocation['line'] for allocation in report['allocations']]))
+
+    def test_cpu_threads(self):
+        directory = tempfile.mkdtemp()
+        try:
+            profiler = Profiler(True, cpu=True)
+            profiler.start()
+            with profiler.span('collect/prs'):
+                thread = threading.Thread(target=busy_function, args=(0.05,))
+                thread.start()
+                thread.join()
+            profiler.stop()
+            report = profiler.report()
+            self.assertTrue(any(['busy_function' in f['function'] for f in report['functions']]))
+            file_name = os.path.join(directory, 'profile.json')
+            profiler.save(report, file_name)
+            with open(file_name) as file:
+                self.assertEqual(json.load(file)['phases']['collect/prs']['count'], 1)
+            stats = pstats.Stats(file_name + '.pstats')
+            self.assertTrue(any([function == 'busy_function' for (file, line, function) in stats.stats]))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
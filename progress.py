@@ -0,0 +1,138 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys, time, threading
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return '{h}h{m:02d}m'.format(h=seconds // 3600, m=seconds % 3600 // 60)
+    if seconds >= 60:
+        return '{m}m{s:02d}s'.format(m=seconds // 60, s=seconds % 60)
+    return '{s}s'.format(s=seconds)
+
+# progress of a whole run in work units, one per (repo, data kind), with the
+# items counted and API calls made per second, the rate limit calls left and
+# the ETA, redrawn at most fps times per second on a terminal, otherwise
+# logged every log_interval seconds to stderr so that piped output stays clean,
+# safe to update from any thread, nothing is shown when not enabled
+class Progress:
+    FPS = 4
+    LOG_INTERVAL = 10 # seconds
+    BAR_LEN = 30
+    def __init__(self, output=None, calls_func=None, quota_func=None, fps=FPS, log_interval=LOG_INTERVAL, clock=time.monotonic, enabled=True):
+        self.output = output or sys.stdout
+        self.tty = hasattr(self.output, 'isatty') and self.output.isatty()
+        if not self.tty and output == None:
+            self.output = sys.stderr
+        self.calls_func = calls_func or (lambda: 0)
+        self.quota_func = quota_func or (lambda: None)
+        self.fps = fps
+        self.log_interval = log_interval
+        self.clock = clock
+        self.enabled = enabled
+        self.total = 0
+        self.done = 0
+        self.items = 0
+        self.status = ''
+        self.started = None
+        self.start_calls = 0
+        self.drawn = None # clock of the last draw or log line
+        self.logged = False
+        self.width = 0 # of the last line drawn, to clear it
+        self.lock = threading.Lock()
+
+    def add_work(self, units):
+        with self.lock:
+            if self.started == None:
+                self.started, self.start_calls = self.clock(), self.calls_func()
+            self.total += units
+
+    # work that turned out not to be needed, e.g., repos skipped by the contributor index
+    def skip(self, units):
+        with self.lock:
+            self.total = max(self.done, self.total - units)
+
+    def advance(self, units=1, items=0, status=None):
+        with self.lock:
+            self.done = min(self.total, self.done + units)
+            self.items += items
+            if status != None:
+                self.status = status
+        self.draw()
+
+    def set_status(self, status):
+        with self.lock:
+            self.status = status
+        self.draw()
+
+    def eta(self, elapsed):
+        if self.done == 0 or elapsed <= 0:
+            return None
+        return (self.total - self.done) * elapsed / self.done
+
+    def line(self):
+        elapsed = self.clock() - self.started if self.started != None else 0
+        percents = 100.0 * self.done / self.total if self.total > 0 else 0.0
+        calls = self.calls_func() - self.start_calls
+        parts = ['{percents:.1f}% {done}/{total}'.format(percents=percents, done=self.done, total=self.total)]
+        if elapsed > 0:
+            parts.append('{items:.1f} items/s, {calls:.1f} calls/s'.format(items=self.items / elapsed, calls=calls / elapsed))
+        quota = self.quota_func()
+        if quota != None:
+            parts.append('{quota} calls left'.format(quota=quota))
+        eta = self.eta(elapsed)
+        parts.append('ETA {eta}'.format(eta=_duration(eta) if eta != None else '?'))
+        if self.status:
+            parts.append(self.status)
+        return ', '.join(parts)
+
+    def _bar(self):
+        filled = int(round(self.BAR_LEN * self.done / self.total)) if self.total > 0 else 0
+        return '[' + '=' * filled + '-' * (self.BAR_LEN - filled) + '] '
+
+    # redraws at most fps times per second, or logs every log_interval seconds
+    def draw(self, force=False):
+        if not self.enabled:
+            return
+        with self.lock:
+            now = self.clock()
+            if self.tty:
+                if not force and self.drawn != None and now - self.drawn < 1.0 / self.fps:
+                    return
+                line = self._bar() + self.line()
+                self.output.write('\r' + line.ljust(self.width))
+                self.width = len(line)
+            else:
+                if self.started == None or (not force and now - (self.drawn or self.started) < self.log_interval):
+                    return
+                self.output.write('progress: ' + self.line() + '\n')
+                self.logged = True
+            self.output.flush()
+            self.drawn = now
+
+    # draws the final state, ending the line on a terminal, or logs it when progress was logged
+    def finish(self):
+        if not self.enabled:
+            return
+        if self.tty:
+            if self.drawn == None:
+                return
+            self.draw(force=True)
+            with self.lock:
+                self.output.write('\n')
+                self.output.flush()
+                self.drawn, self.width = None, 0
+        elif self.logged:
+            self.draw(force=True)
@@ -0,0 +1,104 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io, threading, unittest
+
+from progress import *
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class FakeTTY(io.StringIO):
+    def isatty(self):
+        return True
+
+class TestProgress(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+
+    def __progress(self, output, quota_func=None):
+        return Progress(output, calls_func=lambda: self.calls, quota_func=quota_func, clock=self.clock)
+
+    def test_line(self):
+        progress = self.__progress(io.StringIO(), quota_func=lambda: 4200)
+        progress.add_work(10)
+        self.clock.now += 20
+        self.calls = 40
+        progress.advance(4, items=100, status="'prs' of repo1")
+        self.assertEqual(progress.line(), "40.0% 4/10, 5.0 items/s, 2.0 calls/s, 4200 calls left, ETA 30s, 'prs' of repo1")
+
+    def test_skip(self):
+        progress = self.__progress(io.StringIO())
+        progress.add_work(10)
+        progress.add_work(10)
+        self.clock.now += 5
+        progress.advance(5)
+        progress.skip(12)
+        self.assertEqual((progress.done, progress.total), (5, 8))
+        progress.skip(10)
+        self.assertEqual((progress.done, progress.total), (5, 5))
+        self.assertTrue(progress.line().endswith('ETA 0s'))
+
+    def test_tty_throttled(self):
+        output = FakeTTY()
+        progress = self.__progress(output)
+        progress.add_work(100)
+        for i in range(10):
+            progress.advance()
+        self.assertEqual(output.getvalue().count('\r'), 1)
+        self.clock.now += 1.0 / Progress.FPS
+        progress.advance()
+        self.assertEqual(output.getvalue().count('\r'), 2)
+        self.assertTrue('[===-' in output.getvalue().split('\r')[-1])
+        progress.finish()
+        self.assertTrue(output.getvalue().endswith('\n'))
+        self.assertTrue('11/100' in output.getvalue().split('\r')[-1])
+
+    def test_log_lines(self):
+        output = io.StringIO()
+        progress = self.__progress(output)
+        progress.add_work(3)
+        progress.advance()
+        progress.finish()
+        self.assertEqual(output.getvalue(), '')
+        self.clock.now += Progress.LOG_INTERVAL
+        progress.advance()
+        self.clock.now += 1
+        progress.advance()
+        progress.finish()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('progress: 66.7% 2/3'))
+        self.assertTrue(lines[1].startswith('progress: 100.0% 3/3'))
+
+    def test_threads(self):
+        progress = self.__progress(FakeTTY())
+        progress.add_work(8 * 1000)
+        def work():
+            for i in range(1000):
+                progress.advance(items=2)
+        threads = [threading.Thread(target=work) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((progress.done, progress.items), (8000, 16000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, random, socket, threading
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from common import *
+
+# pauses all requests to a host after repeated failures, e.g., during a GitHub
+# incident, instead of hammering it with retries
+class CircuitBreaker:
+    def __init__(self, host, threshold=5, cooldown=60, sleep=time.sleep):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.sleep = sleep
+        self.failures = 0
+        self.open_until = 0
+        self.opens = 0
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        return time.time() < self.open_until
+
+    # waits while the breaker is open
+    def before(self):
+        wait_seconds = self.open_until - time.time()
+        if wait_seconds > 0:
+            self.sleep(wait_seconds)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and not self.is_open():
+                self.open_until = time.time() + self.cooldown
+                self.opens += 1
+                self.failures = 0
+                Console.warn("{failures} failed requests to '{host}', pausing requests for {cooldown} seconds".format(failures=self.threshold, host=self.host, cooldown=self.cooldown))
+
+# retries idempotent GET requests on transient errors with jittered exponential
+# backoff, hedges requests slower than hedge_after with a second identical one
+# and pauses a host through its circuit breaker
+class Resilience:
+    DEFAULT_HOST = 'api.github.com'
+    DEFAULT_RETRIES = 3
+    DEFAULT_HEDGE_AFTER = 10
+    DEFAULT_READ_TIMEOUT = 30
+    BACKOFF = 1
+    MAX_BACKOFF = 30
+    executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='ght-hedge')
+    def __init__(self, retries=DEFAULT_RETRIES, hedge_after=DEFAULT_HEDGE_AFTER, read_timeout=DEFAULT_READ_TIMEOUT, sleep=time.sleep):
+        self.retries = retries
+        self.hedge_after = hedge_after # seconds, 0 disables hedging
+        self.read_timeout = read_timeout
+        self.sleep = sleep
+        self.breakers = {} # {host: CircuitBreaker}
+        self.stats = {'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'failures': 0}
+        self.lock = threading.Lock()
+
+    def configure(self, retries, hedge_after, read_timeout):
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.read_timeout = read_timeout or self.DEFAULT_READ_TIMEOUT
+
+    # PyGithub takes a single timeout used by requests for both connecting and
+    # reading, slower connects are covered by hedging
+    def timeout(self):
+        return int(self.read_timeout)
+
+    # PyGithub only keeps waiting on secondary rate limits (403), other errors
+    # are retried here so that every retry is counted
+    def github_retry(self):
+        from github import GithubRetry
+        return GithubRetry(total=self.retries, connect=0, read=0, status_forcelist=[])
+
+    def breaker(self, host):
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(host, sleep=self.sleep)
+            return self.breakers[host]
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def telemetry(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['breaker_opens'] = sum([breaker.opens for breaker in self.breakers.values()])
+        return stats
+
+    # server errors, throttling and network errors are worth retrying, other
+    # GitHub errors like 404 are not
+    def retryable(self, e):
+        status = getattr(e, 'status', None)
+        if status != None:
+            return status >= 500 or status == 429
+        import requests
+        return isinstance(e, (ConnectionError, TimeoutError, socket.timeout, requests.exceptions.RequestException))
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.MAX_BACKOFF, self.BACKOFF * 2**attempt))
+
+    # the hedge timer starts once the first request runs rather than when it
+    # is queued behind others in the shared executor
+    def _hedged(self, request_func):
+        if self.hedge_after <= 0:
+            return request_func()
+        started = threading.Event()
+        def first_request():
+            started.set()
+            return request_func()
+        first = self.executor.submit(first_request)
+        started.wait()
+        done, pending = wait([first], timeout=self.hedge_after)
+        if len(done) > 0:
+            return first.result()
+        self._count('hedges')
+        second = self.executor.submit(request_func)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        future = done.pop()
+        if future.exception() != None and len(pending) > 0:
+            future = pending.pop()
+        elif future == second:
+            self._count('hedge_wins')
+        return future.result()
+
+    # before_func runs ahead of each attempt, outside of the hedge timer,
+    # e.g., to wait for a rate limit
+    def call(self, request_func, host=DEFAULT_HOST, before_func=None):
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            breaker.before()
+            if before_func != None:
+                before_func()
+            try:
+                result = self._hedged(request_func)
+                breaker.success()
+                return result
+            except Exception as e:
+                if not self.retryable(e):
+                    raise
+                breaker.failure()
+                self._count('failures')
+                if attempt >= self.retries:
+                    raise
+                self._count('retries')
+                Console.verbose("retrying request to '{host}' after: {message}".format(host=host, message=e.__str__()))
+                self.sleep(self.backoff(attempt))
+                attempt += 1
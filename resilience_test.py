@@ -0,0 +1,112 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, threading, unittest
+
+from github import GithubException
+
+from resilience import *
+
+class FakeRequest:
+    def __init__(self, failures, status=502):
+        self.failures = failures
+        self.status = status
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise GithubException(self.status, 'fake-error', None)
+        return 'fake-result'
+
+class TestResilience(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.resilience = Resilience(retries=3, hedge_after=0, sleep=self.sleeps.append)
+
+    def test_retry(self):
+        request = FakeRequest(2)
+        self.assertEqual(self.resilience.call(request), 'fake-result')
+        self.assertEqual(request.calls, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(self.resilience.telemetry()['retries'], 2)
+
+    def test_retries_exhausted(self):
+        request = FakeRequest(10)
+        with self.assertRaises(GithubException):
+            self.resilience.call(request)
+        self.assertEqual(request.calls, 4)
+        self.assertEqual(self.resilience.telemetry()['failures'], 4)
+
+    def test_not_retryable(self):
+        request = FakeRequest(1, 404)
+        with self.assertRaises(GithubException):
+            self.resilience.call(request)
+        self.assertEqual(request.calls, 1)
+        self.assertEqual(self.resilience.telemetry()['retries'], 0)
+
+    def test_backoff(self):
+        for attempt in range(10):
+            self.assertTrue(0 <= self.resilience.backoff(attempt) <= min(Resilience.MAX_BACKOFF, 2**attempt))
+
+    def test_hedge(self):
+        resilience = Resilience(hedge_after=0.05)
+        calls = []
+        release = threading.Event()
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                return 'slow-result'
+            return 'fast-result'
+        self.assertEqual(resilience.call(request), 'fast-result')
+        release.set()
+        self.assertEqual(resilience.telemetry()['hedges'], 1)
+        self.assertEqual(resilience.telemetry()['hedge_wins'], 1)
+
+    def test_hedge_not_waits(self):
+        resilience = Resilience(hedge_after=0.05)
+        calls = []
+        self.assertEqual(resilience.call(lambda: calls.append(1) or 'fake-result', before_func=lambda: time.sleep(0.2)), 'fake-result')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(resilience.telemetry()['hedges'], 0)
+
+    def test_hedge_not_queued(self):
+        resilience = Resilience(hedge_after=0.05)
+        resilience.executor = ThreadPoolExecutor(max_workers=1)
+        resilience.executor.submit(time.sleep, 0.2)
+        self.assertEqual(resilience.call(lambda: 'fake-result'), 'fake-result')
+        self.assertEqual(resilience.telemetry()['hedges'], 0)
+
+    def test_circuit_breaker(self):
+        resilience = Resilience(retries=10, hedge_after=0, sleep=self.sleeps.append)
+        request = FakeRequest(5)
+        self.assertEqual(resilience.call(request), 'fake-result')
+        self.assertEqual(resilience.telemetry()['breaker_opens'], 1)
+        self.assertTrue(resilience.breaker(Resilience.DEFAULT_HOST).is_open())
+        # the request after the 5th failure waited for the breaker to close
+        self.assertTrue(self.sleeps[-1] > 50)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_success_resets(self):
+        breaker = CircuitBreaker('fake-host', threshold=2, sleep=lambda seconds: None)
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertFalse(breaker.is_open())
+        breaker.failure()
+        self.assertTrue(breaker.is_open())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, queue, threading
+
+from collections import deque
+
+from common import *
+from paginator import PrefetchPaginator
+
+# lets interactive runs go first among the runs sharing it, e.g., those of
+# ght serve: workers of background runs only start a repo while no
+# interactive run is in progress
+class PriorityGate:
+    def __init__(self):
+        self.interactive = 0
+        self.condition = threading.Condition()
+
+    def enter(self):
+        with self.condition:
+            self.interactive += 1
+
+    def leave(self):
+        with self.condition:
+            self.interactive -= 1
+            self.condition.notify_all()
+
+    # waits while interactive runs are in progress
+    def wait(self):
+        with self.condition:
+            while self.interactive > 0:
+                self.condition.wait()
+
+# runs work over repos on worker threads, biggest repos first so that the
+# run does not end waiting on one large repo, idle workers steal from others
+class RepoScheduler:
+    DEFAULT_WORKERS = 4
+    # relative API calls per page of each data kind, reviews need a call per PR
+    KIND_WEIGHTS = {'commits': 1, 'prs': 1, 'issues': 1, 'reviews': 5}
+    SIZE_UNIT = 100*1024 # KB of repo size counting as one extra page
+    RECENT_PUSH = 31*24*3600
+    def __init__(self, workers=DEFAULT_WORKERS, history=None, calls_func=None):
+        self.workers = max(1, workers)
+        self.history = history # DiskCache of {'repo:kinds': calls} from past runs
+        self.calls_func = calls_func or (lambda repo: 0)
+        self.report = [] # [(repo, predicted, actual, seconds), ...]
+        self.deadline = None # epoch seconds after which no more repos are started
+        self.gate = None # PriorityGate shared with other runs
+        self.background = False
+        self.lock = threading.Lock()
+
+    def set_deadline(self, deadline):
+        self.deadline = deadline
+
+    def set_gate(self, gate, background=False):
+        self.gate = gate
+        self.background = background
+
+    def _repo_key(self, repo):
+        return getattr(repo, 'full_name', repo.name)
+
+    def _history_key(self, repo, kinds):
+        return "{repo}:{kinds}".format(repo=self._repo_key(repo), kinds='+'.join(sorted(kinds)))
+
+    # API calls of kinds in repo in past runs, None without any
+    def past_calls(self, repo, kinds):
+        if self.history == None:
+            return None
+        return self.history.get(self._history_key(repo, kinds))
+
+    # relative API calls for kinds in repo to order the repos, past runs win
+    # over the listing metadata
+    def estimate(self, repo, kinds):
+        past = self.past_calls(repo, kinds)
+        if past != None:
+            return past
+        pages = 1 + (getattr(repo, 'open_issues_count', 0) or 0) / PrefetchPaginator.PER_PAGE
+        pages += (getattr(repo, 'size', 0) or 0) / self.SIZE_UNIT
+        pushed_at = getattr(repo, 'pushed_at', None)
+        if pushed_at != None and time.time() - pushed_at.timestamp() <= self.RECENT_PUSH:
+            pages *= 2
+        return pages * sum([self.KIND_WEIGHTS.get(kind, 1) for kind in kinds])
+
+    # longest first, or by priority then cheapest first when a priority is
+    # given, each repo goes to the least loaded worker queue
+    def _queues(self, repos, estimates, priority=None):
+        queues = [deque() for i in range(min(self.workers, len(repos)))]
+        loads = [0]*len(queues)
+        order = lambda repo: -estimates[id(repo)]
+        if priority != None:
+            order = lambda repo: (-priority(repo), estimates[id(repo)])
+        for repo in sorted(repos, key=order):
+            i = loads.index(min(loads))
+            queues[i].append(repo)
+            loads[i] += estimates[id(repo)]
+        return queues
+
+    # own queue from its front (biggest), otherwise the smallest repo of the
+    # most loaded other queue
+    def _next_repo(self, queues, i):
+        if self.deadline != None and time.time() >= self.deadline:
+            return None
+        with self.lock:
+            if len(queues[i]) > 0:
+                return queues[i].popleft()
+            victim = max(queues, key=len)
+            if len(victim) > 0:
+                return victim.pop()
+        return None
+
+    def _worker(self, queues, i, work_func, results):
+        while True:
+            if self.gate != None and self.background:
+                self.gate.wait()
+            repo = self._next_repo(queues, i)
+            if repo == None:
+                results.put(None)
+                return
+            start, calls = time.time(), int(self.calls_func(repo))
+            try:
+                result, error = work_func(repo), None
+            except Exception as e:
+                result, error = None, e
+            results.put((repo, result, error, int(self.calls_func(repo)) - calls, time.time() - start))
+
+    # yields (repo, work_func(repo)) as repos complete, kinds are the data
+    # collected used to estimate and record the cost of each repo, repos not
+    # started by the deadline are not yielded
+    def run(self, repos, work_func, kinds, priority=None):
+        repos = list(repos)
+        self.report = []
+        if len(repos) == 0:
+            return
+        estimates = dict([(id(repo), self.estimate(repo, kinds)) for repo in repos])
+        queues = self._queues(repos, estimates, priority)
+        results = queue.Queue()
+        interactive = self.gate != None and not self.background
+        if interactive:
+            self.gate.enter()
+        try:
+            for i in range(len(queues)):
+                threading.Thread(target=self._worker, args=(queues, i, work_func, results), daemon=True).start()
+            actuals, running = {}, len(queues)
+            while running > 0:
+                result = results.get()
+                if result == None:
+                    running -= 1
+                    continue
+                repo, result, error, calls, seconds = result
+                if error != None:
+                    with self.lock:
+                        for q in queues: q.clear()
+                    raise error
+                self.report.append((self._repo_key(repo), estimates[id(repo)], calls, seconds))
+                actuals[self._history_key(repo, kinds)] = self._learn(estimates[id(repo)], calls, repo, kinds)
+                yield (repo, result)
+        finally:
+            if interactive:
+                self.gate.leave()
+        if self.history != None:
+            self.history.update(actuals)
+
+    # moving average of the calls seen, so estimates improve over runs
+    def _learn(self, predicted, actual, repo, kinds):
+        if self.history == None or self.history.get(self._history_key(repo, kinds)) == None:
+            return actual
+        return (predicted + actual) / 2
+
+    def print_report(self):
+        if len(self.report) == 0:
+            return
+        Console.verbose("Repos cost, predicted vs actual API calls:")
+        for repo, predicted, actual, seconds in sorted(self.report, key=lambda r: r[2], reverse=True):
+            Console.verbose("  {repo}: predicted {predicted:.1f}, actual {actual} in {seconds:.1f}s".format(repo=repo, predicted=predicted, actual=actual, seconds=seconds))
@@ -0,0 +1,130 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, shutil, tempfile, threading, unittest
+
+from datetime import datetime
+
+from cache import DiskCache
+from scheduler import *
+
+class FakeRepo:
+    def __init__(self, name, open_issues_count=0, size=0, pushed_at=None):
+        self.name = name
+        self.full_name = 'fake-org/' + name
+        self.open_issues_count = open_issues_count
+        self.size = size
+        self.pushed_at = pushed_at
+
+class TestRepoScheduler(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.repos = [FakeRepo('small'), FakeRepo('big', open_issues_count=500), FakeRepo('medium', open_issues_count=100)]
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_estimate(self):
+        scheduler = RepoScheduler()
+        self.assertEqual(scheduler.estimate(FakeRepo('fake-repo'), ['prs']), 1)
+        self.assertEqual(scheduler.estimate(FakeRepo('fake-repo', open_issues_count=200), ['prs']), 3)
+        self.assertEqual(scheduler.estimate(FakeRepo('fake-repo'), ['prs', 'reviews']), 6)
+        self.assertEqual(scheduler.estimate(FakeRepo('fake-repo', pushed_at=datetime.now()), ['prs']), 2)
+
+    def test_run_biggest_first(self):
+        scheduler = RepoScheduler(workers=1)
+        order = []
+        results = list(scheduler.run(self.repos, lambda repo: order.append(repo.name) or repo.name, ['prs']))
+        self.assertEqual(order, ['big', 'medium', 'small'])
+        self.assertEqual(sorted([result for repo, result in results]), ['big', 'medium', 'small'])
+
+    def test_run_workers(self):
+        scheduler = RepoScheduler(workers=3)
+        threads = set()
+        lock = threading.Lock()
+        def work(repo):
+            with lock:
+                threads.add(threading.current_thread().name)
+            return repo.name
+        results = dict(scheduler.run(self.repos * 10, work, ['prs']))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(len(threads) >= 1)
+        self.assertEqual(len(scheduler.report), 30)
+
+    def test_work_stealing(self):
+        scheduler = RepoScheduler(workers=2)
+        queues = scheduler._queues(self.repos, dict([(id(repo), scheduler.estimate(repo, ['prs'])) for repo in self.repos]))
+        self.assertEqual([[repo.name for repo in q] for q in queues], [['big'], ['medium', 'small']])
+        self.assertEqual(scheduler._next_repo(queues, 0).name, 'big')
+        self.assertEqual(scheduler._next_repo(queues, 0).name, 'small')
+        self.assertEqual(scheduler._next_repo(queues, 1).name, 'medium')
+        self.assertEqual(scheduler._next_repo(queues, 0), None)
+
+    def test_run_deadline(self):
+        scheduler = RepoScheduler(workers=2)
+        scheduler.set_deadline(time.time() - 1)
+        self.assertEqual(list(scheduler.run(self.repos, lambda repo: repo.name, ['prs'])), [])
+
+    def test_run_priority(self):
+        scheduler = RepoScheduler(workers=1)
+        order = []
+        priorities = {'small': 1, 'big': 0, 'medium': 1}
+        list(scheduler.run(self.repos, lambda repo: order.append(repo.name), ['prs'], lambda repo: priorities[repo.name]))
+        self.assertEqual(order, ['small', 'medium', 'big'])
+
+    def test_run_error(self):
+        scheduler = RepoScheduler(workers=2)
+        def work(repo):
+            raise Exception('fake-error')
+        with self.assertRaises(Exception):
+            list(scheduler.run(self.repos, work, ['prs']))
+
+    def test_gate(self):
+        gate = PriorityGate()
+        order = []
+        interactive = RepoScheduler(workers=1)
+        interactive.set_gate(gate)
+        background = RepoScheduler(workers=1)
+        background.set_gate(gate, background=True)
+        runs = interactive.run(self.repos, lambda repo: order.append('interactive'), ['prs'])
+        next(runs)
+        thread = threading.Thread(target=lambda: list(background.run(self.repos, lambda repo: order.append('background'), ['prs'])))
+        thread.start()
+        time.sleep(0.1)
+        self.assertFalse('background' in order)
+        list(runs)
+        thread.join()
+        self.assertEqual(order, ['interactive'] * 3 + ['background'] * 3)
+        self.assertEqual(gate.interactive, 0)
+
+    def test_history(self):
+        calls = {'small': 0, 'big': 0, 'medium': 0}
+        def work(repo):
+            calls[repo.name] += 10 if repo.name == 'small' else 1
+        history = DiskCache('schedule', 0, self.cache_dir)
+        scheduler = RepoScheduler(workers=1, history=history, calls_func=lambda repo: calls[repo.name])
+        list(scheduler.run(self.repos, work, ['prs']))
+        self.assertEqual(scheduler.estimate(self.repos[0], ['prs']), 10)
+        self.assertEqual([(repo, predicted, actual) for repo, predicted, actual, seconds in scheduler.report],
+                         [('fake-org/big', 6, 1), ('fake-org/medium', 2, 1), ('fake-org/small', 1, 10)])
+
+        scheduler = RepoScheduler(workers=1, history=DiskCache('schedule', 0, self.cache_dir), calls_func=lambda repo: calls[repo.name])
+        order = []
+        list(scheduler.run(self.repos, lambda repo: order.append(repo.name) or work(repo), ['prs']))
+        self.assertEqual(order[0], 'small')
+        self.assertEqual(scheduler.estimate(self.repos[0], ['prs']), 10)
+        self.assertEqual(scheduler.estimate(self.repos[0], ['reviews']), 5)
+
+if __name__ == '__main__':
+    unittest.main()
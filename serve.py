@@ -0,0 +1,152 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json, time, threading, traceback
+
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import *
+
+# serves the reports of the ght commands as JSON over a local HTTP API, e.g.,
+# GET /prs?month=mar&users=user1,user2, collected by
+# report_func(command, params, background) which returns {'reports': [...],
+# 'repos': ['org/repo', ...]}, reports are kept and answered from memory, those
+# asked for in the last active seconds are refreshed in the background every
+# refresh seconds, invalidate_func(repos) first dropping what was fetched for
+# their repos
+class ReportServer:
+    COMMANDS = ['commits', 'prs', 'reviews', 'issues', 'stats']
+    DEFAULT_PORT = 8080
+    def __init__(self, report_func, port=DEFAULT_PORT, refresh=900, active=3600, invalidate_func=None, clock=time.time):
+        self.report_func = report_func
+        self.refresh = refresh
+        self.active = active
+        self.invalidate_func = invalidate_func or (lambda repos: None)
+        self.clock = clock
+        self.reports = {} # {(command, ((param, value), ...)): {'report': {...}, 'at': collected, 'asked': last asked}}
+        self.refreshes = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+        self.server.daemon_threads = True
+        self.threads = []
+
+    def base_url(self):
+        return 'http://127.0.0.1:{port}'.format(port=self.server.server_address[1])
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True),
+                        threading.Thread(target=self._refresh_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _key(self, command, params):
+        return (command, tuple(sorted(params.items())))
+
+    def _response(self, command, params, entry, cached):
+        response = {'command': command, 'params': params, 'cached': cached,
+                    'collected_at': datetime.fromtimestamp(entry['at'], timezone.utc).isoformat()}
+        response.update(entry['report'])
+        return response
+
+    # the report of command for params, collected with priority over the
+    # background refresh unless kept from before
+    def report(self, command, params):
+        key = self._key(command, params)
+        with self.lock:
+            entry = self.reports.get(key)
+            if entry != None:
+                entry['asked'] = self.clock()
+                return self._response(command, params, entry, True)
+        at = self.clock()
+        entry = {'report': self.report_func(command, params, False), 'at': at, 'asked': at}
+        with self.lock:
+            self.reports[key] = entry
+        return self._response(command, params, entry, False)
+
+    # collects again the reports older than refresh seconds and forgets those
+    # not asked for in the last active seconds
+    def refresh_reports(self):
+        now = self.clock()
+        with self.lock:
+            for key in [key for key, entry in self.reports.items() if now - entry['asked'] > self.active]:
+                del(self.reports[key])
+            stale = [(key, entry) for key, entry in self.reports.items() if now - entry['at'] >= self.refresh]
+        if len(stale) == 0:
+            return 0
+        self.invalidate_func(sorted(set([repo for key, entry in stale for repo in entry['report'].get('repos', [])])))
+        for (command, params), entry in stale:
+            try:
+                report = self.report_func(command, dict(params), True)
+            except Exception as e:
+                Console.warn("refreshing '{command}' report for {params}: {message}".format(command=command, params=dict(params), message=e.__str__()))
+                continue
+            with self.lock:
+                if (command, params) in self.reports:
+                    self.reports[(command, params)].update({'report': report, 'at': self.clock()})
+            self.refreshes += 1
+        return len(stale)
+
+    def _refresh_loop(self):
+        while not self.stopped.wait(min(60, max(1, self.refresh / 10))):
+            self.refresh_reports()
+
+    def status(self):
+        with self.lock:
+            return {'status': 'ok', 'reports': len(self.reports), 'refreshes': self.refreshes,
+                    'refresh_seconds': self.refresh, 'active_seconds': self.active}
+
+def _handler(report_server):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'GHTrack/1.0'
+
+        def log_message(self, format, *args):
+            Console.verbose("serve: " + format % args)
+
+        def _send(self, status, body):
+            data = json.dumps(body, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = dict([(key, values[-1]) for key, values in parse_qs(url.query).items()])
+            command = url.path.strip('/')
+            if command == 'health':
+                return self._send(200, report_server.status())
+            if command not in ReportServer.COMMANDS:
+                return self._send(404, {'message': "Unknown report '{path}', use any of: {commands}".format(path=url.path, commands=', '.join(ReportServer.COMMANDS))})
+            try:
+                start = time.time()
+                response = report_server.report(command, params)
+                response['seconds'] = round(time.time() - start, 3)
+                self._send(200, response)
+            except ValueError as e:
+                self._send(400, {'message': e.__str__()})
+            except Exception as e:
+                Console.warn("serving {path}: {message}".format(path=self.path, message=e.__str__()))
+                Console.verbose(traceback.format_exc())
+                self._send(500, {'message': e.__str__()})
+    return Handler
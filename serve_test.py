@@ -0,0 +1,135 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io, os, json, shutil, tempfile, unittest, contextlib
+
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+from docopt import docopt
+
+import ghtrack
+from cli import CLI, Serve
+from client import GHClient
+from synthetic import SyntheticOrg, FakeGithub
+from serve import *
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestReportServer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.collected = [] # [(command, params, background), ...]
+        self.invalidated = []
+        self.server = ReportServer(self.__report, port=0, refresh=60, active=300, invalidate_func=self.invalidated.append, clock=self.clock)
+
+    def tearDown(self):
+        self.server.server.server_close()
+
+    def __report(self, command, params, background):
+        if params.get('month') == 'fake-month':
+            raise ValueError("Invalid month 'fake-month'")
+        self.collected.append((command, params, background))
+        return {'reports': [{'request': {'data': command}, 'fake-user1': {'fake-repo1': len(self.collected)}}], 'repos': ['fake-org/fake-repo1']}
+
+    def test_report(self):
+        report = self.server.report('prs', {'month': 'mar'})
+        self.assertEqual((report['cached'], report['reports'][0]['fake-user1']), (False, {'fake-repo1': 1}))
+        report = self.server.report('prs', {'month': 'mar'})
+        self.assertEqual((report['cached'], report['reports'][0]['fake-user1']), (True, {'fake-repo1': 1}))
+        self.server.report('prs', {'month': 'apr'})
+        self.assertEqual(self.collected, [('prs', {'month': 'mar'}, False), ('prs', {'month': 'apr'}, False)])
+
+    def test_refresh_reports(self):
+        self.server.report('prs', {'month': 'mar'})
+        self.clock.now += 30
+        self.server.report('reviews', {'month': 'mar'})
+        self.assertEqual(self.server.refresh_reports(), 0)
+        self.clock.now += 30
+        self.assertEqual(self.server.refresh_reports(), 1)
+        self.assertEqual(self.collected[-1], ('prs', {'month': 'mar'}, True))
+        self.assertEqual(self.invalidated, [['fake-org/fake-repo1']])
+        report = self.server.report('prs', {'month': 'mar'})
+        self.assertEqual((report['cached'], report['reports'][0]['fake-user1']), (True, {'fake-repo1': 3}))
+        self.clock.now += 301
+        self.assertEqual(self.server.refresh_reports(), 0)
+        self.assertEqual(self.server.status()['reports'], 0)
+
+    def test_http(self):
+        self.server.start()
+        try:
+            with urlopen(self.server.base_url() + '/prs?month=mar&users=fake-user1') as response:
+                report = json.load(response)
+            self.assertEqual(report['params'], {'month': 'mar', 'users': 'fake-user1'})
+            self.assertEqual(report['reports'][0]['fake-user1'], {'fake-repo1': 1})
+            for path, status in [('/fake-report?month=mar', 404), ('/prs?month=fake-month', 400)]:
+                with self.assertRaises(HTTPError) as context:
+                    urlopen(self.server.base_url() + path)
+                self.assertEqual(context.exception.code, status)
+            with urlopen(self.server.base_url() + '/health') as response:
+                self.assertEqual(json.load(response)['reports'], 1)
+        finally:
+            self.server.stop()
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['GHTRACK_CACHE_DIR'] = self.cache_dir
+        self.org = SyntheticOrg(repos=3, prs=50, reviews=1, issues=10, users=5)
+        self.github = FakeGithub(self.org)
+        argv = ['serve', self.org.name, '--access-token=fake-access-token']
+        self.command = CLI(docopt(ghtrack.__doc__, argv=argv)).command(GHClient('fake-access-token', self.github))
+
+    def tearDown(self):
+        del(os.environ['GHTRACK_CACHE_DIR'])
+        shutil.rmtree(self.cache_dir)
+
+    def __query(self, command, params, background=False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.command.query_report(command, params, background)
+
+    def test_query_report(self):
+        params = {'month': 'mar', 'all-repos': 'true', 'users': ','.join(self.org.users), 'group-by': 'user'}
+        report = self.__query('prs', params)
+        self.assertEqual(report['repos'], [repo['full_name'] for repo in self.org.repos])
+        prs, group_by = report['reports']
+        self.assertEqual(prs['request']['data'], 'prs')
+        self.assertEqual(group_by['group_by'], ['user'])
+        self.assertEqual(sum([total['total'] for total in group_by['totals']]), sum([sum(prs.get(user, {}).values()) for user in self.org.users]))
+        calls = sum(self.github.calls.values())
+        self.assertEqual(self.__query('prs', params, True), report)
+        self.assertEqual(sum(self.github.calls.values()), calls)
+        self.command.client.invalidate(report['repos'])
+        self.assertEqual(self.__query('prs', params, True), report)
+        self.assertTrue(sum(self.github.calls.values()) > calls)
+
+    def test_query_shares_client(self):
+        client = self.command.client
+        self.assertEqual(client.max_fetches, Serve.MAX_FETCHES)
+        rate_limit_data = client.rate_limit_data
+        self.__query('prs', {'month': 'mar', 'all-repos': 'true', 'users': 'user0'})
+        self.assertTrue(client.rate_limit_data is rate_limit_data)
+
+    def test_query_invalid(self):
+        for params in [{'users': 'user0'}, {'month': 'mar', 'file': 'fake-file.csv'}, {'month': 'fake-month', 'repos': 'repo0'}]:
+            with self.assertRaises(ValueError):
+                self.__query('prs', params)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from array import array
+from collections.abc import Mapping
+
+# counts of one data kind for users x repos, indexed by interned user and repo
+# ids instead of nested dicts of names
+# dense rows are arrays of counts for every repo, used to show all stats, while
+# sparse rows only keep the counts set, usually the non-zero ones
+# reads as the {user: {repo: count}} map it replaces, to_map() materializes it
+# with the request for output
+class CountsMatrix(Mapping):
+    def __init__(self, sparse=True):
+        self.sparse = sparse
+        self.request = {}
+        self.user_ids = {}   # {user: id}
+        self.repo_ids = {}   # {repo: id}
+        self.repo_names = [] # [repo, ...] by id
+        self.rows = {}       # {user_id: array of counts or {repo_id: count}}
+        self.totals = array('q') # per repo id totals of all rows
+
+    def _user_id(self, user):
+        if user not in self.user_ids:
+            self.user_ids[sys.intern(user)] = len(self.user_ids)
+        return self.user_ids[user]
+
+    def _repo_id(self, repo):
+        if repo not in self.repo_ids:
+            self.repo_ids[sys.intern(repo)] = len(self.repo_names)
+            self.repo_names.append(repo)
+            self.totals.append(0)
+        return self.repo_ids[repo]
+
+    def _new_row(self):
+        if self.sparse:
+            return {}
+        return array('q')
+
+    # dense users have a count, maybe 0, for every repo
+    def add(self, users, repos):
+        for repo in repos:
+            self._repo_id(repo)
+        for user in users:
+            user_id = self._user_id(user)
+            if not self.sparse and user_id not in self.rows:
+                self.rows[user_id] = self._new_row()
+
+    def set(self, user, repo, count):
+        user_id, repo_id = self._user_id(user), self._repo_id(repo)
+        row = self.rows.setdefault(user_id, self._new_row())
+        if self.sparse:
+            old = row.get(repo_id, 0)
+        else:
+            if len(row) <= repo_id:
+                row.extend([0]*(repo_id + 1 - len(row)))
+            old = row[repo_id]
+        row[repo_id] = count
+        self.totals[repo_id] += count - old
+
+    def count(self, user, repo):
+        row = self.rows.get(self.user_ids.get(user))
+        repo_id = self.repo_ids.get(repo)
+        if row == None or repo_id == None:
+            return 0
+        if self.sparse:
+            return row.get(repo_id, 0)
+        return row[repo_id] if repo_id < len(row) else 0
+
+    def user_total(self, user):
+        row = self.rows.get(self.user_ids.get(user))
+        if row == None:
+            return 0
+        return sum(row.values()) if self.sparse else sum(row)
+
+    def remove_user(self, user):
+        user_id = self.user_ids.get(user)
+        if user_id not in self.rows:
+            return
+        row = self.rows.pop(user_id)
+        items = row.items() if self.sparse else enumerate(row)
+        for repo_id, count in items:
+            self.totals[repo_id] -= count
+
+    # {repo: total} of the rows of users, all rows by default from the running totals
+    def repo_totals(self, users=None):
+        if users == None or set(self.user_ids.keys()) <= set(users):
+            return dict(zip(self.repo_names, self.totals))
+        totals = array('q', [0]*len(self.repo_names))
+        for user in users:
+            row = self.rows.get(self.user_ids.get(user))
+            if row == None:
+                continue
+            items = row.items() if self.sparse else enumerate(row)
+            for repo_id, count in items:
+                totals[repo_id] += count
+        return dict(zip(self.repo_names, totals))
+
+    def _row_map(self, row):
+        if self.sparse:
+            return dict([(self.repo_names[repo_id], count) for repo_id, count in row.items()])
+        return dict([(repo, row[repo_id] if repo_id < len(row) else 0) for repo_id, repo in enumerate(self.repo_names)])
+
+    def __getitem__(self, user):
+        row = self.rows.get(self.user_ids.get(user))
+        if row == None:
+            raise KeyError(user)
+        return self._row_map(row)
+
+    def __iter__(self):
+        users = [None]*len(self.user_ids)
+        for user, user_id in self.user_ids.items():
+            users[user_id] = user
+        return iter([user for user in users if self.user_ids[user] in self.rows])
+
+    def __len__(self):
+        return len(self.rows)
+
+    # the {'request': {...}, user: {repo: count}, ...} map for output
+    def to_map(self):
+        output_map = {'request': self.request}
+        for user in self:
+            output_map[user] = self[user]
+        return output_map
@@ -0,0 +1,67 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from store import *
+
+class TestCountsMatrix(unittest.TestCase):
+    def setUp(self):
+        self.sparse = CountsMatrix()
+        self.dense = CountsMatrix(sparse=False)
+        for matrix in [self.sparse, self.dense]:
+            matrix.add(['user0', 'user1'], ['repo0', 'repo1'])
+            matrix.set('user0', 'repo1', 2)
+            matrix.set('user2', 'repo2', 3)
+
+    def test_sparse(self):
+        self.assertEqual(list(self.sparse), ['user0', 'user2'])
+        self.assertEqual(self.sparse['user0'], {'repo1': 2})
+        self.assertEqual(self.sparse.get('user1', {}), {})
+        self.assertFalse('user1' in self.sparse)
+
+    def test_dense(self):
+        self.assertEqual(list(self.dense), ['user0', 'user1', 'user2'])
+        self.assertEqual(self.dense['user0'], {'repo0': 0, 'repo1': 2, 'repo2': 0})
+        self.assertEqual(self.dense['user1'], {'repo0': 0, 'repo1': 0, 'repo2': 0})
+
+    def test_count(self):
+        for matrix in [self.sparse, self.dense]:
+            self.assertEqual(matrix.count('user0', 'repo1'), 2)
+            self.assertEqual(matrix.count('user0', 'repo2'), 0)
+            self.assertEqual(matrix.count('fake-user', 'repo0'), 0)
+            matrix.set('user0', 'repo1', 5)
+            self.assertEqual(matrix.count('user0', 'repo1'), 5)
+            self.assertEqual(matrix.user_total('user0'), 5)
+
+    def test_repo_totals(self):
+        for matrix in [self.sparse, self.dense]:
+            matrix.set('user1', 'repo1', 1)
+            self.assertEqual(matrix.repo_totals(), {'repo0': 0, 'repo1': 3, 'repo2': 3})
+            self.assertEqual(matrix.repo_totals(['user0', 'user1']), {'repo0': 0, 'repo1': 3, 'repo2': 0})
+            self.assertEqual(matrix.repo_totals(['user0', 'user1', 'user2', 'user3']), {'repo0': 0, 'repo1': 3, 'repo2': 3})
+
+    def test_remove_user(self):
+        for matrix in [self.sparse, self.dense]:
+            matrix.remove_user('user2')
+            matrix.remove_user('fake-user')
+            self.assertFalse('user2' in matrix)
+            self.assertEqual(matrix.repo_totals(), {'repo0': 0, 'repo1': 2, 'repo2': 0})
+
+    def test_to_map(self):
+        self.sparse.request = {'data': 'prs'}
+        self.assertEqual(self.sparse.to_map(), {'request': {'data': 'prs'}, 'user0': {'repo1': 2}, 'user2': {'repo2': 3}})
+
+if __name__ == '__main__':
+    unittest.main()
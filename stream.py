@@ -0,0 +1,54 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys, csv, json, threading
+
+# writes records as they are collected, one JSON object per line (ndjson) or
+# one CSV row per record, flushed after each repo so that consumers can read
+# them right away and they survive a crash
+class RecordStream:
+    FIELDS = ['user', 'repo', 'data', 'state', 'count']
+    def __init__(self, format, file_name=None, fields=FIELDS):
+        self.format = format # 'ndjson' or 'csv'
+        self.fields = fields # csv columns
+        self.file_name = file_name
+        self.output = sys.stdout
+        if file_name != None and file_name != '':
+            self.output = open(file_name, 'a', newline='')
+        self.csv_writer = None
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def to_stdout(self):
+        return self.output == sys.stdout
+
+    def write(self, record):
+        with self.lock:
+            self.records += 1
+            if self.format == 'ndjson':
+                self.output.write(json.dumps(record, sort_keys=True, default=str) + '\n')
+                return
+            if self.csv_writer == None:
+                self.csv_writer = csv.DictWriter(self.output, self.fields, extrasaction='ignore')
+                self.csv_writer.writeheader()
+            self.csv_writer.writerow(record)
+
+    def flush(self):
+        with self.lock:
+            self.output.flush()
+
+    def close(self):
+        self.flush()
+        if not self.to_stdout():
+            self.output.close()
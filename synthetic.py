@@ -0,0 +1,165 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time, random, threading
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# a generated GitHub organization with its repos, PRs, reviews, issues and
+# contributor stats for one year, the same for the same sizes and seed
+class SyntheticOrg:
+    def __init__(self, name='synthetic-org', repos=10, prs=100, reviews=2, issues=50, users=20, weeks=52, year=None, seed=0):
+        self.name = name
+        self.year = year or datetime.now().year
+        self.sizes = {'repos': repos, 'prs': prs, 'reviews': reviews, 'issues': issues, 'users': users, 'weeks': weeks}
+        self.random = random.Random(seed)
+        self.users = ['user{n}'.format(n=n) for n in range(users)]
+        self.repos = [self._repo(n) for n in range(repos)]
+
+    def _date(self):
+        start = datetime(self.year, 1, 1)
+        return start + timedelta(seconds=self.random.randrange(365*24*3600))
+
+    def _user(self):
+        # a few users are much more active than the others, as in real orgs
+        return self.users[int(len(self.users) * self.random.random()**2)]
+
+    def _repo(self, n):
+        name = 'repo{n}'.format(n=n)
+        repo = {'name': name, 'full_name': self.name + '/' + name, 'size': self.random.randrange(10000),
+                'pushed_at': self._date(), 'pulls': [], 'issues': [], 'contributors': []}
+        for number in range(1, self.sizes['prs'] + 1):
+            created_at = self._date()
+            pull = {'id': n*1000000 + number, 'number': number, 'user': self._user(),
+                    'state': self.random.choice(['open', 'closed']), 'created_at': created_at, 'reviews': []}
+            for review in range(self.sizes['reviews']):
+                pull['reviews'].append({'id': pull['id'] * 100 + review, 'user': self._user(),
+                                        'submitted_at': created_at + timedelta(hours=self.random.randrange(1, 72))})
+            pull['updated_at'] = max([created_at] + [review['submitted_at'] for review in pull['reviews']])
+            repo['pulls'].append(pull)
+        for number in range(1, self.sizes['issues'] + 1):
+            repo['issues'].append({'id': number, 'number': len(repo['pulls']) + number, 'user': self._user(),
+                                   'state': self.random.choice(['open', 'closed']), 'created_at': self._date()})
+        first_week = datetime(self.year, 1, 1) - timedelta(days=datetime(self.year, 1, 1).weekday())
+        for user in self.users:
+            weeks = [{'w': first_week + timedelta(weeks=week), 'c': self.random.choice([0, 0, 1, 2, 5])} for week in range(self.sizes['weeks'])]
+            repo['contributors'].append({'author': user, 'weeks': weeks})
+        repo['open_issues_count'] = len([item for item in repo['pulls'] + repo['issues'] if item['state'] == 'open'])
+        return repo
+
+    def repo(self, name):
+        for repo in self.repos:
+            if repo['name'] == name:
+                return repo
+        return None
+
+    # PRs of repo as listed by GitHub, by 'created' or 'updated', newest first
+    def pulls(self, repo, state='closed', sort='created'):
+        pulls = [pull for pull in repo['pulls'] if state == 'all' or pull['state'] == state]
+        return sorted(pulls, key=lambda pull: pull[sort + '_at'], reverse=True)
+
+    # issues of repo as listed by GitHub, PRs included, created since, newest first
+    def issues(self, repo, state='closed', since=None):
+        issues = [dict(issue, pull_request=None) for issue in repo['issues']]
+        issues += [dict(pull, pull_request={'number': pull['number']}) for pull in repo['pulls']]
+        issues = [issue for issue in issues if (state == 'all' or issue['state'] == state) and (since == None or issue['created_at'] >= since)]
+        return sorted(issues, key=lambda issue: issue['created_at'], reverse=True)
+
+# a PaginatedList of fake items counting each page read as a request
+class FakePaginatedList:
+    def __init__(self, github, endpoint, items, per_page=100):
+        self.github = github
+        self.endpoint = endpoint
+        self.items = items
+        self.per_page = per_page
+
+    def get_page(self, page_no):
+        self.github.request(self.endpoint)
+        return self.items[page_no*self.per_page:(page_no + 1)*self.per_page]
+
+    def __iter__(self):
+        page_no = 0
+        while True:
+            page = self.get_page(page_no)
+            for item in page:
+                yield item
+            if len(page) < self.per_page:
+                return
+            page_no += 1
+
+# a stand-in for PyGithub's Github serving a SyntheticOrg, counting requests by
+# endpoint and waiting latency seconds for each
+class FakeGithub:
+    def __init__(self, org, latency=0):
+        self.org = org
+        self.latency = latency
+        self.calls = {} # {endpoint: requests}
+        self.rate_limiting = (5000, 5000)
+        self.rate_limiting_resettime = int(time.time()) + 3600
+        self.lock = threading.Lock()
+
+    def request(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def get_organization(self, name):
+        self.request('org')
+        return FakeOrganization(self, self.org)
+
+class FakeOrganization:
+    def __init__(self, github, org):
+        self.github = github
+        self.org = org
+        self.login = org.name
+
+    def get_repos(self):
+        return FakePaginatedList(self.github, 'repos', [FakeRepo(self.github, self.org, repo) for repo in self.org.repos])
+
+class FakeRepo:
+    def __init__(self, github, org, repo):
+        self.github = github
+        self.org = org
+        self.repo = repo
+        self.name = repo['name']
+        self.full_name = repo['full_name']
+        self.size = repo['size']
+        self.open_issues_count = repo['open_issues_count']
+        self.pushed_at = repo['pushed_at']
+
+    def get_pulls(self, state='open', sort='created', direction='desc'):
+        return FakePaginatedList(self.github, 'pulls', [_pull(self.github, pull) for pull in self.org.pulls(self.repo, state, sort)])
+
+    def get_issues(self, state='open', since=None, sort='created', direction='desc'):
+        return FakePaginatedList(self.github, 'issues', [_item(issue) for issue in self.org.issues(self.repo, state, since)])
+
+    def get_stats_contributors(self):
+        self.github.request('stats/contributors')
+        return [SimpleNamespace(author=SimpleNamespace(login=stats['author']), weeks=[SimpleNamespace(**week) for week in stats['weeks']])
+                for stats in self.repo['contributors']]
+
+def _item(item):
+    fields = dict([(key, value) for key, value in item.items() if key not in ['user', 'reviews']])
+    return SimpleNamespace(user=SimpleNamespace(login=item['user']), **fields)
+
+def _pull(github, pull):
+    fake_pull = _item(pull)
+    fake_pull.get_reviews = lambda: FakePaginatedList(github, 'reviews', [_item(review) for review in pull['reviews']])
+    return fake_pull
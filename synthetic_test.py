@@ -0,0 +1,69 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from datetime import datetime
+
+from client import GHClient
+from synthetic import *
+
+class TestSyntheticOrg(unittest.TestCase):
+    def setUp(self):
+        self.org = SyntheticOrg(repos=3, prs=150, reviews=2, issues=20, users=5, year=2020)
+
+    def test_sizes(self):
+        self.assertEqual([repo['name'] for repo in self.org.repos], ['repo0', 'repo1', 'repo2'])
+        self.assertEqual(len(self.org.repos[0]['pulls']), 150)
+        self.assertEqual(len(self.org.repos[0]['pulls'][0]['reviews']), 2)
+        self.assertEqual(len(self.org.repos[0]['contributors']), 5)
+
+    def test_seed(self):
+        self.assertEqual(SyntheticOrg(repos=3, prs=150, issues=20, users=5, year=2020).repos, self.org.repos)
+        self.assertNotEqual(SyntheticOrg(repos=3, prs=150, issues=20, users=5, year=2020, seed=1).repos, self.org.repos)
+
+    def test_pulls(self):
+        pulls = self.org.pulls(self.org.repos[0], 'closed', 'updated')
+        self.assertTrue(all([pull['state'] == 'closed' for pull in pulls]))
+        self.assertEqual(pulls, sorted(pulls, key=lambda pull: pull['updated_at'], reverse=True))
+        self.assertEqual(len(self.org.pulls(self.org.repos[0], 'all')), 150)
+
+    def test_issues(self):
+        issues = self.org.issues(self.org.repos[0], 'all')
+        self.assertEqual(len(issues), 170)
+        self.assertEqual(len([issue for issue in issues if issue['pull_request'] != None]), 150)
+
+class TestFakeGithub(unittest.TestCase):
+    def setUp(self):
+        self.org = SyntheticOrg(repos=2, prs=150, reviews=1, issues=10, users=5, year=2020)
+        self.github = FakeGithub(self.org)
+
+    def test_pages(self):
+        repo = self.github.get_organization('synthetic-org').get_repos().get_page(0)[0]
+        self.assertEqual(len(list(repo.get_pulls(state='all'))), 150)
+        self.assertEqual(self.github.calls, {'org': 1, 'repos': 1, 'pulls': 2})
+
+    def test_client_counts(self):
+        client = GHClient('fake-access-token', self.github)
+        repo = client.repos('synthetic-org')[0]
+        start_date, end_date = datetime(2020, 3, 1), datetime(2020, 3, 31)
+        expected = {}
+        for pull in self.org.pulls(self.org.repos[0], 'closed'):
+            if pull['created_at'] >= start_date and pull['created_at'] <= end_date:
+                expected[pull['user']] = expected.get(pull['user'], 0) + 1
+        self.assertEqual(client.prs_counts(repo, None, start_date, end_date), expected)
+        self.assertTrue(self.github.calls['pulls'] <= 2)
+
+if __name__ == '__main__':
+    unittest.main()
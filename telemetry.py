@@ -0,0 +1,178 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, re, json, logging, threading
+
+# GitHub API endpoint families by request path, e.g., all the PRs listings of all repos are 'pulls'
+ENDPOINT_PATHS = [(r'/orgs/[^/]+$', 'org'), (r'/orgs/[^/]+/repos$', 'repos'), (r'/orgs/[^/]+/teams/', 'teams'), (r'/teams/', 'teams'),
+                  (r'/pulls/\d+/reviews$', 'reviews'), (r'/repos/[^/]+/[^/]+/pulls$', 'pulls'), (r'/repos/[^/]+/[^/]+/issues', 'issues'),
+                  (r'/stats/contributors$', 'stats/contributors'), (r'/rate_limit$', 'rate_limit'), (r'/repos/[^/]+/[^/]+$', 'repo')]
+
+def endpoint_of(url):
+    path = url.split('?')[0]
+    for pattern, endpoint in ENDPOINT_PATHS:
+        if re.search(pattern, path):
+            return endpoint
+    return 'other'
+
+# counts PyGithub's responses bytes from its debug log of each response:
+# verb, scheme, host, url, request headers, input, status, response headers, body
+class _ResponseBytes(logging.Handler):
+    def __init__(self, telemetry):
+        super().__init__(logging.DEBUG)
+        self.telemetry = telemetry
+
+    def emit(self, record):
+        if isinstance(record.args, tuple) and len(record.args) == 9 and isinstance(record.args[8], str):
+            self.telemetry.add_bytes(endpoint_of(str(record.args[3])), len(record.args[8]))
+
+# the cost of a run per GitHub API endpoint family: calls, pages, response
+# bytes, latency histogram, errors, retries and fetches served from cache, as
+# well as the waits for --rate-limit
+class ApiTelemetry:
+    BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30] # seconds, as Prometheus histogram upper bounds
+    def __init__(self):
+        self.endpoints = {} # {endpoint: {'calls': N, 'pages': N, ..., 'buckets': [N per BUCKETS and +Inf]}}
+        self.rate_limit = {'waits': 0, 'seconds': 0}
+        self.handler = None
+        self.logger_state = (logging.NOTSET, True) # (level, propagate) of PyGithub's logger before watching
+        self.lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {'calls': 0, 'pages': 0, 'bytes': 0, 'errors': 0, 'retries': 0, 'cache_hits': 0,
+                                        'seconds': 0.0, 'buckets': [0] * (len(self.BUCKETS) + 1)}
+        return self.endpoints[endpoint]
+
+    def _add(self, endpoint, stat, count=1):
+        with self.lock:
+            self._endpoint(endpoint)[stat] += count
+
+    def add_call(self, endpoint, seconds, error=False):
+        with self.lock:
+            stats = self._endpoint(endpoint)
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['buckets'][len([bound for bound in self.BUCKETS if seconds > bound])] += 1
+            if error:
+                stats['errors'] += 1
+
+    def add_page(self, endpoint):
+        self._add(endpoint, 'pages')
+
+    def add_retry(self, endpoint):
+        self._add(endpoint, 'retries')
+
+    def add_cache_hit(self, endpoint):
+        self._add(endpoint, 'cache_hits')
+
+    def add_bytes(self, endpoint, count):
+        self._add(endpoint, 'bytes', count)
+
+    def add_rate_limit_wait(self, seconds):
+        with self.lock:
+            self.rate_limit['waits'] += 1
+            self.rate_limit['seconds'] += seconds
+
+    # PyGithub only logs the responses when its logger is at DEBUG level, these
+    # records are not propagated to other handlers meanwhile
+    def watch_responses(self):
+        if self.handler != None:
+            return
+        self.handler = _ResponseBytes(self)
+        logger = logging.getLogger('github.Requester')
+        self.logger_state = (logger.level, logger.propagate)
+        logger.addHandler(self.handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+
+    def unwatch_responses(self):
+        if self.handler == None:
+            return
+        logger = logging.getLogger('github.Requester')
+        logger.removeHandler(self.handler)
+        logger.level, logger.propagate = self.logger_state
+        self.handler = None
+
+    # upper bound of the bucket of the q quantile of the latencies, None when above all
+    def _quantile(self, buckets, q):
+        total, count = sum(buckets), 0
+        for bound, bucket in zip(self.BUCKETS + [None], buckets):
+            count += bucket
+            if total > 0 and count >= q * total:
+                return bound
+        return None
+
+    def report(self, labels={}):
+        with self.lock:
+            endpoints = dict([(endpoint, dict(stats, buckets=list(stats['buckets']))) for endpoint, stats in self.endpoints.items()])
+            rate_limit = dict(self.rate_limit)
+        totals = dict([(stat, sum([stats[stat] for stats in endpoints.values()])) for stat in ['calls', 'pages', 'bytes', 'errors', 'retries', 'cache_hits']])
+        for stats in endpoints.values():
+            stats['seconds'] = round(stats['seconds'], 3)
+            stats['p50_seconds'] = self._quantile(stats['buckets'], 0.5)
+            stats['p95_seconds'] = self._quantile(stats['buckets'], 0.95)
+        return {'labels': labels, 'endpoints': dict(sorted(endpoints.items())), 'totals': totals, 'rate_limit': rate_limit, 'buckets': self.BUCKETS}
+
+    def table(self, report):
+        rows = []
+        for endpoint, stats in report['endpoints'].items():
+            mean = stats['seconds'] / stats['calls'] if stats['calls'] > 0 else 0
+            p95 = '<= {bound}s'.format(bound=stats['p95_seconds']) if stats['p95_seconds'] != None else '> {bound}s'.format(bound=self.BUCKETS[-1])
+            rows.append([endpoint, stats['calls'], stats['pages'], round(stats['bytes'] / 1024, 1), stats['errors'], stats['retries'], stats['cache_hits'], round(mean * 1000), p95])
+        totals = report['totals']
+        rows.append(['total', totals['calls'], totals['pages'], round(totals['bytes'] / 1024, 1), totals['errors'], totals['retries'], totals['cache_hits'], '', ''])
+        return rows, ['endpoint', 'calls', 'pages', 'KB', 'errors', 'retries', 'cache hits', 'mean ms', 'p95']
+
+    def _labels(self, labels, more={}):
+        labels = dict(labels, **more)
+        if len(labels) == 0:
+            return ''
+        return '{' + ','.join(['{name}="{value}"'.format(name=name, value=str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels.items()]) + '}'
+
+    # the report in Prometheus text format, e.g., for node exporter's textfile collector
+    def prometheus(self, report):
+        labels = report['labels']
+        lines = []
+        for stat, help in [('calls', 'GitHub API calls'), ('pages', 'GitHub API listing pages read'), ('bytes', 'GitHub API response bytes'),
+                           ('errors', 'GitHub API calls failed'), ('retries', 'GitHub API calls retried'), ('cache_hits', 'GitHub API fetches served from cache')]:
+            name = 'ght_api_{stat}_total'.format(stat=stat)
+            lines += ['# HELP {name} {help}.'.format(name=name, help=help), '# TYPE {name} counter'.format(name=name)]
+            for endpoint, stats in report['endpoints'].items():
+                lines.append('{name}{labels} {value}'.format(name=name, labels=self._labels(labels, {'endpoint': endpoint}), value=stats[stat]))
+        name = 'ght_api_call_seconds'
+        lines += ['# HELP {name} GitHub API call latency.'.format(name=name), '# TYPE {name} histogram'.format(name=name)]
+        for endpoint, stats in report['endpoints'].items():
+            count = 0
+            for bound, bucket in zip([str(bound) for bound in self.BUCKETS] + ['+Inf'], stats['buckets']):
+                count += bucket
+                lines.append('{name}_bucket{labels} {count}'.format(name=name, labels=self._labels(labels, {'endpoint': endpoint, 'le': bound}), count=count))
+            lines.append('{name}_sum{labels} {value}'.format(name=name, labels=self._labels(labels, {'endpoint': endpoint}), value=stats['seconds']))
+            lines.append('{name}_count{labels} {value}'.format(name=name, labels=self._labels(labels, {'endpoint': endpoint}), value=stats['calls']))
+        for stat, help in [('waits', 'Waits for --rate-limit'), ('seconds', 'Seconds waited for --rate-limit')]:
+            name = 'ght_rate_limit_{stat}_total'.format(stat=stat)
+            lines += ['# HELP {name} {help}.'.format(name=name, help=help), '# TYPE {name} counter'.format(name=name)]
+            lines.append('{name}{labels} {value}'.format(name=name, labels=self._labels(labels), value=report['rate_limit'][stat]))
+        return '\n'.join(lines) + '\n'
+
+    # writes report to file_name as a Prometheus textfile if it ends with .prom, otherwise as JSON,
+    # renaming a temporary file so that collectors never read a partial one
+    def save(self, report, file_name):
+        tmp_file_name = file_name + '.tmp'
+        with open(tmp_file_name, 'w') as file:
+            if file_name.endswith('.prom'):
+                file.write(self.prometheus(report))
+            else:
+                json.dump(report, file, indent=2)
+        os.replace(tmp_file_name, file_name)
@@ -0,0 +1,98 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, json, shutil, tempfile, unittest
+
+from datetime import datetime
+
+from client import GHClient
+from synthetic import SyntheticOrg
+from fake_server import FakeServer
+from telemetry import *
+
+class TestApiTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.telemetry = ApiTelemetry()
+        self.telemetry.add_call('pulls', 0.07)
+        self.telemetry.add_call('pulls', 0.3)
+        self.telemetry.add_call('pulls', 60, error=True)
+        self.telemetry.add_page('pulls')
+        self.telemetry.add_page('pulls')
+        self.telemetry.add_retry('pulls')
+        self.telemetry.add_cache_hit('reviews')
+        self.telemetry.add_bytes('pulls', 2048)
+        self.labels = {'command': 'prs', 'org': 'fake-org'}
+
+    def test_endpoint_of(self):
+        self.assertEqual(endpoint_of('/orgs/fake-org'), 'org')
+        self.assertEqual(endpoint_of('/orgs/fake-org/repos?per_page=100&page=2'), 'repos')
+        self.assertEqual(endpoint_of('/repos/fake-org/repo0/pulls?state=closed'), 'pulls')
+        self.assertEqual(endpoint_of('/api/v3/repos/fake-org/repo0/pulls/12/reviews'), 'reviews')
+        self.assertEqual(endpoint_of('/repos/fake-org/repo0/issues/12'), 'issues')
+        self.assertEqual(endpoint_of('/repos/fake-org/repo0/stats/contributors'), 'stats/contributors')
+        self.assertEqual(endpoint_of('/emojis'), 'other')
+
+    def test_report(self):
+        report = self.telemetry.report(self.labels)
+        pulls = report['endpoints']['pulls']
+        self.assertEqual((pulls['calls'], pulls['pages'], pulls['bytes'], pulls['errors'], pulls['retries']), (3, 2, 2048, 1, 1))
+        self.assertEqual(pulls['buckets'], [0, 1, 0, 1, 0, 0, 0, 0, 0, 1])
+        self.assertEqual((pulls['p50_seconds'], pulls['p95_seconds']), (0.5, None))
+        self.assertEqual(report['totals']['cache_hits'], 1)
+        self.assertEqual(report['labels'], self.labels)
+
+    def test_table(self):
+        rows, headers = self.telemetry.table(self.telemetry.report())
+        self.assertEqual(rows[0][:4], ['pulls', 3, 2, 2.0])
+        self.assertEqual(rows[-1][:2], ['total', 3])
+        self.assertEqual(len(headers), len(rows[0]))
+
+    def test_prometheus(self):
+        lines = self.telemetry.prometheus(self.telemetry.report(self.labels)).splitlines()
+        self.assertTrue('ght_api_calls_total{command="prs",org="fake-org",endpoint="pulls"} 3' in lines)
+        self.assertTrue('ght_api_call_seconds_bucket{command="prs",org="fake-org",endpoint="pulls",le="0.1"} 1' in lines)
+        self.assertTrue('ght_api_call_seconds_bucket{command="prs",org="fake-org",endpoint="pulls",le="+Inf"} 3' in lines)
+        self.assertTrue('ght_rate_limit_waits_total{command="prs",org="fake-org"} 0' in lines)
+
+    def test_save(self):
+        directory = tempfile.mkdtemp()
+        try:
+            report = self.telemetry.report(self.labels)
+            self.telemetry.save(report, os.path.join(directory, 'ght.json'))
+            with open(os.path.join(directory, 'ght.json')) as file:
+                self.assertEqual(json.load(file)['totals'], report['totals'])
+            self.telemetry.save(report, os.path.join(directory, 'ght.prom'))
+            with open(os.path.join(directory, 'ght.prom')) as file:
+                self.assertEqual(file.read(), self.telemetry.prometheus(report))
+            self.assertEqual(sorted(os.listdir(directory)), ['ght.json', 'ght.prom'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_response_bytes(self):
+        server = FakeServer(SyntheticOrg(repos=2, prs=150, reviews=1, issues=10, users=5, year=2020)).start()
+        try:
+            client = GHClient('fake-access-token', base_url=server.base_url())
+            client.set_resilience(0, 0, 5)
+            client.api_telemetry.watch_responses()
+            repo = client.repos('synthetic-org')[0]
+            client.prs_counts(repo, None, datetime(2020, 3, 1), datetime(2020, 3, 31))
+            client.api_telemetry.unwatch_responses()
+            endpoints = client.api_report()['endpoints']
+            self.assertTrue(endpoints['pulls']['pages'] > 0 and endpoints['pulls']['pages'] <= server.requests['pulls'])
+            self.assertTrue(endpoints['pulls']['bytes'] > 0 and endpoints['org']['bytes'] > 0)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
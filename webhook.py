@@ -0,0 +1,148 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hmac, json, time, hashlib, threading, traceback
+
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import *
+
+# the X-Hub-Signature-256 header GitHub sends with a webhook body
+def signature(secret, body):
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+# receives GitHub webhook events POSTed to /webhook, verifying their signature
+# with secret, into an EventStore, reconcile_func() is called at start and then
+# every reconcile seconds to fill the gaps, e.g., events missed while down,
+# it listens on host, e.g., 0.0.0.0 for GitHub to reach it without a proxy
+class WebhookServer:
+    EVENTS = ['pull_request', 'pull_request_review', 'issues', 'push']
+    DEFAULT_HOST = '127.0.0.1'
+    MAX_BODY = 25*1024*1024 # bytes, GitHub caps webhook payloads at 25 MB
+    def __init__(self, store, secret, port=8080, org=None, reconcile_func=None, reconcile=3600, host=DEFAULT_HOST):
+        self.host = host
+        self.store = store
+        self.secret = secret
+        self.org = org # events of the repos of other orgs are ignored
+        self.reconcile_func = reconcile_func
+        self.reconcile = reconcile
+        self.received = {} # {event: deliveries}
+        self.reconciled = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        self.threads = []
+
+    def base_url(self):
+        return 'http://{host}:{port}'.format(host=self.host, port=self.server.server_address[1])
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)]
+        if self.reconcile_func != None:
+            self.threads.append(threading.Thread(target=self._reconcile_loop, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def verify(self, body, header):
+        return header != None and hmac.compare_digest(signature(self.secret, body), header)
+
+    # (status, response) of a delivery of event with payload
+    def receive(self, event, payload):
+        with self.lock:
+            self.received[event] = self.received.get(event, 0) + 1
+        if event == 'ping':
+            return (200, {'message': 'pong'})
+        owner = payload.get('repository', {}).get('owner', {}).get('login')
+        if event not in self.EVENTS or (self.org != None and owner != self.org):
+            return (202, {'message': "Ignored '{event}' event".format(event=event)})
+        return (200, {'stored': self.store.ingest(event, payload)})
+
+    def reconcile_once(self):
+        start = time.time()
+        try:
+            rows = self.reconcile_func()
+        except Exception as e:
+            Console.warn("reconciling events: {message}".format(message=e.__str__()))
+            Console.verbose(traceback.format_exc())
+            return
+        with self.lock:
+            self.reconciled += 1
+        Console.print("Reconciled {rows} events in {seconds:.1f}s".format(rows=rows, seconds=time.time() - start))
+
+    def _reconcile_loop(self):
+        self.reconcile_once()
+        while not self.stopped.wait(self.reconcile):
+            self.reconcile_once()
+
+    def status(self):
+        with self.lock:
+            return {'status': 'ok', 'received': dict(self.received), 'reconciled': self.reconciled, 'events': self.store.stats()}
+
+def _handler(webhook_server):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'GHTrack/1.0'
+
+        def log_message(self, format, *args):
+            Console.verbose("webhook: " + format % args)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if urlparse(self.path).path != '/health':
+                return self._send(404, {'message': 'Not Found'})
+            self._send(200, webhook_server.status())
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/webhook':
+                return self._send(404, {'message': 'Not Found'})
+            # the length is checked before reading anything from unverified senders
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                return self._send(400, {'message': 'Invalid Content-Length'})
+            if length > webhook_server.MAX_BODY:
+                self.close_connection = True
+                return self._send(413, {'message': 'Payload over {max_body} bytes'.format(max_body=webhook_server.MAX_BODY)})
+            body = self.rfile.read(length)
+            if not webhook_server.verify(body, self.headers.get('X-Hub-Signature-256')):
+                return self._send(401, {'message': 'Invalid signature'})
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return self._send(400, {'message': 'Invalid JSON payload'})
+            try:
+                status, response = webhook_server.receive(self.headers.get('X-GitHub-Event', ''), payload)
+            except Exception as e:
+                Console.warn("storing '{event}' event {delivery}: {message}".format(event=self.headers.get('X-GitHub-Event'), delivery=self.headers.get('X-GitHub-Delivery'), message=e.__str__()))
+                Console.verbose(traceback.format_exc())
+                return self._send(500, {'message': e.__str__()})
+            self._send(status, response)
+    return Handler
@@ -0,0 +1,109 @@
+# Copyright © 2020 IBM
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os, json, time, shutil, tempfile, unittest
+
+from http.client import HTTPConnection
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+from events import EventStore
+from events_test import WEBHOOKS_DIR
+from webhook import *
+
+class TestWebhookServer(unittest.TestCase):
+    SECRET = 'fake-secret'
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = EventStore(os.path.join(self.directory, 'events.db'))
+        self.reconciles = []
+        self.server = WebhookServer(self.store, self.SECRET, 0, 'fake-org', lambda: self.reconciles.append(True) or 0, 3600).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    # posts the recorded payload of event as GitHub does, returns (status, response)
+    def __post(self, event, body=None, secret=SECRET):
+        if body == None:
+            with open(os.path.join(WEBHOOKS_DIR, event + '.json'), 'rb') as file:
+                body = file.read()
+        headers = {'Content-Type': 'application/json', 'X-GitHub-Event': event, 'X-GitHub-Delivery': 'fake-delivery',
+                   'X-Hub-Signature-256': signature(secret, body)}
+        try:
+            with urlopen(Request(self.server.base_url() + '/webhook', data=body, headers=headers)) as response:
+                return (response.status, json.load(response))
+        except HTTPError as e:
+            return (e.code, json.load(e))
+
+    def test_receive(self):
+        for event in ['pull_request', 'pull_request_review', 'issues', 'push']:
+            self.assertEqual(self.__post(event)[0], 200)
+        self.assertEqual(self.__post('push'), (200, {'stored': 2}))
+        self.assertEqual(self.store.stats(), {'prs': 1, 'reviews': 1, 'issues': 1, 'commits': 2})
+        with urlopen(self.server.base_url() + '/health') as response:
+            status = json.load(response)
+        self.assertEqual(status['received'], {'pull_request': 1, 'pull_request_review': 1, 'issues': 1, 'push': 2})
+
+    def test_signature(self):
+        self.assertEqual(self.__post('pull_request', secret='fake-other-secret')[0], 401)
+        self.assertEqual(self.store.stats(), {})
+
+    def test_ignored(self):
+        self.assertEqual(self.__post('ping', b'{"zen": "Keep it logically awesome."}'), (200, {'message': 'pong'}))
+        self.assertEqual(self.__post('star', b'{"action": "created"}')[0], 202)
+        with open(os.path.join(WEBHOOKS_DIR, 'issues.json')) as file:
+            other_org = file.read().replace('fake-org', 'fake-other-org').encode('utf-8')
+        self.assertEqual(self.__post('issues', other_org)[0], 202)
+        self.assertEqual(self.__post('issues', b'{not json')[0], 400)
+        self.assertEqual(self.store.stats(), {})
+
+    # posts only the headers with content_length, returns the status
+    def __post_length(self, content_length):
+        connection = HTTPConnection(urlparse(self.server.base_url()).netloc, timeout=5)
+        try:
+            connection.putrequest('POST', '/webhook')
+            connection.putheader('Content-Length', content_length)
+            connection.putheader('X-GitHub-Event', 'issues')
+            connection.endheaders()
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    def test_content_length(self):
+        self.assertEqual(self.__post_length('fake-length'), 400)
+        self.assertEqual(self.__post_length('-1'), 400)
+        self.assertEqual(self.__post_length(str(WebhookServer.MAX_BODY + 1)), 413)
+        self.assertEqual(self.store.stats(), {})
+
+    def test_host(self):
+        server = WebhookServer(self.store, self.SECRET, 0, 'fake-org', host='localhost').start()
+        try:
+            self.assertTrue(server.base_url().startswith('http://localhost:'))
+            with urlopen(server.base_url() + '/health') as response:
+                self.assertEqual(response.status, 200)
+        finally:
+            server.stop()
+
+    def test_reconcile(self):
+        for i in range(50):
+            if len(self.reconciles) > 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.reconciles, [True])
+
+if __name__ == '__main__':
+    unittest.main()